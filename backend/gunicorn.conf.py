@@ -0,0 +1,9 @@
+# loaded by gunicorn from the working directory, see Dockerfile.prod.backend
+
+
+def post_worker_init(worker):
+    """
+    Queue the background startup tasks once the worker imported the app, outside of its boot timeout.
+    """
+    from services.core_services.task_service import TaskService
+    TaskService().start()
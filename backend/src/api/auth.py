@@ -3,7 +3,7 @@ import logging
 import os
 import re
 
-from services.api_services.auth_service import handle_strava_auth, process_strava_callback
+from services.api_services.auth_service import handle_strava_auth, process_strava_callback, get_sync_progress
 from api.exceptions import AuthorizationError, ScopeError
 
 
@@ -67,6 +67,25 @@ def auth_status():
     return jsonify({"logged_in": False}), 401
 
 
+@auth_blueprint.route('/sync_status', methods=['GET'])
+def sync_status():
+    """
+    Return the progress of the logged in athlete's activity sync: status (running, waiting, failed
+    or done), pages and activities fetched so far and when it started, last stored a page and finished.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Not logged in"}), 401
+    try:
+        progress = get_sync_progress(user_id)
+        if progress is None:
+            return jsonify({"error": "No sync found"}), 404
+        return jsonify(progress), 200
+    except Exception as e:
+        logger.error(f"Error fetching the sync status of athlete {user_id}: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
 @auth_blueprint.route('/logout', methods=['POST'])
 def auth_logout():
     if "user_id" in session:
@@ -0,0 +1,49 @@
+from flask import request, make_response, Response
+
+from services.core_services.compressed_cache import CompressedCache
+from utils.compression import FRAMED_ENCODINGS, compress, negotiate_encoding
+
+
+def compressed_response(key, version: int, build_response, mimetype: str = "application/json"):
+    """
+    Build the response via build_response(), compressed according to the Accept-Encoding of the request.
+    The compressed body is cached per key, encoding and data version, so the payload is compressed once
+    per data change. Clients that accept none of the supported encodings get the plain response.
+    """
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        response = make_response(build_response())
+        response.vary.add("Accept-Encoding")
+        return response
+
+    cache = CompressedCache()
+    body = cache.get((key, encoding), version)
+    if body is None:
+        response = make_response(build_response())
+        if response.status_code != 200:
+            return response
+        body = compress(response.get_data(), encoding)
+        cache.put((key, encoding), body, version)
+
+    response = make_response(body, 200)
+    response.mimetype = mimetype
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def framed_response(build_frames, build_response, stream: bool = True, mimetype: str = "application/json"):
+    """
+    Build the response from the parts build_frames(encoding) yields, compressed separately with one of the
+    FRAMED_ENCODINGS the request accepts. The parts are streamed unless stream is False and not cached here,
+    build_frames caches them. Clients that accept none of these encodings get the plain response.
+    """
+    encoding = negotiate_encoding(request.accept_encodings, FRAMED_ENCODINGS)
+    if encoding is None:
+        response = make_response(build_response())
+    else:
+        frames = build_frames(encoding)
+        response = Response(frames if stream else b"".join(frames), mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
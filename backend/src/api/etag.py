@@ -0,0 +1,18 @@
+from flask import request, make_response
+
+
+def conditional_response(etag: str, build_response):
+    """
+    Answer with 304 Not Modified if the client already holds the representation tagged with etag,
+    otherwise build the response via build_response() and tag it.
+    Clients have to revalidate on every use, so nothing stale is served after the data changed.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(build_response())
+
+    if response.status_code in (200, 304):
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -1,8 +1,11 @@
 from flask import Blueprint, jsonify, request, redirect, session
 import logging
 
-from services.api_services.leaderboard_service import get_full_leaderboard
-from api.exceptions import AuthorizationError, ScopeError
+from services.api_services.leaderboard_service import get_full_leaderboard, get_all_seasons, get_leaderboard_etag
+from services.api_services.version_service import get_data_version
+from api.exceptions import AuthorizationError, ScopeError, ParamError
+from api.etag import conditional_response
+from api.compression import compressed_response
 
 
 logger = logging.getLogger(__name__)
@@ -12,16 +15,43 @@ leaderboard_blueprint = Blueprint('leaderboard', __name__)
 @leaderboard_blueprint.route('', methods=['GET'])
 def leaderboard():
     """
-    Generate and return the total leaderboard as well as all sub-leaderboards.
+    Generate and return the total leaderboard as well as all sub-leaderboards
+    of a season (query parameter 'season', default: the current season).
     """
     if not session.get("user_id"):
         logger.info("Not logged in.")
         return jsonify({"error": "unauthenticated"}), 401
 
-    logger.info("Leaderboard request received.")
+    season_id = request.args.get("season")
+    logger.info(f"Leaderboard request received, season: {season_id}")
+    def build_response():
+        season, athlete_activities = get_full_leaderboard(season_id)
+        return jsonify({"season": season.to_dict(), "leaderboard": athlete_activities}), 200
+
     try:
-        athlete_activities = get_full_leaderboard()
-        return jsonify({"leaderboard": athlete_activities}), 200
+        version = get_data_version()
+        etag = get_leaderboard_etag(season_id)
+        return conditional_response(etag, lambda: compressed_response(("leaderboard", etag), version, build_response))
+    except ParamError as e:
+        logger.error(f"Param error: {str(e)}")
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
         logger.error(f"Error generating leaderboard: {e}")
         return jsonify({"error": "Failed to generate leaderboard"}), 500
+
+
+@leaderboard_blueprint.route('/seasons', methods=['GET'])
+def seasons():
+    """
+    Return all challenge seasons.
+    """
+    if not session.get("user_id"):
+        logger.info("Not logged in.")
+        return jsonify({"error": "unauthenticated"}), 401
+
+    logger.info("Seasons request received.")
+    try:
+        return conditional_response(str(get_data_version()), lambda: (jsonify(get_all_seasons()), 200))
+    except Exception as e:
+        logger.error(f"Error fetching seasons: {e}")
+        return jsonify({"error": "Failed to fetch seasons"}), 500
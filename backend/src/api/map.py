@@ -1,23 +1,77 @@
 from flask import Blueprint, jsonify, request, Response, session, after_this_request
-from services.api_services.map_service import get_activities_with_polylines, get_all_athletes, get_all_years
+from services.api_services.map_service import (
+    get_activities_with_polylines,
+    iter_activities_with_polylines,
+    get_activities_binary,
+    get_activities_page,
+    get_map_changes,
+    get_tile,
+    get_map_slices,
+    get_compressed_map_slices,
+    get_all_athletes,
+    get_all_years,
+)
+from services.api_services.heatmap_service import get_heatmap_tile
+from services.core_services.map_tiles import MAX_TILE_ZOOM
+from services.api_services.version_service import get_data_version
+from api.etag import conditional_response
+from api.compression import compressed_response, framed_response
+from utils.json_stream import stream_json_array, join_json_array, join_compressed_json_array, prefetch, ORJSON_OPTIONS
+from utils.geometry import select_lod, parse_bbox
+from utils.pagination import parse_cursor
+from utils import route_buffer
 import logging
 import orjson
 import cProfile
 import pstats
 import io
 
-ARGS_LIMIT = 7
+# number of activities serialized per chunk of a streamed map response
+STREAM_BATCH_SIZE = 200
+# largest page_size of a paginated map request
+MAX_PAGE_SIZE = 5000
+# "json" ships the route as GeoJSON coordinates, "encoded" as Google encoded polyline string,
+# "binary" all routes as typed arrays (see utils.route_buffer)
+MAP_FORMATS = ("json", "encoded", "binary")
+HEATMAP_FORMATS = ("png", "array")
 
 logger = logging.getLogger(__name__)
 
 map_blueprint = Blueprint('map', __name__)
 
+
+def is_valid_tile(z, x, y):
+    """
+    Check that z/x/y addresses an existing web mercator tile up to the maximum zoom.
+    """
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def parse_int_list(name):
+    """
+    Parse and flatten a query parameter of comma separated integers, which may be repeated.
+    """
+    return [
+        int(value.strip())
+        for item in request.args.getlist(name)
+        for value in item.split(',')
+    ]
+
+
 @map_blueprint.route('/', methods=['GET'])
 @map_blueprint.route('', methods=['GET'])
 def map():
     """
     Return a list of all the activities that have a polyline and are associated
     with the athlete ID(s) and year(s).
+    The list is streamed in batches unless stream=false is passed. Without bbox it is joined from
+    the per (athlete, year) slices of the slice cache.
+    With format=encoded the routes are returned as encoded polyline strings instead of GeoJSON,
+    with format=binary as binary columnar buffer, which is never streamed.
+    With zoom (map zoom level) or tolerance (in degrees) the routes are simplified accordingly.
+    With bbox=minLng,minLat,maxLng,maxLat only routes intersecting that viewport are returned.
+    With page_size (and the cursor of the previous page) the activities are returned in pages of
+    {"activities": [...], "next_cursor": ...}, the last page has no next_cursor.
     """
 
     if not session.get("user_id"):
@@ -25,43 +79,107 @@ def map():
         return jsonify({"error": "unauthenticated"}), 401
 
     try:
-        # Parse and flatten the 'years' parameter
-        years_raw = request.args.getlist('years')
-        years = [
-            int(year.strip())
-            for item in years_raw
-            for year in item.split(',')
-        ]
-
-        # Parse and flatten the 'athletes' parameter
-        athlete_ids_raw = request.args.getlist('athletes')
-        athlete_ids = [
-            int(athlete_id.strip())
-            for item in athlete_ids_raw
-            for athlete_id in item.split(',')
-        ]
+        years = parse_int_list('years')
+        athlete_ids = parse_int_list('athletes')
     except ValueError as e:
         logger.error(f"Invalid input provided: {e}")
         return jsonify({"error": "Invalid athlete IDs or years"}), 400
 
+    try:
+        zoom = int(request.args['zoom']) if 'zoom' in request.args else None
+        tolerance = float(request.args['tolerance']) if 'tolerance' in request.args else None
+        bbox = parse_bbox(request.args['bbox']) if 'bbox' in request.args else None
+    except ValueError as e:
+        logger.error(f"Invalid input provided: {e}")
+        return jsonify({"error": "Invalid zoom, tolerance or bbox"}), 400
+    lod = select_lod(zoom, tolerance)
+    lod = str(lod) if lod is not None else None
+
+    stream = request.args.get('stream', 'true').lower() != 'false'
+    map_format = request.args.get('format', 'json')
+    if map_format not in MAP_FORMATS:
+        logger.error(f"Invalid format: {map_format}")
+        return jsonify({"error": f"Invalid format, expected one of {', '.join(MAP_FORMATS)}"}), 400
+    encoded = map_format == "encoded"
+
+    cursor = request.args.get('cursor')
+    try:
+        page_size = int(request.args['page_size']) if 'page_size' in request.args else None
+        if cursor is not None:
+            parse_cursor(cursor)
+    except ValueError as e:
+        logger.error(f"Invalid input provided: {e}")
+        return jsonify({"error": "Invalid page_size or cursor"}), 400
+    paginated = page_size is not None or cursor is not None
+    if paginated:
+        if page_size is None:
+            page_size = MAX_PAGE_SIZE
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            logger.error(f"Invalid page_size: {page_size}")
+            return jsonify({"error": f"page_size has to be between 1 and {MAX_PAGE_SIZE}"}), 400
+        if map_format == "binary":
+            logger.error("Paginated binary format requested")
+            return jsonify({"error": "The binary format is not paginated"}), 400
+
     # profiler = cProfile.Profile()
     # profiler.enable()
 
-    response = None
-    if len(years) + len(athlete_ids) > ARGS_LIMIT:
-        logger.error(f"Too many args: {len(years) + len(athlete_ids)}")
-        response = jsonify({"error": "Too many args"}), 400
-    else:
-        logger.info(f"Map request received, years: {years}, athlete_ids: {athlete_ids}")
-        try:
-            activities = get_activities_with_polylines(years, athlete_ids)
-            response = Response(
-            orjson.dumps(activities, option=orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_SERIALIZE_NUMPY),
+    logger.info(f"Map request received, years: {years}, athlete_ids: {athlete_ids}")
+    def build_response(version):
+        if paginated:
+            activities, next_cursor = get_activities_page(years, athlete_ids, page_size, cursor, encoded, lod, bbox)
+            return Response(
+            orjson.dumps({"activities": activities, "next_cursor": next_cursor}, option=ORJSON_OPTIONS),
             mimetype='application/json'
             ), 200
-        except Exception as e:
-            logger.error(f"Error calling map service: {e}")
-            response = jsonify({"error": "Failed to retrieve map data"}), 500
+
+        if map_format == "binary":
+            buffer = get_activities_binary(years, athlete_ids, lod, bbox)
+            return Response(buffer, mimetype=route_buffer.MIMETYPE), 200
+
+        if bbox is None:
+            # whole (athlete, year) slices, served from the slice cache
+            slices = prefetch(get_map_slices(years, athlete_ids, version, encoded, lod))
+            body = join_json_array(slices) if stream else b"".join(join_json_array(slices))
+            return Response(body, mimetype='application/json'), 200
+
+        if stream:
+            # only one batch of activities is held in memory at a time
+            batches = prefetch(iter_activities_with_polylines(years, athlete_ids, STREAM_BATCH_SIZE, encoded, lod, bbox))
+            return Response(stream_json_array(batches), mimetype='application/json'), 200
+
+        activities = get_activities_with_polylines(years, athlete_ids, encoded, lod, bbox)
+        return Response(
+        orjson.dumps(activities, option=ORJSON_OPTIONS),
+        mimetype='application/json'
+        ), 200
+
+    def build_compressed_response(version):
+        if bbox is not None:
+            # arbitrary viewports aren't worth caching
+            return build_response(version)
+        if not paginated and map_format != "binary":
+            # joined from the slices compressed one by one, cached per slice and streamed
+            return framed_response(
+                lambda encoding: join_compressed_json_array(
+                    prefetch(get_compressed_map_slices(years, athlete_ids, version, encoding, encoded, lod)), encoding
+                ),
+                lambda: build_response(version),
+                stream,
+            )
+        # binary buffers and pages are built in memory anyway, their compressed bodies are cached whole
+        key = ("map", map_format, lod, tuple(sorted(set(athlete_ids))), tuple(sorted(set(years))))
+        if paginated:
+            key += (page_size, cursor)
+        mimetype = route_buffer.MIMETYPE if map_format == "binary" else 'application/json'
+        return compressed_response(key, version, lambda: build_response(version), mimetype)
+
+    try:
+        version = get_data_version()
+        response = conditional_response(str(version), lambda: build_compressed_response(version))
+    except Exception as e:
+        logger.error(f"Error calling map service: {e}")
+        response = jsonify({"error": "Failed to retrieve map data"}), 500
 
 
     # profiler.disable()  # Stop profiling
@@ -76,6 +194,113 @@ def map():
 
     return response
 
+@map_blueprint.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def tile(z, x, y):
+    """
+    Return the simplified routes of the athlete ID(s) and year(s) clipped to the web mercator tile z/x/y.
+    Every route holds its clipped pieces as encoded polyline strings in "segments".
+    """
+    if not session.get("user_id"):
+        logger.info("Not logged in.")
+        return jsonify({"error": "unauthenticated"}), 401
+
+    if not is_valid_tile(z, x, y):
+        logger.error(f"Invalid tile: {z}/{x}/{y}")
+        return jsonify({"error": "Invalid tile"}), 400
+
+    try:
+        years = parse_int_list('years')
+        athlete_ids = parse_int_list('athletes')
+    except ValueError as e:
+        logger.error(f"Invalid input provided: {e}")
+        return jsonify({"error": "Invalid athlete IDs or years"}), 400
+
+    try:
+        version = get_data_version()
+        return conditional_response(
+            str(version),
+            lambda: (Response(get_tile(z, x, y, athlete_ids, years, version), mimetype='application/json'), 200),
+        )
+    except Exception as e:
+        logger.error(f"Error rendering map tile {z}/{x}/{y}: {e}")
+        return jsonify({"error": "Failed to retrieve map tile"}), 500
+
+@map_blueprint.route('/heatmap/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def heatmap(z, x, y):
+    """
+    Return the route density of the athlete ID(s) and year(s) within the web mercator tile z/x/y
+    as PNG, or with format=array as 256 x 256 little endian uint32 grid.
+    """
+    if not session.get("user_id"):
+        logger.info("Not logged in.")
+        return jsonify({"error": "unauthenticated"}), 401
+
+    if not is_valid_tile(z, x, y):
+        logger.error(f"Invalid tile: {z}/{x}/{y}")
+        return jsonify({"error": "Invalid tile"}), 400
+
+    tile_format = request.args.get('format', 'png')
+    if tile_format not in HEATMAP_FORMATS:
+        logger.error(f"Invalid format: {tile_format}")
+        return jsonify({"error": f"Invalid format, expected one of {', '.join(HEATMAP_FORMATS)}"}), 400
+
+    try:
+        years = parse_int_list('years')
+        athlete_ids = parse_int_list('athletes')
+    except ValueError as e:
+        logger.error(f"Invalid input provided: {e}")
+        return jsonify({"error": "Invalid athlete IDs or years"}), 400
+
+    def build_response():
+        tile = get_heatmap_tile(z, x, y, athlete_ids, years, tile_format)
+        mimetype = 'image/png' if tile_format == 'png' else 'application/octet-stream'
+        return Response(tile, mimetype=mimetype), 200
+
+    try:
+        return conditional_response(str(get_data_version()), build_response)
+    except Exception as e:
+        logger.error(f"Error rendering heatmap tile {z}/{x}/{y}: {e}")
+        return jsonify({"error": "Failed to retrieve heatmap tile"}), 500
+
+@map_blueprint.route('/changes', methods=['GET'])
+def changes():
+    """
+    Return the changes of the activities of the athlete ID(s) and year(s) since the data version
+    since (the "version" of the previous response): {"version", "upserted", "deleted", "deleted_athletes"}.
+    Clients apply deleted_athletes, deleted and upserted in this order. With "reset": true the changes
+    aren't known anymore and the client has to fetch /api/map again.
+    With format=encoded the routes are returned as encoded polyline strings instead of GeoJSON.
+    """
+    if not session.get("user_id"):
+        logger.info("Not logged in.")
+        return jsonify({"error": "unauthenticated"}), 401
+
+    try:
+        since = int(request.args['since'])
+        years = parse_int_list('years')
+        athlete_ids = parse_int_list('athletes')
+    except (KeyError, ValueError) as e:
+        logger.error(f"Invalid input provided: {e}")
+        return jsonify({"error": "Invalid since, athlete IDs or years"}), 400
+
+    map_format = request.args.get('format', 'json')
+    if map_format not in ("json", "encoded"):
+        logger.error(f"Invalid format: {map_format}")
+        return jsonify({"error": "Invalid format, expected one of json, encoded"}), 400
+
+    try:
+        version = get_data_version()
+        return conditional_response(
+            str(version),
+            lambda: (Response(
+                orjson.dumps(get_map_changes(since, version, years, athlete_ids, map_format == "encoded"), option=ORJSON_OPTIONS),
+                mimetype='application/json',
+            ), 200),
+        )
+    except Exception as e:
+        logger.error(f"Error fetching map changes since {since}: {e}")
+        return jsonify({"error": "Failed to retrieve map changes"}), 500
+
 @map_blueprint.route('/athletes', methods=['GET'])
 def athletes():
     """
@@ -87,8 +312,11 @@ def athletes():
         return jsonify({"error": "unauthenticated"}), 401
 
     try:
-        all_athletes = get_all_athletes()
-        return jsonify(all_athletes), 200
+        version = get_data_version()
+        return conditional_response(
+            str(version),
+            lambda: compressed_response(("athletes",), version, lambda: (jsonify(get_all_athletes()), 200)),
+        )
     except Exception as e:
         logger.error(f"Error fetching athletes: {e}")
         return jsonify({"error": "Failed to fetch athletes"}), 500
@@ -105,21 +333,11 @@ def years():
         return jsonify({"error": "unauthenticated"}), 401
 
     try:
-        available_years = get_all_years()
-        return jsonify(available_years), 200
+        version = get_data_version()
+        return conditional_response(
+            str(version),
+            lambda: compressed_response(("years",), version, lambda: (jsonify(get_all_years()), 200)),
+        )
     except Exception as e:
         logger.error(f"Error fetching years: {e}")
         return jsonify({"error": "Failed to fetch years"}), 500
-
-@map_blueprint.route('/limit', methods=['GET'])
-def limit():
-    """
-    Return Limit for the amount of args to frontend
-    """
-    logger.info("Limit Request received.")
-
-    if not session.get("user_id"):
-        logger.info("Not logged in.")
-        return jsonify({"error": "unauthenticated"}), 401
-
-    return jsonify({"limit": ARGS_LIMIT}), 200
@@ -0,0 +1,49 @@
+from flask import Blueprint, jsonify, session
+import logging
+import os
+
+from services.api_services.map_service import get_cache_stats, get_strava_latency_stats
+
+
+logger = logging.getLogger(__name__)
+ops_blueprint = Blueprint('ops', __name__)
+
+# comma separated athlete IDs allowed to read the operational stats, nobody if unset
+ADMIN_ATHLETE_IDS = {int(athlete_id) for athlete_id in os.getenv("ADMIN_ATHLETE_IDS", "").split(",") if athlete_id.strip()}
+
+
+def check_admin():
+    """
+    Return the error response for requests not made by a logged in admin athlete, None for admins.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        logger.info("Not logged in.")
+        return jsonify({"error": "unauthenticated"}), 401
+    if int(user_id) not in ADMIN_ATHLETE_IDS:
+        logger.info(f"Athlete {user_id} is not an admin.")
+        return jsonify({"error": "forbidden"}), 403
+    return None
+
+
+@ops_blueprint.route('/cache', methods=['GET'])
+def cache():
+    """
+    Return the entries, size and hit/miss counters of the map slice, tile and compressed response caches.
+    """
+    error = check_admin()
+    if error:
+        return error
+
+    return jsonify(get_cache_stats()), 200
+
+@ops_blueprint.route('/latency', methods=['GET'])
+def latency():
+    """
+    Return the latency histograms and approximate p50/p95 of the Strava API calls per endpoint.
+    """
+    error = check_admin()
+    if error:
+        return error
+
+    return jsonify(get_strava_latency_stats()), 200
@@ -10,8 +10,11 @@ import gc
 from repositories.athlete_repo import AthleteRepository
 from utils.db_mongo import MongoDB
 from scripts.seed_data import seed_athletes, seed_activities
+from services.core_services.leaderboard_totals import rebuild_leaderboard_totals
+from services.core_services.task_service import TaskService
 from api.auth import auth_blueprint
 from api.map import map_blueprint
+from api.ops import ops_blueprint
 from api.webhook import webhook_blueprint
 from api.leaderboard import leaderboard_blueprint
 from config.log_config import setup_logging
@@ -52,6 +55,7 @@ Session(app)
 # Register blueprints
 app.register_blueprint(auth_blueprint, url_prefix='/api/auth')
 app.register_blueprint(map_blueprint, url_prefix='/api/map')
+app.register_blueprint(ops_blueprint, url_prefix='/api/ops')
 app.register_blueprint(webhook_blueprint, url_prefix='/api/webhook')
 app.register_blueprint(leaderboard_blueprint, url_prefix='/api/leaderboard')
 
@@ -83,6 +87,7 @@ def seed_database_if_empty():
         seed_athletes("./data/athletes.json")
         seed_activities("./data/activities.json")
         seed_activities("./data/activities2.json")
+        rebuild_leaderboard_totals()
         logger.info("Database seeding completed.")
     else:
         logger.info("Database already contains data. Skipping seeding.")
@@ -91,6 +96,7 @@ def seed_database_if_empty():
 if __name__ == "__main__":
     try:
         logger.info("Running Flask development server...")
+        TaskService().start()
         app.run(host="0.0.0.0", port=8080)
         logger.info("Running in production mode.")
     except Exception as e:
@@ -1,33 +1,187 @@
 from datetime import datetime
+from itertools import chain
 from utils.datetime_utils import parse_datetime
-from polyline import decode as decode_polyline
+from utils.geometry import LOD_ZOOMS, zoom_tolerance, simplify_douglas_peucker
+from utils.route_buffer import COORDINATE_SCALE, decode_polylines
+from utils.lazy_document import LazyDocument, LazyField
+from polyline import encode as encode_polyline
 import logging
+import numpy as np
+import orjson
 
 
 logger = logging.getLogger(__name__)
 
+# fields of an activity document served by the map, in document order
+MAP_FIELDS = ("activity_id", "athlete_id", "name", "type", "moving_time", "distance", "summary_polyline", "url", "year")
+
+
+def render_map_fragment(doc: dict):
+    """
+    Serialize the map fields of an activity document to the JSON served by /api/map, None without polyline.
+    """
+    if not doc.get("summary_polyline"):
+        return None
+    return orjson.dumps({field: doc[field] for field in MAP_FIELDS if field in doc})
+
+def as_points(coordinates) -> np.ndarray:
+    """
+    Coordinate pairs as an (n, 2) float64 array, malformed coordinates give an empty array.
+    """
+    if isinstance(coordinates, np.ndarray):
+        points = coordinates.astype(np.float64, copy=False)
+        return points if points.ndim == 2 and points.shape[1] == 2 else np.zeros((0, 2))
+    try:
+        # flattening the pairs is about twice as fast as np.asarray on nested lists
+        values = np.fromiter(chain.from_iterable(coordinates), dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.zeros((0, 2))
+    if len(values) != 2 * len(coordinates):
+        return np.zeros((0, 2))
+    return values.reshape(-1, 2)
+
+
 class GeoJSONLineString:
-    def __init__(self, type: str, coordinates: list[list[float]]):
+    """
+    GeoJSON LineString with (lat, lng) coordinates backed by a float64 NumPy array. Lines read from MongoDB
+    keep the stored (lng, lat) coordinates and only convert them on first access, the axis swap is a view.
+    """
+    __slots__ = ("type", "_points", "_mongo_coordinates")
+
+    def __init__(self, type: str, coordinates=None):
         self.type = type
-        self.coordinates = coordinates
+        self._points = None
+        self._mongo_coordinates = None
+        if coordinates is not None:
+            self.coordinates = coordinates
+
+    @property
+    def points(self) -> np.ndarray:
+        """The (lat, lng) coordinates as (n, 2) array, do not modify."""
+        if self._points is None:
+            self._points = as_points(self._mongo_coordinates)[:, ::-1]
+        return self._points
+
+    @property
+    def coordinates(self) -> list[list[float]]:
+        """A copy of the (lat, lng) coordinates as lists."""
+        return self.points.tolist()
+
+    @coordinates.setter
+    def coordinates(self, coordinates):
+        self._points = as_points(coordinates)
+        self._mongo_coordinates = None
+
+    @classmethod
+    def from_encoded(cls, encoded_polyline: str):
+        """Decode a Google encoded polyline with vectorized NumPy operations."""
+        _, coordinates = decode_polylines([encoded_polyline])
+        return cls(type="LineString", coordinates=coordinates / COORDINATE_SCALE)
 
     @classmethod
     def from_mongo(cls, data):
-        """Convert MongoDB GeoJSON data to GeoJSONLineString instance (swap longitude and latitude)."""
-        return cls(
-            type=data["type"],
-            coordinates=[[coord[1], coord[0]] for coord in data["coordinates"]],
-        )
+        """Convert MongoDB GeoJSON data to GeoJSONLineString instance, the coordinates are swapped lazily."""
+        line = cls(type=data["type"])
+        line._mongo_coordinates = data["coordinates"]
+        return line
 
     def to_mongo(self):
         """Convert GeoJSONLineString instance to a MongoDB-compatible dictionary (swap latitude and longitude)."""
+        if self._mongo_coordinates is not None:
+            # read from MongoDB and unchanged, nothing to convert
+            return {"type": self.type, "coordinates": self._mongo_coordinates}
         return {
             "type": self.type,
-            "coordinates": [[coord[1], coord[0]] for coord in self.coordinates],
+            "coordinates": self.points[:, ::-1].tolist(),
+        }
+
+    def encode(self):
+        """Encode the coordinates as a Google encoded polyline string."""
+        return encode_polyline(self.coordinates)
+
+    def simplify(self):
+        """
+        Encoded Douglas-Peucker simplifications of the line per precomputed zoom level (as string keys).
+        Levels that would not drop any point are left out, the full encoded polyline serves them.
+        """
+        coordinates = self.coordinates
+        levels = {}
+        for zoom in LOD_ZOOMS:
+            simplified = simplify_douglas_peucker(coordinates, zoom_tolerance(zoom))
+            if len(simplified) < len(coordinates):
+                levels[str(zoom)] = encode_polyline(simplified)
+        return levels
+
+    def route_fields(self, encoded_polyline: str = None):
+        """
+        Fields derived from the line: the compact encoded string served by the map, its
+        simplified variants for lower zoom levels and the bounding box the 2dsphere index works on.
+        """
+        return {
+            "encoded_polyline": encoded_polyline or self.encode(),
+            "simplified_polylines": self.simplify(),
+            "bbox": self.bbox_to_mongo(),
+        }
+
+    def bbox_to_mongo(self):
+        """
+        Slim GeoJSON geometry covering the bounding box of the line (longitude first), for the 2dsphere index.
+        Degenerate boxes of straight north-south/east-west lines or single points fall back to a LineString/Point.
+        """
+        min_lat, min_lng = self.points.min(axis=0).tolist()
+        max_lat, max_lng = self.points.max(axis=0).tolist()
+
+        if min_lat == max_lat and min_lng == max_lng:
+            return {"type": "Point", "coordinates": [min_lng, min_lat]}
+        if min_lat == max_lat or min_lng == max_lng:
+            return {"type": "LineString", "coordinates": [[min_lng, min_lat], [max_lng, max_lat]]}
+        return {
+            "type": "Polygon",
+            "coordinates": [[
+                [min_lng, min_lat],
+                [max_lng, min_lat],
+                [max_lng, max_lat],
+                [min_lng, max_lat],
+                [min_lng, min_lat],
+            ]],
         }
 
 
-class Activity:
+def polyline_from_mongo(data):
+    return GeoJSONLineString.from_mongo(data) if data else None
+
+
+class Activity(LazyDocument):
+    """
+    An activity and its route. Activities read from MongoDB keep the raw document and only convert
+    the fields that are accessed, e.g. the leaderboard never parses routes or dates it doesn't need.
+    """
+    _fields = {
+        "activity_id": LazyField(),
+        "athlete_id": LazyField(),
+        "name": LazyField(),
+        "type": LazyField(),
+        "start_date": LazyField(parse=parse_datetime),
+        "moving_time": LazyField(),
+        "distance": LazyField(),
+        "total_elevation_gain": LazyField(),
+        "polyline": LazyField("summary_polyline", parse=polyline_from_mongo, required=False),
+        "encoded_polyline": LazyField(required=False),
+        "kudos": LazyField(),
+        "suffer_score": LazyField(),
+        "url": LazyField(),
+        "year": LazyField(),
+        "elapsed_time": LazyField(required=False),
+        "commute": LazyField(required=False),
+        "average_speed": LazyField(required=False),
+        "max_speed": LazyField(required=False),
+        "has_heartrate": LazyField(required=False),
+        "max_watts": LazyField(required=False),
+        "description": LazyField(required=False),
+        "calories": LazyField(required=False),
+    }
+    __slots__ = tuple(_fields)
+
     def __init__(
         self,
         activity_id: int,
@@ -51,7 +205,9 @@ class Activity:
         description: str = None,
         calories: float = None,
         polyline: GeoJSONLineString = None,
+        encoded_polyline: str = None,
     ):
+        self._doc = None
         self.activity_id = activity_id
         self.athlete_id = athlete_id
         self.name = name
@@ -61,6 +217,7 @@ class Activity:
         self.distance = distance
         self.total_elevation_gain = total_elevation_gain
         self.polyline = polyline
+        self.encoded_polyline = encoded_polyline
         self.kudos = kudos
         self.suffer_score = suffer_score
         self.url = url
@@ -76,36 +233,20 @@ class Activity:
 
     @classmethod
     def from_mongo(cls, data):
-        """Convert MongoDB document to Route instance."""
-        polyline_data = data.get("summary_polyline")
-        polyline = GeoJSONLineString.from_mongo(polyline_data) if polyline_data else None
-        return cls(
-            activity_id=data["activity_id"],
-            athlete_id=data["athlete_id"],
-            name=data["name"],
-            type=data["type"],
-            start_date=data["start_date"],
-            moving_time=data["moving_time"],
-            distance=data["distance"],
-            total_elevation_gain=data["total_elevation_gain"],
-            polyline=polyline,
-            kudos=data["kudos"],
-            suffer_score=data["suffer_score"],
-            url=data["url"],
-            year=data["year"],
-            elapsed_time=data.get("elapsed_time"),
-            commute=data.get("commute"),
-            average_speed=data.get("average_speed"),
-            max_speed=data.get("max_speed"),
-            has_heartrate=data.get("has_heartrate"),
-            max_watts=data.get("max_watts"),
-            description=data.get("description"),
-            calories=data.get("calories"),
-        )
+        """Convert MongoDB document to Route instance, the fields are converted when they are accessed."""
+        return cls.from_document(data)
+
+    def route_fields(self):
+        """
+        Fields derived from the polyline, stored next to the GeoJSON summary_polyline.
+        """
+        if not self.polyline or not len(self.polyline.points):
+            return {"encoded_polyline": None, "simplified_polylines": None, "bbox": None}
+        return self.polyline.route_fields(self.encoded_polyline)
 
     def to_mongo(self):
         """Convert Route instance to a MongoDB-compatible dictionary."""
-        return {
+        doc = {
             "activity_id": self.activity_id,
             "athlete_id": self.athlete_id,
             "name": self.name,
@@ -127,7 +268,11 @@ class Activity:
             "max_watts": self.max_watts,
             "description": self.description,
             "calories": self.calories,
+            **self.route_fields(),
         }
+        # pre-rendered map JSON, spliced into map responses without decoding the document
+        doc["map_fragment"] = render_map_fragment(doc)
+        return doc
 
     @staticmethod
     def create_activity_from_data(activity_data: dict, athlete_id: int):
@@ -140,10 +285,10 @@ class Activity:
             raise Exception("No activity Id found.")
 
         summary_polyline = activity_data.get("map", {}).get("summary_polyline")
-        decoded_coordinates = None
+        polyline = None
         if summary_polyline:
             try:
-                decoded_coordinates = decode_polyline(summary_polyline)
+                polyline = GeoJSONLineString.from_encoded(summary_polyline)
             except Exception as e:
                 logger.warning(f"Failed to decode polyline for activity {activity_id}: {e}")
 
@@ -170,10 +315,7 @@ class Activity:
             max_watts=activity_data.get("max_watts", 0),
             description=activity_data.get("description", ""),
             calories=activity_data.get("calories", 0),
-            polyline=GeoJSONLineString(
-                type="LineString",
-                coordinates=decoded_coordinates
-            ) if decoded_coordinates else None,
-
+            polyline=polyline if polyline and len(polyline.points) else None,
+            encoded_polyline=summary_polyline if polyline and len(polyline.points) else None,
         )
         return activity
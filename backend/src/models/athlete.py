@@ -1,20 +1,41 @@
 from datetime import datetime
 from utils.datetime_utils import parse_datetime
+from utils.lazy_document import LazyDocument, LazyField
 
 class Profile:
+    __slots__ = ("medium", "full")
+
     def __init__(self, medium: str, full: str):
         self.medium = medium
         self.full = full
 
 
 class Tokens:
+    __slots__ = ("access_token", "refresh_token", "expires_at")
+
     def __init__(self, access_token: str, refresh_token: str, expires_at: int):
         self.access_token = access_token
         self.refresh_token = refresh_token
         self.expires_at = expires_at
 
 
-class Athlete:
+class Athlete(LazyDocument):
+    """
+    A registered athlete. Athletes read from MongoDB keep the raw document and convert fields on first access.
+    """
+    _fields = {
+        "athlete_id": LazyField(),
+        "username": LazyField(),
+        "first_name": LazyField(),
+        "last_name": LazyField(),
+        "created_at": LazyField(parse=parse_datetime),
+        "profile": LazyField(),
+        "tokens": LazyField(),
+        # written by the activity sync only, see AthleteRepository.update_sync_cursor
+        "sync_cursor": LazyField(required=False),
+    }
+    __slots__ = tuple(_fields)
+
     def __init__(
         self,
         athlete_id: int,
@@ -25,6 +46,7 @@ class Athlete:
         profile: Profile,
         tokens: Tokens,
     ):
+        self._doc = None
         self.athlete_id = athlete_id
         self.username = username
         self.first_name = first_name
@@ -32,21 +54,14 @@ class Athlete:
         self.created_at = parse_datetime(created_at)
         self.profile = profile
         self.tokens = tokens
+        self.sync_cursor = None
 
     @classmethod
     def from_mongo(cls, data):
         """
-        Convert a MongoDB document to an Athlete instance.
+        Convert a MongoDB document to an Athlete instance, the fields are converted when they are accessed.
         """
-        return cls(
-            athlete_id=data["athlete_id"],
-            username=data["username"],
-            first_name=data["first_name"],
-            last_name=data["last_name"],
-            created_at=data["created_at"],
-            profile=data["profile"],
-            tokens=data["tokens"],
-        )
+        return cls.from_document(data)
 
     def to_mongo(self):
         """
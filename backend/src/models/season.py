@@ -0,0 +1,80 @@
+from datetime import datetime
+from utils.datetime_utils import parse_datetime, to_naive_utc
+
+
+class Season:
+    def __init__(
+        self,
+        season_id: str,
+        name: str,
+        start_date: datetime,
+        end_date: datetime,
+        categories: dict,
+        athlete_ids: list[int] = None,
+        totals_materialized: bool = False,
+    ):
+        self.season_id = season_id
+        self.name = name
+        self.start_date = to_naive_utc(parse_datetime(start_date))
+        self.end_date = to_naive_utc(parse_datetime(end_date))  # exclusive
+        self.categories = categories  # activity type -> category, keep sorted by category!
+        self.athlete_ids = athlete_ids  # None means every athlete takes part
+        self.totals_materialized = totals_materialized  # leaderboardTotals hold the season's complete totals
+
+    def includes_athlete(self, athlete_id: int) -> bool:
+        return self.athlete_ids is None or athlete_id in self.athlete_ids
+
+    def includes_date(self, date: datetime) -> bool:
+        return self.start_date <= to_naive_utc(parse_datetime(date)) < self.end_date
+
+    def category_for(self, activity):
+        """
+        Return the category an activity counts for in this season, None if it doesn't count.
+        """
+        if not self.includes_athlete(activity.athlete_id) or not self.includes_date(activity.start_date):
+            return None
+        return self.categories.get(activity.type)
+
+    def category_names(self):
+        """
+        Return the category names in the order of the category mapping.
+        """
+        return list(dict.fromkeys(self.categories.values()))
+
+    @classmethod
+    def from_mongo(cls, data):
+        """
+        Convert a MongoDB document to a Season instance.
+        """
+        return cls(
+            season_id=data["season_id"],
+            name=data["name"],
+            start_date=data["start_date"],
+            end_date=data["end_date"],
+            categories=data["categories"],
+            athlete_ids=data.get("athlete_ids"),
+            totals_materialized=data.get("totals_materialized", False),
+        )
+
+    def to_mongo(self):
+        """
+        Convert a Season instance to a MongoDB-compatible dictionary.
+        """
+        return {
+            "season_id": self.season_id,
+            "name": self.name,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "categories": self.categories,
+            "athlete_ids": self.athlete_ids,
+            "totals_materialized": self.totals_materialized,
+        }
+
+    def to_dict(self):
+        return {
+            "season_id": self.season_id,
+            "name": self.name,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "categories": self.category_names(),
+        }
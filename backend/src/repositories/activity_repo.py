@@ -1,14 +1,76 @@
-from pymongo import ReturnDocument
+from datetime import datetime, timezone
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.errors import PyMongoError
-from utils.db_mongo import MongoDB
-from models.activity import Activity, GeoJSONLineString
+from utils.db_mongo import MongoDB, ensure_indexes
+from models.activity import Activity, GeoJSONLineString, MAP_FIELDS, render_map_fragment
+from utils.geometry import LOD_ZOOMS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# fields of an activity that the map doesn't need
+POLYLINE_PROJECTION = {
+    "_id": 0,
+    "kudos": 0,
+    "suffer_score": 0,
+    "total_elevation_gain": 0,
+    "start_date": 0,
+    "elapsed_time": 0,
+    "commute": 0,
+    "average_speed": 0,
+    "max_speed": 0,
+    "has_heartrate": 0,
+    "max_watts": 0,
+    "description": 0,
+    "calories": 0,
+    "encoded_polyline": 0,
+    "simplified_polylines": 0,
+    "bbox": 0,
+    "map_fragment": 0,}
+
+# stable order of the map routes, served by the {athlete_id, activity_id} index and used as pagination key
+MAP_SORT = [("athlete_id", -1), ("activity_id", -1)]
+
+INDEXES = [
+    ([("activity_id", 1)], {"unique": True}),
+    (MAP_SORT, {}),
+]
+
+# fields computed from the others at ingest, they match whenever the fields they are derived from do
+DERIVED_FIELDS = ("encoded_polyline", "simplified_polylines", "bbox", "map_fragment")
+
+# what a bulk upsert reads of the stored activities to detect changes and compute the deltas of updates
+STORED_FIELDS_PROJECTION = {"_id": 0, **{field: 0 for field in DERIVED_FIELDS}}
+
+# the map in the encoded format only ships the compact polyline string
+ENCODED_POLYLINE_PROJECTION = {
+    **{field: 0 for field in POLYLINE_PROJECTION if field != "encoded_polyline"},
+    "summary_polyline": 0,
+}
+
+
+def stored_value(value):
+    """
+    A value as pymongo reads it back: datetimes are naive UTC.
+    """
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_stored(stored: dict, doc: dict) -> bool:
+    """
+    Check if a stored activity document already holds every field of doc.
+    """
+    return all(field in stored and stored_value(stored[field]) == stored_value(value) for field, value in doc.items())
+
+
 class ActivityRepository:
     def __init__(self):
         self.collection = MongoDB.get_instance().activities
+        ensure_indexes(self.collection, INDEXES)
 
     @staticmethod
     def is_valid_polyline(polyline: GeoJSONLineString) -> bool:
@@ -16,7 +78,7 @@ class ActivityRepository:
         Check if a GeoJSONLineString is valid.
         A valid polyline must have at least two coordinates.
         """
-        return polyline and polyline.type == "LineString" and len(polyline.coordinates) >= 2
+        return polyline and polyline.type == "LineString" and len(polyline.points) >= 2
     def create_activity(self, activity: Activity):
         """
         Insert a new Activity into the database.
@@ -46,15 +108,30 @@ class ActivityRepository:
         """
         Update an Activity by its ActivityID.
         """
+        return self.update_activity_returning_stored(activity_id, update)[1]
+
+    def update_activity_returning_stored(self, activity_id: int, update: dict):
+        """
+        Update an Activity by its ActivityID with a single atomic write and return the stored Activity
+        it replaced along with the updated one, so the deltas of the update are exact.
+        """
         try:
-            updated_data = self.collection.find_one_and_update(
+            stored_data = self.collection.find_one_and_update(
                 {"activity_id": activity_id},
                 {"$set": update},
-                return_document=ReturnDocument.AFTER,
+                return_document=ReturnDocument.BEFORE,
             )
-            if not updated_data:
+            if not stored_data:
                 raise Exception(f"No activity found with ActivityID {activity_id}")
-            return Activity.from_mongo(updated_data)
+            updated_data = {**stored_data, **update}
+            if any(field in MAP_FIELDS for field in update):
+                # keep the pre-rendered map JSON in step with the fields it contains
+                updated_data["map_fragment"] = render_map_fragment(updated_data)
+                self.collection.update_one(
+                    {"activity_id": activity_id},
+                    {"$set": {"map_fragment": updated_data["map_fragment"]}},
+                )
+            return Activity.from_mongo(stored_data), Activity.from_mongo(updated_data)
         except PyMongoError as e:
             raise Exception(f"Failed to update activity: {e}")
 
@@ -82,17 +159,37 @@ class ActivityRepository:
         except PyMongoError as e:
             raise Exception(f"Failed to list activities: {e}")
 
-    def find_activities_by_athlete_and_type_with_year2025(self, athlete_id: int, activity_type: str):
+    def sum_moving_time_by_athlete_and_type(self, activity_types, start_date: datetime, end_date: datetime, athlete_ids=None):
         """
-        Find all Activities by AthleteID and Type for 2025.
+        Sum the moving time and count the Activities of the given Types that started in
+        [start_date, end_date) in a single aggregation, optionally only for the given AthleteIDs.
+        Returns a dict {(athlete_id, type): (moving_time, activity_count)}.
         """
         try:
-            query = {"athlete_id": athlete_id, "type": activity_type, "year": 2025}
-            cursor = self.collection.find(query)
-            activities = [Activity.from_mongo(doc) for doc in cursor]
-            return activities
+            match = {
+                "type": {"$in": list(activity_types)},
+                # year narrows the scan down to the {athlete_id, type, year} index
+                "year": {"$in": list(range(start_date.year, end_date.year + 1))},
+                "start_date": {"$gte": start_date, "$lt": end_date},
+            }
+            if athlete_ids is not None:
+                match["athlete_id"] = {"$in": list(athlete_ids)}
+
+            pipeline = [
+                {"$match": match},
+                {"$group": {
+                    "_id": {"athlete_id": "$athlete_id", "type": "$type"},
+                    "moving_time": {"$sum": "$moving_time"},
+                    "activity_count": {"$sum": 1},
+                }},
+            ]
+            return {
+                (doc["_id"]["athlete_id"], doc["_id"]["type"]): (doc["moving_time"], doc["activity_count"])
+                for doc in self.collection.aggregate(pipeline)
+            }
         except PyMongoError as e:
-            raise Exception(f"Failed to find activities for athlete_id={athlete_id} and type={activity_type}: {e}")
+            raise Exception(f"Failed to aggregate moving time between {start_date} and {end_date}: {e}")
+
     def find_activities_by_athlete_and_type(self, athlete_id: int, activity_type: str):
         """
         Find all Activities by AthleteID and Type.
@@ -115,41 +212,255 @@ class ActivityRepository:
         except PyMongoError as e:
             raise Exception(f"Failed to fetch years: {e}")
 
-    def list_activities_with_polylines(self, athlete_ids, years):
+    @staticmethod
+    def polyline_query(athlete_ids, years, encoded: bool = False, lod: str = None, viewport: dict = None):
         """
-        Fetch all activities with polylines for the given athlete IDs and years.
+        Query and projection for all activities with polylines of the given athlete IDs and years.
+        With encoded=True the polyline is returned as encoded string instead of GeoJSON,
+        with lod additionally the simplified polyline of that zoom level.
+        With a viewport (GeoJSON polygon) only routes intersecting it are matched.
         """
-        try:
-            query = {
-                "athlete_id": {"$in": athlete_ids},
-                "year": {"$in": years},
-                "summary_polyline": { "$ne": None},
-                "type": {"$nin": ["VirtualRide", "VirtualRun"]},
-            }
+        query = {
+            "athlete_id": {"$in": athlete_ids},
+            "year": {"$in": years},
+            "type": {"$nin": ["VirtualRide", "VirtualRun"]},
+        }
+        if viewport is not None:
+            # served by the 2dsphere index on summary_polyline
+            query["summary_polyline"] = {"$geoIntersects": {"$geometry": viewport}}
+        if lod is not None:
+            query["encoded_polyline"] = {"$ne": None}
+            projection = {field: 0 for field in ENCODED_POLYLINE_PROJECTION if field != "simplified_polylines"}
+            projection.update({f"simplified_polylines.{zoom}": 0 for zoom in LOD_ZOOMS if str(zoom) != lod})
+            return query, projection
+        if encoded:
+            query["encoded_polyline"] = {"$ne": None}
+            return query, ENCODED_POLYLINE_PROJECTION
+        query.setdefault("summary_polyline", {"$ne": None})
+        return query, POLYLINE_PROJECTION
 
-            projection = {
-                "_id": 0,
-                "kudos": 0,
-                "suffer_score": 0,
-                "total_elevation_gain": 0,
-                "start_date": 0,
-                "elapsed_time": 0,
-                "commute": 0,
-                "average_speed": 0,
-                "max_speed": 0,
-                "has_heartrate": 0,
-                "max_watts": 0,
-                "description": 0,
-                "calories": 0,}
+    @staticmethod
+    def apply_lod(doc: dict, lod: str):
+        """
+        Replace the encoded polyline of a document queried with lod by its simplified variant.
+        Routes without one are already simple enough and keep the full polyline.
+        """
+        simplified = (doc.pop("simplified_polylines", None) or {}).get(lod)
+        if simplified:
+            doc["encoded_polyline"] = simplified
+        return doc
 
+    def list_activities_with_polylines(self, athlete_ids, years, encoded: bool = False, lod: str = None, viewport: dict = None):
+        """
+        Fetch all activities with polylines for the given athlete IDs and years.
+        """
+        try:
             results = list(
-                self.collection.find(query, projection).sort("athlete_id", -1)
+                self.collection.find(*self.polyline_query(athlete_ids, years, encoded, lod, viewport)).sort(MAP_SORT)
             )
+            if lod is not None:
+                results = [self.apply_lod(doc, lod) for doc in results]
             return results
         except PyMongoError as e:
             logger.error(f"Failed to list activities with polylines: {e}")
             return []
 
+    def list_activities_by_ids(self, activity_ids, athlete_ids, years, encoded: bool = False):
+        """
+        Fetch the activities with polylines among activity_ids that belong to the given athlete IDs and years.
+        """
+        query, projection = self.polyline_query(athlete_ids, years, encoded)
+        query["activity_id"] = {"$in": list(activity_ids)}
+        try:
+            return list(self.collection.find(query, projection).sort(MAP_SORT))
+        except PyMongoError as e:
+            raise Exception(f"Failed to list activities by ids: {e}")
+
+    def list_activities_page(
+        self, athlete_ids, years, page_size: int, after=None, encoded: bool = False, lod: str = None, viewport: dict = None
+    ):
+        """
+        Fetch one page of the activities with polylines for the given athlete IDs and years in MAP_SORT order,
+        starting after the (athlete_id, activity_id) key of the last activity of the previous page.
+        Returns the activities and the key to continue after, None on the last page.
+        """
+        query, projection = self.polyline_query(athlete_ids, years, encoded, lod, viewport)
+        if after is not None:
+            athlete_id, activity_id = after
+            query["$or"] = [
+                {"athlete_id": {"$lt": athlete_id}},
+                {"athlete_id": athlete_id, "activity_id": {"$lt": activity_id}},
+            ]
+        try:
+            # one more than requested tells whether there is a next page
+            results = list(self.collection.find(query, projection).sort(MAP_SORT).limit(page_size + 1))
+        except PyMongoError as e:
+            raise Exception(f"Failed to list a page of activities with polylines: {e}")
+
+        next_key = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_key = (results[-1]["athlete_id"], results[-1]["activity_id"])
+        if lod is not None:
+            results = [self.apply_lod(doc, lod) for doc in results]
+        return results, next_key
+
+    def iter_activities_with_polylines(
+        self, athlete_ids, years, batch_size: int = 200, encoded: bool = False, lod: str = None, viewport: dict = None
+    ):
+        """
+        Yield the activities with polylines for the given athlete IDs and years in lists of
+        batch_size documents, so only one batch is held in memory at a time.
+        """
+        try:
+            cursor = self.collection.find(
+                *self.polyline_query(athlete_ids, years, encoded, lod, viewport), batch_size=batch_size
+            ).sort(MAP_SORT)
+
+            batch = []
+            for doc in cursor:
+                batch.append(self.apply_lod(doc, lod) if lod is not None else doc)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        except PyMongoError as e:
+            raise Exception(f"Failed to iterate activities with polylines: {e}")
+
+    def iter_map_fragments(self, athlete_ids, years, batch_size: int = 500):
+        """
+        Yield the athlete_id, year and pre-rendered map JSON (None for activities stored before it existed)
+        of the activities with polylines for the given athlete IDs and years in lists of batch_size tuples.
+        The documents are read as raw BSON, so only the projected fields are decoded.
+        """
+        query, _ = self.polyline_query(athlete_ids, years)
+        projection = {"_id": 0, "athlete_id": 1, "year": 1, "map_fragment": 1}
+        collection = self.collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        try:
+            cursor = collection.find(query, projection, batch_size=batch_size).sort(MAP_SORT)
+            batch = []
+            for doc in cursor:
+                batch.append((doc["athlete_id"], doc["year"], doc.get("map_fragment")))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        except PyMongoError as e:
+            raise Exception(f"Failed to iterate map fragments: {e}")
+
+    def iter_polyline_documents(self, batch_size: int = 500, missing_field: str = None, after: int = None):
+        """
+        Yield the map fields and encoded_polyline of all activities with a polyline in lists of batch_size
+        documents. With missing_field only documents lacking that field are returned, with after only the
+        activities with a greater activity_id, in activity_id order.
+        """
+        query = {"summary_polyline": {"$ne": None}}
+        if missing_field:
+            query[missing_field] = {"$exists": False}
+        if after is not None:
+            query["activity_id"] = {"$gt": after}
+        projection = {"_id": 0, "encoded_polyline": 1, **{field: 1 for field in MAP_FIELDS}}
+        try:
+            batch = []
+            cursor = self.collection.find(query, projection, batch_size=batch_size)
+            if after is not None:
+                cursor = cursor.sort("activity_id", 1)
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        except PyMongoError as e:
+            raise Exception(f"Failed to iterate polylines: {e}")
+
+    def bulk_set_fields(self, updates: dict, missing_field: str = None):
+        """
+        Set fields on many activities at once, updates maps activity IDs to the fields to set.
+        With missing_field only activities still lacking that field are updated, so fields derived from an
+        older read don't overwrite the ones a concurrent write stored. Returns the number of modified activities.
+        """
+        if not updates:
+            return 0
+        condition = {missing_field: {"$exists": False}} if missing_field else {}
+        try:
+            requests = [
+                UpdateOne({"activity_id": activity_id, **condition}, {"$set": fields}) for activity_id, fields in updates.items()
+            ]
+            result = self.collection.bulk_write(requests, ordered=False)
+            return result.modified_count
+        except PyMongoError as e:
+            raise Exception(f"Failed to update activities: {e}")
+
+    def bulk_upsert_activities(self, activities: list[Activity]):
+        """
+        Insert many Activities with one unordered bulk write of upserts and update the changed ones with another.
+        Activities whose stored document is unchanged are not written, so re-syncing them costs a single read.
+        Inserts are taken from the upserts the database performed, so an activity stored concurrently (e.g. by
+        a webhook) is only reported once. The stored activity of an update is the one read before the writes.
+        Returns {"inserted": [Activity], "updated": [(stored Activity, Activity)], "unchanged": count}.
+        """
+        docs = {}
+        for activity in activities:
+            if activity.polyline and not self.is_valid_polyline(activity.polyline):
+                logger.warning(f"Invalid polyline for activity {activity.activity_id}. Setting polyline to None.")
+                activity.polyline = None
+            doc = activity.to_mongo()
+            # the derived fields aren't read back, they change with the fields they are derived from
+            fields = {field: value for field, value in doc.items() if field not in DERIVED_FIELDS}
+            docs[activity.activity_id] = (activity, doc, fields)
+
+        inserted, updated = [], []
+        try:
+            stored_docs = self.find_stored_documents(list(docs))
+            new = [activity_id for activity_id in docs if activity_id not in stored_docs]
+            if new:
+                # only inserts, activities stored since the read above are updated below instead
+                requests = [UpdateOne({"activity_id": activity_id}, {"$setOnInsert": docs[activity_id][1]}, upsert=True) for activity_id in new]
+                upserted = self.collection.bulk_write(requests, ordered=False).upserted_ids
+                inserted = [docs[activity_id][0] for index, activity_id in enumerate(new) if index in upserted]
+                stored_docs.update(self.find_stored_documents(
+                    [activity_id for index, activity_id in enumerate(new) if index not in upserted]
+                ))
+
+            changed = [
+                activity_id for activity_id, (_, _, fields) in docs.items()
+                if activity_id in stored_docs and not is_stored(stored_docs[activity_id], fields)
+            ]
+            if changed:
+                requests = [UpdateOne({"activity_id": activity_id}, {"$set": docs[activity_id][1]}, upsert=True) for activity_id in changed]
+                upserted = self.collection.bulk_write(requests, ordered=False).upserted_ids
+                for index, activity_id in enumerate(changed):
+                    activity = docs[activity_id][0]
+                    if index in upserted:
+                        # deleted since it was read
+                        inserted.append(activity)
+                    else:
+                        updated.append((Activity.from_mongo(stored_docs[activity_id]), activity))
+        except PyMongoError as e:
+            raise Exception(f"Failed to upsert activities: {e}")
+
+        unchanged = len(docs) - len(inserted) - len(updated)
+        logger.info(
+            f"Upserted {len(docs)} activities: {len(inserted)} inserted, {len(updated)} updated, {unchanged} unchanged."
+        )
+        return {"inserted": inserted, "updated": updated, "unchanged": unchanged}
+
+    def find_stored_documents(self, activity_ids: list[int]):
+        """
+        Return {activity_id: document} of the stored activities among activity_ids, without the derived fields.
+        """
+        if not activity_ids:
+            return {}
+        try:
+            cursor = self.collection.find({"activity_id": {"$in": activity_ids}}, STORED_FIELDS_PROJECTION)
+            return {doc["activity_id"]: doc for doc in cursor}
+        except PyMongoError as e:
+            raise Exception(f"Failed to read stored activities: {e}")
+
     def delete_activities_by_athlete_id(self, athlete_id: int):
         """
         Delete all activities associated with a given athlete ID.
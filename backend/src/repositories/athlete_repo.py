@@ -1,3 +1,4 @@
+from datetime import datetime
 from pymongo import ReturnDocument, WriteConcern
 from pymongo.errors import DuplicateKeyError, PyMongoError
 from models.athlete import Athlete
@@ -50,6 +51,53 @@ class AthleteRepository:
         except PyMongoError as e:
             raise Exception(f"Failed to update athlete with athlete_id {athlete_id}: {e}")
 
+    def update_sync_cursor(self, athlete_id: int, fields: dict):
+        """
+        Set fields of the sync cursor, which tracks how far the activities of an athlete are synced.
+        Kept out of Athlete.to_mongo, so re-registering an athlete doesn't reset it.
+        """
+        try:
+            self.collection.update_one(
+                {"athlete_id": athlete_id},
+                {"$set": {f"sync_cursor.{field}": value for field, value in fields.items()}},
+            )
+        except PyMongoError as e:
+            raise Exception(f"Failed to update the sync cursor of athlete_id {athlete_id}: {e}")
+
+    def find_unfinished_syncs(self, finished_status: str):
+        """
+        Return the athlete_id and sync cursor of all athletes whose last sync didn't reach finished_status.
+        """
+        try:
+            cursor = self.collection.find(
+                {"sync_cursor.status": {"$exists": True, "$ne": finished_status}},
+                {"_id": 0, "athlete_id": 1, "sync_cursor": 1},
+            )
+            return list(cursor)
+        except PyMongoError as e:
+            raise Exception(f"Failed to find unfinished syncs: {e}")
+
+    def claim_sync(self, athlete_id: int, finished_status: str, lease_until: datetime) -> bool:
+        """
+        Take over the unfinished sync of an athlete until lease_until, unless the lease of another
+        process still holds it. Returns whether it was claimed.
+        """
+        try:
+            result = self.collection.update_one(
+                {
+                    "athlete_id": athlete_id,
+                    "sync_cursor.status": {"$exists": True, "$ne": finished_status},
+                    "$or": [
+                        {"sync_cursor.lease_until": None},
+                        {"sync_cursor.lease_until": {"$lt": datetime.utcnow()}},
+                    ],
+                },
+                {"$set": {"sync_cursor.lease_until": lease_until}},
+            )
+            return result.modified_count == 1
+        except PyMongoError as e:
+            raise Exception(f"Failed to claim the sync of athlete {athlete_id}: {e}")
+
     def delete_athlete(self, athlete_id: int):
         """
         Delete an athlete by athlete_id.
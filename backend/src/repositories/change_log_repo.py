@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from pymongo.errors import PyMongoError
+from utils.db_mongo import MongoDB, ensure_indexes
+import logging
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"
+DELETE = "delete"
+DELETE_ATHLETE = "delete_athlete"
+# marks versions without map changes, so the log still covers every version
+ATHLETE_CHANGED = "athlete_changed"
+# one entry per recorded version, counted by count_versions
+VERSION = "version"
+
+# the change log is kept for 30 days, older clients refetch the whole map
+TTL_SECONDS = 30 * 24 * 60 * 60
+
+INDEXES = [
+    ([("version", 1)], {}),
+    ([("op", 1), ("version", 1)], {}),
+    ([("created_at", 1)], {"expireAfterSeconds": TTL_SECONDS}),
+]
+
+
+class ChangeLogRepository:
+    """
+    Log of the map changes per data version: activities that were added or modified (upsert),
+    removed from an (athlete_id, year) (delete), athletes whose activities were all removed and
+    athletes whose profile changed. Entries expire via a TTL index on created_at.
+    """
+    def __init__(self):
+        self.collection = MongoDB.get_instance().mapChanges
+        ensure_indexes(self.collection, INDEXES)
+
+    def record(self, version: int, changes):
+        """
+        Record (op, activity_id, athlete_id, year) changes made by the data version, together with the
+        version's marker entry.
+        """
+        created_at = datetime.now(timezone.utc)
+        entries = [
+            {"version": version, "op": op, "activity_id": activity_id, "athlete_id": athlete_id, "year": year, "created_at": created_at}
+            for op, activity_id, athlete_id, year in changes
+        ]
+        if not entries:
+            return
+        entries.append({"version": version, "op": VERSION, "created_at": created_at})
+        try:
+            self.collection.insert_many(entries, ordered=True)
+        except PyMongoError as e:
+            raise Exception(f"Failed to record map changes: {e}")
+
+    def find_changes(self, since: int, athlete_ids, years):
+        """
+        Return the changes after version since of the given athlete IDs and years, oldest first.
+        """
+        try:
+            cursor = self.collection.find(
+                {
+                    "version": {"$gt": since},
+                    "athlete_id": {"$in": athlete_ids},
+                    "$or": [{"year": {"$in": years}}, {"op": DELETE_ATHLETE}],
+                },
+                {"_id": 0, "created_at": 0},
+            ).sort([("version", 1), ("_id", 1)])
+            return list(cursor)
+        except PyMongoError as e:
+            raise Exception(f"Failed to find map changes: {e}")
+
+    def count_versions(self, since: int) -> int:
+        """
+        Return the number of data versions after since that recorded changes, counted from their markers
+        on the {op, version} index.
+        """
+        try:
+            return self.collection.count_documents({"op": VERSION, "version": {"$gt": since}})
+        except PyMongoError as e:
+            raise Exception(f"Failed to count map change versions: {e}")
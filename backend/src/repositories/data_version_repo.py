@@ -0,0 +1,37 @@
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from utils.db_mongo import MongoDB
+
+DATA_VERSION_ID = "data_version"
+
+class DataVersionRepository:
+    """
+    Monotonically increasing version of the activity and athlete data.
+    """
+    def __init__(self):
+        self.collection = MongoDB.get_instance().counters
+
+    def get_version(self) -> int:
+        """
+        Return the current data version, 0 if the data was never modified.
+        """
+        try:
+            data = self.collection.find_one({"_id": DATA_VERSION_ID})
+            return data["value"] if data else 0
+        except PyMongoError as e:
+            raise Exception(f"Failed to read data version: {e}")
+
+    def bump_version(self) -> int:
+        """
+        Increment the data version and return the new value.
+        """
+        try:
+            data = self.collection.find_one_and_update(
+                {"_id": DATA_VERSION_ID},
+                {"$inc": {"value": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return data["value"]
+        except PyMongoError as e:
+            raise Exception(f"Failed to bump data version: {e}")
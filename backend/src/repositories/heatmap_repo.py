@@ -0,0 +1,71 @@
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from utils.db_mongo import MongoDB
+import logging
+
+logger = logging.getLogger(__name__)
+
+class HeatmapRepository:
+    """
+    Route density per (athlete_id, year, base tile x, base tile y): a sparse map of cell index to
+    the number of activities passing through that cell.
+    """
+    def __init__(self):
+        self.collection = MongoDB.get_instance().heatmapCells
+
+    def apply_deltas(self, deltas: dict):
+        """
+        Apply {(athlete_id, year, x, y): {cell_index: count}} deltas with $inc.
+        """
+        operations = []
+        for (athlete_id, year, x, y), cells in deltas.items():
+            increments = {f"cells.{cell}": count for cell, count in cells.items() if count}
+            if increments:
+                operations.append(UpdateOne(
+                    {"athlete_id": athlete_id, "year": year, "x": x, "y": y},
+                    {"$inc": increments},
+                    upsert=True,
+                ))
+        if not operations:
+            return
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            raise Exception(f"Failed to apply heatmap deltas: {e}")
+
+    def find_tiles(self, athlete_ids, years, min_x: int, max_x: int, min_y: int, max_y: int):
+        """
+        Return the x, y and cells of all base tiles of the athletes and years within the inclusive tile range.
+        """
+        try:
+            cursor = self.collection.find(
+                {
+                    "athlete_id": {"$in": athlete_ids},
+                    "year": {"$in": years},
+                    "x": {"$gte": min_x, "$lte": max_x},
+                    "y": {"$gte": min_y, "$lte": max_y},
+                },
+                {"_id": 0, "x": 1, "y": 1, "cells": 1},
+            )
+            return list(cursor)
+        except PyMongoError as e:
+            raise Exception(f"Failed to find heatmap tiles: {e}")
+
+    def delete_by_athlete_id(self, athlete_id: int):
+        """
+        Delete the heatmap of an athlete.
+        """
+        try:
+            result = self.collection.delete_many({"athlete_id": athlete_id})
+            logger.info(f"Deleted {result.deleted_count} heatmap tiles of athlete {athlete_id}.")
+        except PyMongoError as e:
+            raise Exception(f"Failed to delete heatmap tiles: {e}")
+
+    def delete_all(self):
+        """
+        Delete the heatmaps of all athletes.
+        """
+        try:
+            self.collection.delete_many({})
+        except PyMongoError as e:
+            raise Exception(f"Failed to delete heatmap tiles: {e}")
@@ -0,0 +1,117 @@
+from pymongo import UpdateOne, ReplaceOne, DeleteOne
+from pymongo.errors import PyMongoError
+from utils.db_mongo import MongoDB, ensure_indexes
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXES = [
+    ([("season", 1), ("athlete_id", 1), ("category", 1)], {"unique": True}),
+]
+
+class LeaderboardRepository:
+    """
+    Materialized moving time totals per (athlete_id, category, season).
+    """
+    def __init__(self):
+        self.collection = MongoDB.get_instance().leaderboardTotals
+        ensure_indexes(self.collection, INDEXES)
+
+    def apply_deltas(self, deltas: dict):
+        """
+        Apply {(athlete_id, category, season): (moving_time, activity_count)} deltas with $inc.
+        """
+        operations = [
+            UpdateOne(
+                {"athlete_id": athlete_id, "category": category, "season": season},
+                {"$inc": {"moving_time": moving_time, "activity_count": activity_count}},
+                upsert=True,
+            )
+            for (athlete_id, category, season), (moving_time, activity_count) in deltas.items()
+            if moving_time or activity_count
+        ]
+        if not operations:
+            return
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            raise Exception(f"Failed to apply leaderboard deltas: {e}")
+
+    def find_totals_by_season(self, season):
+        """
+        Return {(athlete_id, category): moving_time} for all athletes with activities in the season.
+        """
+        try:
+            cursor = self.collection.find(
+                {"season": season, "activity_count": {"$gt": 0}},
+                {"_id": 0, "athlete_id": 1, "category": 1, "moving_time": 1},
+            )
+            return {(doc["athlete_id"], doc["category"]): doc["moving_time"] for doc in cursor}
+        except PyMongoError as e:
+            raise Exception(f"Failed to find leaderboard totals for season {season}: {e}")
+
+    def find_all_totals(self, season=None):
+        """
+        Return {(athlete_id, category, season): (moving_time, activity_count)} for every stored entry,
+        optionally only for one season.
+        """
+        try:
+            query = {} if season is None else {"season": season}
+            cursor = self.collection.find(query, {"_id": 0})
+            return {
+                (doc["athlete_id"], doc["category"], doc["season"]): (doc["moving_time"], doc["activity_count"])
+                for doc in cursor
+            }
+        except PyMongoError as e:
+            raise Exception(f"Failed to fetch leaderboard totals: {e}")
+
+    def replace_totals(self, totals: dict, season=None):
+        """
+        Overwrite the stored entries with {(athlete_id, category, season): (moving_time, activity_count)}
+        and remove every entry (of the given season) that is not part of totals, as well as duplicated
+        entries concurrent upserts created before the unique index existed.
+        """
+        try:
+            query = {} if season is None else {"season": season}
+            stored_keys = set()
+            duplicates = []
+            for doc in self.collection.find(query, {"_id": 1, "athlete_id": 1, "category": 1, "season": 1}):
+                key = (doc["athlete_id"], doc["category"], doc["season"])
+                if key in stored_keys:
+                    duplicates.append(doc["_id"])
+                stored_keys.add(key)
+            if duplicates:
+                self.collection.delete_many({"_id": {"$in": duplicates}})
+            operations = [
+                ReplaceOne(
+                    {"athlete_id": athlete_id, "category": category, "season": season},
+                    {
+                        "athlete_id": athlete_id,
+                        "category": category,
+                        "season": season,
+                        "moving_time": moving_time,
+                        "activity_count": activity_count,
+                    },
+                    upsert=True,
+                )
+                for (athlete_id, category, season), (moving_time, activity_count) in totals.items()
+            ]
+            operations.extend(
+                DeleteOne({"athlete_id": athlete_id, "category": category, "season": season})
+                for (athlete_id, category, season) in stored_keys - totals.keys()
+            )
+            if operations:
+                self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            raise Exception(f"Failed to replace leaderboard totals: {e}")
+
+    def delete_totals_by_athlete_id(self, athlete_id: int):
+        """
+        Delete all leaderboard totals associated with a given athlete ID.
+        """
+        try:
+            result = self.collection.delete_many({"athlete_id": athlete_id})
+            logger.info(f"Deleted {result.deleted_count} leaderboard totals for athlete ID {athlete_id}.")
+            return result.deleted_count
+        except PyMongoError as e:
+            raise Exception(f"Error deleting leaderboard totals for athlete ID {athlete_id}.") from e
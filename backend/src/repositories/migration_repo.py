@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from utils.db_mongo import MongoDB
+
+# a claimed migration is left to its runner until the lease expires, runners renew it with every checkpoint
+MIGRATION_LEASE = timedelta(minutes=10)
+
+
+class MigrationRepository:
+    """
+    Data migrations the backend ran on the database, e.g. backfills of fields added to existing documents.
+    A migration is {_id: name, done_at, lease_until, checkpoint}: unfinished while done_at is null,
+    claimed by one runner until lease_until, resumed after checkpoint when its runner stopped.
+    """
+    def __init__(self):
+        self.collection = MongoDB.get_instance().migrations
+
+    def find(self, name: str):
+        try:
+            return self.collection.find_one({"_id": name})
+        except PyMongoError as e:
+            raise Exception(f"Failed to read migration {name}: {e}")
+
+    def is_done(self, name: str) -> bool:
+        migration = self.find(name)
+        return migration is not None and migration.get("done_at") is not None
+
+    def claim(self, name: str):
+        """
+        Claim an unfinished migration for this process, so workers and restarts don't run it twice.
+        Returns the migration with the checkpoint of an interrupted run, None if it is done or claimed.
+        """
+        now = datetime.utcnow()
+        try:
+            return self.collection.find_one_and_update(
+                {"_id": name, "done_at": None, "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+                {"$set": {"lease_until": now + MIGRATION_LEASE}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None
+        except PyMongoError as e:
+            raise Exception(f"Failed to claim migration {name}: {e}")
+
+    def restart(self, name: str):
+        """
+        Claim a migration to run it again from the start, whether it is done or not.
+        """
+        try:
+            self.collection.update_one(
+                {"_id": name},
+                {"$set": {"done_at": None, "checkpoint": None, "lease_until": datetime.utcnow() + MIGRATION_LEASE}},
+                upsert=True,
+            )
+        except PyMongoError as e:
+            raise Exception(f"Failed to restart migration {name}: {e}")
+
+    def save_checkpoint(self, name: str, checkpoint):
+        """
+        Record how far the claimed migration got and renew its lease.
+        """
+        try:
+            self.collection.update_one(
+                {"_id": name},
+                {"$set": {"checkpoint": checkpoint, "lease_until": datetime.utcnow() + MIGRATION_LEASE}},
+            )
+        except PyMongoError as e:
+            raise Exception(f"Failed to checkpoint migration {name}: {e}")
+
+    def release(self, name: str):
+        """
+        Give up the claim on a migration that failed, so the next runner can continue it.
+        """
+        try:
+            self.collection.update_one({"_id": name}, {"$set": {"lease_until": None}})
+        except PyMongoError as e:
+            raise Exception(f"Failed to release migration {name}: {e}")
+
+    def mark_done(self, name: str):
+        try:
+            self.collection.update_one(
+                {"_id": name}, {"$set": {"done_at": datetime.utcnow(), "lease_until": None}}, upsert=True
+            )
+        except PyMongoError as e:
+            raise Exception(f"Failed to mark migration {name} as done: {e}")
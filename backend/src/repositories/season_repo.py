@@ -0,0 +1,72 @@
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from models.season import Season
+from utils.db_mongo import MongoDB
+
+class SeasonRepository:
+    def __init__(self):
+        self.collection = MongoDB.get_instance().seasons
+
+    def find_by_season_id(self, season_id: str):
+        """
+        Find a season by season_id.
+        """
+        try:
+            data = self.collection.find_one({"season_id": season_id})
+            return Season.from_mongo(data) if data else None
+        except PyMongoError as e:
+            raise Exception(f"Failed to find season with season_id {season_id}: {e}")
+
+    def create_season(self, season: Season):
+        """
+        Insert a new season into the database.
+        """
+        try:
+            self.collection.insert_one(season.to_mongo())
+        except DuplicateKeyError:
+            raise Exception(f"Season with season_id {season.season_id} already exists.")
+        except PyMongoError as e:
+            raise Exception(f"Failed to create season: {e}")
+
+    def insert_season_if_missing(self, season: Season) -> bool:
+        """
+        Store a season unless one with its season_id exists, a stored season is never overwritten.
+        Returns whether the season was inserted.
+        """
+        try:
+            result = self.collection.update_one(
+                {"season_id": season.season_id}, {"$setOnInsert": season.to_mongo()}, upsert=True
+            )
+            return result.upserted_id is not None
+        except PyMongoError as e:
+            raise Exception(f"Failed to store season {season.season_id}: {e}")
+
+    def set_totals_materialized(self, season_ids):
+        """
+        Mark the leaderboard totals of the seasons as complete.
+        """
+        try:
+            self.collection.update_many({"season_id": {"$in": list(season_ids)}}, {"$set": {"totals_materialized": True}})
+        except PyMongoError as e:
+            raise Exception(f"Failed to mark the totals of seasons {season_ids} as materialized: {e}")
+
+    def delete_season(self, season_id: str):
+        """
+        Delete a season by season_id.
+        """
+        try:
+            result = self.collection.delete_one({"season_id": season_id})
+            if result.deleted_count == 0:
+                raise Exception(f"No season found with season_id {season_id} to delete.")
+            return result.deleted_count
+        except PyMongoError as e:
+            raise Exception(f"Failed to delete season with season_id {season_id}: {e}")
+
+    def get_all_seasons(self):
+        """
+        Fetch all seasons ordered by their start date.
+        """
+        try:
+            cursor = self.collection.find({}).sort("start_date", 1)
+            return [Season.from_mongo(doc) for doc in cursor]
+        except PyMongoError as e:
+            raise Exception(f"Failed to fetch seasons: {e}")
@@ -0,0 +1,28 @@
+import argparse
+import sys
+import os
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.core_services.backfills import backfill_route_fields
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Derive the encoded polyline, its simplified variants, the bounding box and the pre-rendered map JSON of stored activities from their GeoJSON polyline."
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="recompute the derived fields of every activity, not only of those missing them",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    modified = backfill_route_fields(recompute_all=args.all, batch_size=args.batch_size)
+    print(f"Backfill done, {modified} activities updated.")
+
+
+if __name__ == "__main__":
+    main()
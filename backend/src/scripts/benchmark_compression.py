@@ -0,0 +1,91 @@
+import argparse
+import random
+import sys
+import os
+import time
+
+import orjson
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.compression import ENCODINGS, compress, decompress
+
+
+def generate_map_payload(activity_count, rng):
+    """
+    A /api/map response of random walk routes around Innsbruck, shaped like the stored activities.
+    """
+    activities = []
+    for i in range(activity_count):
+        lat, lng = 47.2 + rng.random() / 2, 11.2 + rng.random() / 2
+        coordinates = []
+        for _ in range(rng.randint(50, 400)):
+            lat += rng.uniform(-5e-4, 5e-4)
+            lng += rng.uniform(-5e-4, 5e-4)
+            coordinates.append([round(lng, 5), round(lat, 5)])
+        activities.append({
+            "activity_id": 10_000_000_000 + i,
+            "athlete_id": rng.randint(1, 30),
+            "name": f"Activity {i}",
+            "type": rng.choice(["Ride", "Run", "Hike", "Walk"]),
+            "moving_time": round(rng.uniform(600, 20000), 1),
+            "distance": round(rng.uniform(1000, 150000), 1),
+            "summary_polyline": {"type": "LineString", "coordinates": coordinates},
+            "url": f"https://www.strava.com/activities/{10_000_000_000 + i}",
+            "year": rng.choice([2023, 2024, 2025]),
+        })
+    return orjson.dumps(activities)
+
+
+def load_map_payload(years, athlete_ids):
+    """
+    The /api/map response of the given selection, read from the database.
+    """
+    from services.api_services.map_service import get_activities_with_polylines
+    return orjson.dumps(get_activities_with_polylines(years, athlete_ids))
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        result = fn(*args)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the compression of map payloads: ratio, CPU time and the CPU time saved by compressing once per data change."
+    )
+    parser.add_argument("--activities", type=int, default=1000, help="number of synthetic activities")
+    parser.add_argument("--years", help="comma separated years, benchmark the stored activities instead of synthetic ones")
+    parser.add_argument("--athletes", help="comma separated athlete IDs, used together with --years")
+    parser.add_argument("--requests", type=int, default=100, help="requests served per data version")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.years and args.athletes:
+        payload = load_map_payload([int(y) for y in args.years.split(",")], [int(a) for a in args.athletes.split(",")])
+    else:
+        payload = generate_map_payload(args.activities, random.Random(args.seed))
+
+    print(f"payload: {len(payload) / 1e6:.2f} MB, {args.requests} requests per data version")
+    print(f"{'encoding':>9} {'size [MB]':>10} {'ratio':>7} {'compress [ms]':>14} {'decompress [ms]':>16} {'CPU saved [s]':>14}")
+    for encoding in ENCODINGS:
+        compressed, compress_time = timed(compress, payload, encoding)
+        decompressed, decompress_time = timed(decompress, compressed, encoding)
+        if decompressed != payload:
+            raise SystemExit(f"{encoding} round trip failed.")
+        # compressing per response costs compress_time every request, the cache only the first one
+        saved = compress_time * (args.requests - 1)
+        print(
+            f"{encoding:>9} {len(compressed) / 1e6:>10.2f} {len(payload) / len(compressed):>6.1f}x "
+            f"{compress_time * 1000:>14.1f} {decompress_time * 1000:>16.1f} {saved:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
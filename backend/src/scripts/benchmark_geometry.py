@@ -0,0 +1,114 @@
+import argparse
+import random
+import sys
+import os
+import time
+import tracemalloc
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from polyline import decode as decode_polyline, encode as encode_polyline
+
+from models.activity import GeoJSONLineString
+
+
+class ListLineString:
+    """
+    The former list of lists GeoJSONLineString, swapping the axes point by point.
+    """
+    def __init__(self, type, coordinates):
+        self.type = type
+        self.coordinates = coordinates
+
+    @classmethod
+    def from_encoded(cls, encoded_polyline):
+        return cls("LineString", decode_polyline(encoded_polyline))
+
+    @classmethod
+    def from_mongo(cls, data):
+        return cls(data["type"], [[coord[1], coord[0]] for coord in data["coordinates"]])
+
+    def to_mongo(self):
+        return {"type": self.type, "coordinates": [[coord[1], coord[0]] for coord in self.coordinates]}
+
+    def extent(self):
+        lats = [coord[0] for coord in self.coordinates]
+        lngs = [coord[1] for coord in self.coordinates]
+        return min(lats), min(lngs), max(lats), max(lngs)
+
+
+class ArrayLineString(GeoJSONLineString):
+    def extent(self):
+        return (*self.points.min(axis=0).tolist(), *self.points.max(axis=0).tolist())
+
+
+def generate_routes(route_count, rng):
+    """
+    Random walk routes around Innsbruck as Google encoded polylines, like Strava sends them.
+    """
+    routes = []
+    for _ in range(route_count):
+        lat, lng = 47.2 + rng.random() / 2, 11.2 + rng.random() / 2
+        route = []
+        for _ in range(rng.randint(50, 400)):
+            lat += rng.uniform(-5e-4, 5e-4)
+            lng += rng.uniform(-5e-4, 5e-4)
+            route.append((round(lat, 5), round(lng, 5)))
+        routes.append(encode_polyline(route))
+    return routes
+
+
+def ingest(cls, routes, _):
+    """Strava routes to the stored GeoJSON and the route extent."""
+    return [(line.to_mongo(), line.extent()) for line in map(cls.from_encoded, routes)]
+
+
+def read(cls, _, docs):
+    """Stored GeoJSON to lines, e.g. activities hydrated for the leaderboard."""
+    return [cls.from_mongo(doc) for doc in docs]
+
+
+def read_extents(cls, _, docs):
+    """Stored GeoJSON to route extents, as the tile invalidation needs them."""
+    return [cls.from_mongo(doc).extent() for doc in docs]
+
+
+def measure(fn, *args):
+    """
+    CPU time and the peak memory traced while the result is built, timed separately as tracing slows allocations down.
+    """
+    start = time.process_time()
+    fn(*args)
+    elapsed = time.process_time() - start
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the CPU time and peak memory of the list and the array backed GeoJSONLineString."
+    )
+    parser.add_argument("--routes", type=int, default=10000, help="number of synthetic routes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    routes = generate_routes(args.routes, random.Random(args.seed))
+    docs = [doc for doc, _ in ingest(ListLineString, routes, None)]
+    print(f"{args.routes} routes, {sum(len(doc['coordinates']) for doc in docs)} points")
+    print(f"{'step':>13} {'list [s]':>9} {'array [s]':>10} {'list [MB]':>10} {'array [MB]':>11}")
+    for step in (ingest, read, read_extents):
+        list_time, list_peak = measure(step, ListLineString, routes, docs)
+        array_time, array_peak = measure(step, ArrayLineString, routes, docs)
+        print(
+            f"{step.__name__:>13} {list_time:>9.2f} {array_time:>10.2f} "
+            f"{list_peak / 1e6:>10.1f} {array_peak / 1e6:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
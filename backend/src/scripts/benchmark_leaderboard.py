@@ -0,0 +1,130 @@
+import argparse
+import random
+import sys
+import os
+import time
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.athlete import Athlete
+from services.api_services.leaderboard_service import rank_categories, rank_overall
+from services.core_services.leaderboard_totals import mapped_types
+
+
+def former_rankings(athletes, totals):
+    """
+    The ranking stage as it was before the keyed sorts: per-type list scans,
+    list.index lookups for every athlete in every category and an insertion sort.
+    """
+    all = []
+    last_type = ""
+    category = []
+    for t in mapped_types:
+        if last_type == "":
+            last_type = mapped_types[t]
+        if mapped_types[t] != last_type:
+            category.sort(key=lambda x: x["points"], reverse=True)
+            all.append({"name": last_type, "rankings": category})
+            category = []
+            last_type = mapped_types[t]
+        for a in athletes:
+            moving_time = totals.get((a.athlete_id, t), 0)
+            entry = next((x for x in category if x["id"] == a.athlete_id), [])
+            if entry:
+                category.remove(entry)
+                category.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": entry["points"] + moving_time})
+            else:
+                category.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": moving_time})
+    category.sort(key=lambda x: x["points"], reverse=True)
+    all.append({"name": last_type, "rankings": category})
+
+    total = []
+    for a in athletes:
+        places = []
+        for cat in all:
+            indices = [x for x in cat["rankings"] if x["id"] == a.athlete_id]
+            if indices[0]["points"] != 0:
+                places.append({"rank": cat["rankings"].index(indices[0]), "mov": indices[0]["points"]})
+        places.sort(key=lambda x: x["rank"])
+        sum = 0
+        sum_mov = 0
+        for i in range(3):
+            if i == len(places):
+                break
+            sum += 10 - places[i]["rank"]
+            sum_mov += places[i]["mov"]
+        total.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": sum, "mov": sum_mov})
+
+    new_leaderboard = []
+    for person in total:
+        i = 0
+        while i < len(new_leaderboard) and (person["points"] < new_leaderboard[i]["points"] or (person["points"] == new_leaderboard[i]["points"] and person["mov"] < new_leaderboard[i]["mov"])):
+            i += 1
+        new_leaderboard.insert(i, person)
+    all.append({"name": "Overall", "rankings": new_leaderboard})
+    return all
+
+
+def current_rankings(athletes, totals):
+    category_totals = {}
+    for (athlete_id, activity_type), moving_time in totals.items():
+        key = (athlete_id, mapped_types[activity_type])
+        category_totals[key] = category_totals.get(key, 0) + moving_time
+
+    all = rank_categories(athletes, category_totals, list(dict.fromkeys(mapped_types.values())))
+    all.append({"name": "Overall", "rankings": rank_overall(athletes, all)})
+    return all
+
+
+def generate_roster(athlete_count, rng):
+    athletes = [
+        Athlete(
+            athlete_id=i,
+            username=f"athlete{i}",
+            first_name="Athlete",
+            last_name=str(i),
+            created_at="2024-01-01T00:00:00Z",
+            profile={},
+            tokens={},
+        )
+        for i in range(athlete_count)
+    ]
+    # most athletes only do a handful of sport types, minutes are rounded to produce ties
+    totals = {}
+    for a in athletes:
+        for activity_type in rng.sample(list(mapped_types), rng.randint(0, 6)):
+            totals[(a.athlete_id, activity_type)] = float(rng.randint(1, 200) * 15)
+    return athletes, totals
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the leaderboard ranking stage.")
+    parser.add_argument("--sizes", default="15,100,500,1000,2000,5000,10000", help="comma separated roster sizes")
+    parser.add_argument("--former-limit", type=int, default=2000, help="largest roster to run the former implementation on")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'athletes':>9} {'former [s]':>11} {'current [s]':>12} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        athletes, totals = generate_roster(size, rng)
+        current, current_time = timed(current_rankings, athletes, totals)
+
+        if size <= args.former_limit:
+            former, former_time = timed(former_rankings, athletes, totals)
+            if former != current:
+                raise SystemExit(f"Rankings differ for {size} athletes.")
+            print(f"{size:>9} {former_time:>11.4f} {current_time:>12.4f} {former_time / current_time:>7.1f}x")
+        else:
+            print(f"{size:>9} {'-':>11} {current_time:>12.4f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import random
+import sys
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.activity import Activity, GeoJSONLineString
+from utils.datetime_utils import parse_datetime
+
+FIELDS = (
+    "activity_id", "athlete_id", "name", "type", "start_date", "moving_time", "distance", "total_elevation_gain",
+    "polyline", "encoded_polyline", "kudos", "suffer_score", "url", "year", "elapsed_time", "commute",
+    "average_speed", "max_speed", "has_heartrate", "max_watts", "description", "calories",
+)
+# what the leaderboard reads of an activity
+LEADERBOARD_FIELDS = ("athlete_id", "type", "start_date", "moving_time")
+
+
+class EagerActivity:
+    """
+    The former Activity: a __dict__ per instance and every field converted by from_mongo.
+    """
+    def __init__(self, **fields):
+        fields["start_date"] = parse_datetime(fields["start_date"])
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_mongo(cls, data):
+        polyline_data = data.get("summary_polyline")
+        return cls(
+            activity_id=data["activity_id"],
+            athlete_id=data["athlete_id"],
+            name=data["name"],
+            type=data["type"],
+            start_date=data["start_date"],
+            moving_time=data["moving_time"],
+            distance=data["distance"],
+            total_elevation_gain=data["total_elevation_gain"],
+            polyline=GeoJSONLineString.from_mongo(polyline_data) if polyline_data else None,
+            kudos=data["kudos"],
+            suffer_score=data["suffer_score"],
+            url=data["url"],
+            year=data["year"],
+            elapsed_time=data.get("elapsed_time"),
+            commute=data.get("commute"),
+            average_speed=data.get("average_speed"),
+            max_speed=data.get("max_speed"),
+            has_heartrate=data.get("has_heartrate"),
+            max_watts=data.get("max_watts"),
+            description=data.get("description"),
+            calories=data.get("calories"),
+            encoded_polyline=data.get("encoded_polyline"),
+        )
+
+
+def generate_documents(activity_count, rng):
+    """
+    Activity documents as pymongo returns them, with a short route each.
+    """
+    start = datetime(2025, 1, 1)
+    docs = []
+    for i in range(activity_count):
+        lat, lng = 47.2 + rng.random() / 2, 11.2 + rng.random() / 2
+        docs.append({
+            "activity_id": 10_000_000_000 + i,
+            "athlete_id": rng.randint(1, 30),
+            "name": f"Activity {i}",
+            "type": rng.choice(["Ride", "Run", "Hike", "Walk"]),
+            "start_date": start + timedelta(minutes=rng.randint(0, 525_600)),
+            "moving_time": rng.uniform(10, 300),
+            "distance": rng.uniform(1, 150),
+            "total_elevation_gain": rng.uniform(0, 2000),
+            "summary_polyline": {"type": "LineString", "coordinates": [[lng, lat], [lng + 0.01, lat + 0.01]]},
+            "kudos": rng.randint(0, 50),
+            "suffer_score": rng.randint(0, 200),
+            "url": f"https://www.strava.com/activities/{10_000_000_000 + i}",
+            "year": 2025,
+            "elapsed_time": rng.uniform(600, 20000),
+            "commute": False,
+            "average_speed": rng.uniform(1, 10),
+            "max_speed": rng.uniform(5, 20),
+            "has_heartrate": True,
+            "max_watts": 0,
+            "description": "",
+            "calories": rng.uniform(0, 3000),
+            "encoded_polyline": "_p~iF~ps|U_ulLnnqC",
+        })
+    return docs
+
+
+def hydrate(cls, docs, fields):
+    activities = [cls.from_mongo(doc) for doc in docs]
+    for activity in activities:
+        for field in fields:
+            getattr(activity, field)
+    return activities
+
+
+def measure(cls, docs, fields):
+    """
+    CPU time and the memory of the hydrated activities, on top of the documents they were read from.
+    """
+    start = time.process_time()
+    hydrate(cls, docs, fields)
+    elapsed = time.process_time() - start
+    tracemalloc.start()
+    activities = hydrate(cls, docs, fields)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del activities
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark hydrating activities with the former eager model and the slotted, lazy Activity."
+    )
+    parser.add_argument("--activities", type=int, default=100_000, help="number of synthetic activity documents")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    docs = generate_documents(args.activities, random.Random(args.seed))
+    print(f"{args.activities} activities")
+    print(f"{'fields read':>12} {'eager [s]':>10} {'lazy [s]':>9} {'eager [MB]':>11} {'lazy [MB]':>10}")
+    for label, fields in (("none", ()), ("leaderboard", LEADERBOARD_FIELDS), ("all", FIELDS)):
+        eager_time, eager_size = measure(EagerActivity, docs, fields)
+        lazy_time, lazy_size = measure(Activity, docs, fields)
+        print(
+            f"{label:>12} {eager_time:>10.2f} {lazy_time:>9.2f} "
+            f"{eager_size / 1e6:>11.1f} {lazy_size / 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
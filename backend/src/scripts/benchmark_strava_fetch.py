@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.strava_simulator import StravaSimulator
+from services.core_services.strava_client import StravaClient
+from services.core_services.fetch_athlete_activities import iter_activity_pages
+from services.core_services.async_fetch import AsyncStravaClient, iter_activity_pages_async
+
+
+def fetch_blocking(athlete_ids, workers):
+    """The FETCH_ACTIVITIES tasks: one athlete per TaskService worker, one blocking request at a time."""
+    def fetch(athlete_id):
+        return sum(len(page) for page in iter_activity_pages(athlete_id, f"athlete-{athlete_id}"))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(fetch, athlete_ids))
+
+
+def fetch_async(athlete_ids, concurrency, base_url):
+    """The FETCH_ACTIVITIES_BATCH task: all athletes on one event loop."""
+    async def fetch(client, athlete_id):
+        return sum([len(page) async for page in iter_activity_pages_async(client, athlete_id, f"athlete-{athlete_id}")])
+
+    async def fetch_all():
+        async with AsyncStravaClient(concurrency, base_url) as client:
+            return sum(await asyncio.gather(*(fetch(client, athlete_id) for athlete_id in athlete_ids)))
+
+    return asyncio.run(fetch_all())
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    activities = fn(*args)
+    return time.perf_counter() - start, activities
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark fetching the activity history of several athletes from a local Strava simulator "
+                    "with the blocking TaskService path and the async batch fetch. Pages are fetched, not stored."
+    )
+    parser.add_argument("--athletes", type=int, default=20)
+    parser.add_argument("--activities", type=int, default=1000, help="activities per athlete")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the simulator takes per request")
+    parser.add_argument("--workers", type=int, default=3, help="TaskService worker threads")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight of the async fetch")
+    args = parser.parse_args()
+
+    simulator = StravaSimulator(args.activities, args.latency).start()
+    StravaClient().base_url = simulator.url
+    athlete_ids = list(range(1, args.athletes + 1))
+    try:
+        print(f"{args.athletes} athletes with {args.activities} activities, {args.latency * 1000:.0f} ms per request")
+        print(f"{'path':>22} {'time [s]':>9} {'activities':>11} {'requests/s':>11}")
+        for label, fn, fn_args in (
+            (f"blocking, {args.workers} workers", fetch_blocking, (athlete_ids, args.workers)),
+            (f"async, {args.concurrency} in flight", fetch_async, (athlete_ids, args.concurrency, simulator.url)),
+        ):
+            requests_before = simulator.requests
+            elapsed, activities = measure(fn, *fn_args)
+            requests = simulator.requests - requests_before
+            print(f"{label:>22} {elapsed:>9.2f} {activities:>11} {requests / elapsed:>11.1f}")
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
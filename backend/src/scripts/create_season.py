@@ -0,0 +1,53 @@
+import argparse
+import json
+import sys
+import os
+from datetime import datetime
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.season import Season
+from repositories.season_repo import SeasonRepository
+from services.core_services.leaderboard_totals import mapped_types, rebuild_leaderboard_totals, store_default_season
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a challenge season and precompute its leaderboard totals."
+    )
+    parser.add_argument("season_id", help="id used in /api/leaderboard?season=<season_id>")
+    parser.add_argument("--name", help="display name, defaults to the season id")
+    parser.add_argument("--start", required=True, help="first day of the season, e.g. 2026-01-01")
+    parser.add_argument("--end", required=True, help="first day after the season, e.g. 2027-01-01")
+    parser.add_argument("--athletes", help="comma separated athlete ids, defaults to every athlete")
+    parser.add_argument(
+        "--categories",
+        help="JSON file mapping Strava sport types to categories, defaults to the 2025 mapping",
+    )
+    args = parser.parse_args()
+
+    categories = mapped_types
+    if args.categories:
+        with open(args.categories, "r") as file:
+            categories = json.load(file)
+
+    season = Season(
+        season_id=args.season_id,
+        name=args.name or args.season_id,
+        start_date=datetime.fromisoformat(args.start),
+        end_date=datetime.fromisoformat(args.end),
+        categories=categories,
+        athlete_ids=[int(a) for a in args.athletes.split(",")] if args.athletes else None,
+    )
+    # the default season was only implied while no season was stored, keep it
+    store_default_season()
+    SeasonRepository().create_season(season)
+    print(f"Created season {season.season_id}: {season.start_date} - {season.end_date}")
+
+    rebuild_leaderboard_totals(season_id=season.season_id)
+    print(f"Leaderboard totals of season {season.season_id} computed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import sys
+import os
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.core_services.heatmap import rebuild_heatmap
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute the route density heatmap from the activities collection."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="number of activities rasterized per batch",
+    )
+    args = parser.parse_args()
+
+    routes = rebuild_heatmap(batch_size=args.batch_size)
+    print(f"Heatmap rebuilt from {routes} routes.")
+
+
+if __name__ == "__main__":
+    main()
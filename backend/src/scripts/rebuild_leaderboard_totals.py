@@ -0,0 +1,37 @@
+import argparse
+import sys
+import os
+
+# Add the src directory to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.core_services.leaderboard_totals import rebuild_leaderboard_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute the materialized leaderboard totals from the activities collection."
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="only report drifted totals, do not overwrite them",
+    )
+    args = parser.parse_args()
+
+    drift = rebuild_leaderboard_totals(verify_only=args.verify)
+    for entry in drift:
+        print(
+            f"athlete {entry['athlete_id']}, {entry['category']}, season {entry['season']}: "
+            f"stored {entry['stored']['moving_time']:.2f} min / {entry['stored']['activity_count']} activities, "
+            f"expected {entry['expected']['moving_time']:.2f} min / {entry['expected']['activity_count']} activities"
+        )
+
+    if args.verify:
+        print(f"{len(drift)} drifted leaderboard totals found.")
+        sys.exit(1 if drift else 0)
+    print(f"Leaderboard totals rebuilt, {len(drift)} drifted totals corrected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,7 @@ def seed_activities(data_file: str):
         activities_data = json.load(file)
 
     for athlete_id, athlete_data in activities_data["athletes"].items():
+        activities = []
         for route in athlete_data["routes"]:
             # Process the polyline (decode if present)
             polyline = route.get("map", {}).get("summary_polyline")
@@ -73,10 +74,11 @@ def seed_activities(data_file: str):
                 url=route["url"],
                 year=datetime.fromisoformat(route["start_date"]).year,
             )
+            activities.append(activity)
 
-            try:
-                activity_repo.create_activity(activity)
-                # print(f"Inserted activity: {activity.name} for athlete ID {athlete_id}")
-            except Exception as e:
-                continue
-                # print(f"Error inserting activity {activity.activity_id}: {e}")
+        # upserts, so seeding twice doesn't duplicate or fail
+        result = activity_repo.bulk_upsert_activities(activities)
+        print(
+            f"Seeded activities of athlete ID {athlete_id}: {len(result['inserted'])} inserted, "
+            f"{len(result['updated'])} updated, {result['unchanged']} unchanged"
+        )
@@ -0,0 +1,168 @@
+import argparse
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import orjson
+
+FIRST_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+ACTIVITY_INTERVAL = timedelta(hours=6)
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # don't refuse connections of highly concurrent clients
+
+
+class StravaSimulatorHandler(BaseHTTPRequestHandler):
+    """
+    Answers /api/v3/athlete/activities and /oauth/token like Strava. The access token of athlete 7 is
+    athlete-7, every athlete has the same number of activities, one every six hours.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        simulator = self.server.simulator
+        url = urlparse(self.path)
+        if url.path != "/api/v3/athlete/activities":
+            return self.respond(404, {"message": "Record Not Found"})
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not token.startswith("athlete-"):
+            return self.respond(401, {"message": "Authorization Error"})
+
+        with simulator.request() as usage:
+            if usage is None:
+                return self.respond(429, {"message": "Rate Limit Exceeded"})
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            page = simulator.activities_page(
+                int(token.removeprefix("athlete-")),
+                after=int(query.get("after", 0)),
+                page=int(query.get("page", 1)),
+                per_page=int(query.get("per_page", 30)),
+            )
+            self.respond(200, page, usage)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/oauth/token":
+            return self.respond(404, {"message": "Record Not Found"})
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+        refresh_token = form.get("refresh_token", [""])[0]
+        self.respond(200, {
+            "access_token": refresh_token,
+            "refresh_token": refresh_token,
+            "expires_at": int(time.time()) + 6 * 3600,
+        })
+
+    def respond(self, status, payload, usage=None):
+        body = orjson.dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if usage is not None:
+            self.send_header("X-ReadRateLimit-Limit", f"{self.server.simulator.limit_15_min},{self.server.simulator.limit_daily}")
+            self.send_header("X-ReadRateLimit-Usage", f"{usage},{usage}")
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # the client timed out
+
+    def log_message(self, *args):
+        pass
+
+
+class StravaSimulator:
+    """
+    Local Strava API stub answering every request after latency seconds, for benchmarks and for running
+    the backend against it (STRAVA_BASE_URL). Counts the requests against read limits and remembers the
+    highest number of requests it served at once.
+    """
+    def __init__(self, activities=1000, latency=0.2, limit_15_min=100_000, limit_daily=1_000_000, port=0):
+        self.activity_count = activities
+        self.latency = latency
+        self.limit_15_min = limit_15_min
+        self.limit_daily = limit_daily
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = SimulatorServer(("127.0.0.1", port), StravaSimulatorHandler)
+        self.server.simulator = self
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @contextmanager
+    def request(self):
+        """Count a request against the limits and hold it for the latency, yields the usage or None if limited."""
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            usage = None
+            if self.requests < min(self.limit_15_min, self.limit_daily):
+                self.requests += 1
+                usage = self.requests
+        try:
+            time.sleep(self.latency)
+            yield usage
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def activities_page(self, athlete_id, after, page, per_page):
+        """The page of the athlete's activities started after the timestamp, oldest first."""
+        offset = after - int(FIRST_START.timestamp())
+        first = 0 if offset < 0 else offset // int(ACTIVITY_INTERVAL.total_seconds()) + 1
+        start = first + (page - 1) * per_page
+        return [self.activity(athlete_id, i) for i in range(start, min(start + per_page, self.activity_count))]
+
+    @staticmethod
+    def activity(athlete_id, index):
+        start_date = (FIRST_START + index * ACTIVITY_INTERVAL).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return {
+            "id": athlete_id * 1_000_000 + index,
+            "name": f"Ride {index}",
+            "sport_type": "Ride",
+            "start_date": start_date,
+            "start_date_local": start_date,
+            "moving_time": 3600,
+            "elapsed_time": 4000,
+            "distance": 30_000.0,
+            "total_elevation_gain": 300.0,
+            "map": {"summary_polyline": "_p~iF~ps|U_ulLnnqC_mqNvxq`@"},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Strava API simulator, point STRAVA_BASE_URL at it.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--activities", type=int, default=1000, help="activities per athlete")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--limit-15-min", type=int, default=100_000)
+    parser.add_argument("--limit-daily", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    simulator = StravaSimulator(args.activities, args.latency, args.limit_15_min, args.limit_daily, args.port)
+    print(f"Strava simulator listening on {simulator.url}")
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
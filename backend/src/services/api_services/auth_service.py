@@ -7,6 +7,8 @@ from models.athlete import Athlete
 from repositories.athlete_repo import AthleteRepository
 from api.exceptions import AuthorizationError, ScopeError
 from services.core_services.task_service import TaskService, Task, TaskType
+from services.core_services.activity_events import on_athlete_changed
+from services.core_services.strava_client import StravaClient
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,17 @@ WHITELISTED_ATHLETE_IDS = {
     94833492, 74888401, 59640444, 154666407, 107152936, 80071340, 154777076, 15993413
 }
 
+# athlete fields served by the API, the tokens stay in the backend
+PROFILE_FIELDS = ("username", "first_name", "last_name", "profile")
+
+
+def profile_changed(stored: Athlete, athlete: Athlete) -> bool:
+    """
+    Whether the served profile fields of an athlete differ from the stored ones.
+    """
+    return any(getattr(stored, field) != getattr(athlete, field) for field in PROFILE_FIELDS)
+
+
 def handle_strava_auth():
     """
     Generate Strava OAuth URL.
@@ -46,8 +59,8 @@ def process_strava_callback(code):
     # Exchange authorization code for access token
     for attempt in range(3):
         try:
-            token_response = requests.post(
-                "https://www.strava.com/oauth/token",
+            token_response = StravaClient().post(
+                "/oauth/token",
                 data={
                     "client_id": STRAVA_CLIENT_ID,
                     "client_secret": STRAVA_CLIENT_SECRET,
@@ -79,8 +92,8 @@ def process_strava_callback(code):
         logger.warning(f"Athlete {athlete_id} is not whitelisted. Revoking access token.")
 
         try:
-            revoke_response = requests.post(
-                "https://www.strava.com/oauth/deauthorize",
+            revoke_response = StravaClient().post(
+                "/oauth/deauthorize",
                 headers={"Authorization": f"Bearer {access_token}"},
                 timeout=10
             )
@@ -114,8 +127,12 @@ def process_strava_callback(code):
     if existing_athlete:
         logger.info(f"Athlete {athlete.athlete_id} exists. Logging in.")
         athlete_repo.update_athlete(athlete.athlete_id, athlete.to_mongo())
+        # a new version invalidates every cached response, the refreshed tokens alone don't change any
+        if profile_changed(existing_athlete, athlete):
+            on_athlete_changed(athlete.athlete_id)
     else:
         athlete_repo.create_athlete(athlete)
+        on_athlete_changed(athlete.athlete_id)
         logger.info(f"New athlete {athlete.athlete_id} registered.")
 
         # Submit task to fetch activities
@@ -130,3 +147,21 @@ def process_strava_callback(code):
         logger.info(f"Task submitted for athlete {athlete.athlete_id} to fetch activities.")
 
     return athlete.to_dict()
+
+
+def get_sync_progress(athlete_id: int):
+    """
+    Return the progress of the activity sync of an athlete, None if it never started.
+    """
+    athlete = AthleteRepository().find_by_athlete_id(athlete_id)
+    cursor = athlete.sync_cursor if athlete else None
+    if not cursor or "status" not in cursor:
+        return None
+    progress = {
+        field: cursor.get(field)
+        for field in ("status", "pages", "activities", "started_at", "synced_at", "finished_at", "retry_at", "error")
+    }
+    for field in ("started_at", "synced_at", "finished_at", "retry_at"):
+        if progress[field]:
+            progress[field] = progress[field].isoformat() + "Z"
+    return progress
@@ -0,0 +1,80 @@
+import logging
+import numpy as np
+
+from repositories.heatmap_repo import HeatmapRepository
+from services.core_services.heatmap import HEATMAP_ZOOM
+from utils.geometry import TILE_SIZE
+from utils.png import encode_png
+
+logger = logging.getLogger(__name__)
+
+# activities per heatmap cell at which a pixel reaches full intensity
+HEATMAP_SATURATION = 20
+# the density is shown by the opacity of this color
+HEATMAP_COLOR = (252, 76, 2)
+
+
+def cells_to_arrays(cells: dict):
+    """
+    Convert the sparse {"cell_index": count} map of a base tile to (row, column, count) arrays.
+    """
+    indices = np.fromiter(map(int, cells.keys()), dtype=np.int64, count=len(cells))
+    counts = np.fromiter(cells.values(), dtype=np.int64, count=len(cells))
+    return indices // TILE_SIZE, indices % TILE_SIZE, counts
+
+
+def get_heatmap_grid(z, x, y, athlete_ids, years):
+    """
+    Return the route density of a web mercator tile as TILE_SIZE x TILE_SIZE uint32 grid. Below the heatmap
+    zoom the base cells are summed up into the coarser pixels, above it they are scaled up.
+    """
+    grid = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.int64)
+    heatmap_repo = HeatmapRepository()
+
+    if z <= HEATMAP_ZOOM:
+        factor = 2 ** (HEATMAP_ZOOM - z)
+        tiles = heatmap_repo.find_tiles(
+            athlete_ids, years, x * factor, (x + 1) * factor - 1, y * factor, (y + 1) * factor - 1
+        )
+        for tile in tiles:
+            rows, columns, counts = cells_to_arrays(tile["cells"])
+            rows = ((tile["y"] - y * factor) * TILE_SIZE + rows) // factor
+            columns = ((tile["x"] - x * factor) * TILE_SIZE + columns) // factor
+            np.add.at(grid, (rows, columns), counts)
+    else:
+        factor = 2 ** (z - HEATMAP_ZOOM)
+        base_x, base_y = x // factor, y // factor
+        size = TILE_SIZE // factor
+        for tile in heatmap_repo.find_tiles(athlete_ids, years, base_x, base_x, base_y, base_y):
+            rows, columns, counts = cells_to_arrays(tile["cells"])
+            np.add.at(grid, (rows, columns), counts)
+        # cut out the part of the base tile covered by the requested tile and scale it up
+        part = grid[(y % factor) * size:(y % factor + 1) * size, (x % factor) * size:(x % factor + 1) * size]
+        grid = np.repeat(np.repeat(part, factor, axis=0), factor, axis=1)
+
+    return np.clip(grid, 0, None).astype(np.uint32)
+
+
+def render_heatmap_png(grid: np.ndarray, z: int):
+    """
+    Render a density grid as PNG, the intensity grows logarithmically with the density.
+    """
+    # coarser pixels cover more cells, a route crossing them adds up to factor cells
+    saturation = HEATMAP_SATURATION * 2 ** max(HEATMAP_ZOOM - z, 0)
+    intensity = np.clip(np.log1p(grid) / np.log1p(saturation), 0, 1)
+
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = HEATMAP_COLOR
+    rgba[..., 3] = np.where(grid > 0, 64 + 191 * intensity, 0).astype(np.uint8)
+    return encode_png(rgba)
+
+
+def get_heatmap_tile(z, x, y, athlete_ids, years, tile_format="png"):
+    """
+    Return the heatmap tile as PNG or, with tile_format="array", as little endian uint32 grid.
+    """
+    logger.debug(f"Rendering heatmap tile {z}/{x}/{y} for years {years} and athlete_ids {athlete_ids}.")
+    grid = get_heatmap_grid(z, x, y, athlete_ids, years)
+    if tile_format == "array":
+        return grid.astype("<u4").tobytes()
+    return render_heatmap_png(grid, z)
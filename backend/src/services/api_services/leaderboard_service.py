@@ -1,152 +1,115 @@
 import logging
 from repositories.athlete_repo import AthleteRepository
 from repositories.activity_repo import ActivityRepository
+from repositories.leaderboard_repo import LeaderboardRepository
+from services.core_services.leaderboard_totals import find_season, get_seasons
+from services.api_services.version_service import get_data_version
+from api.exceptions import ParamError
 
 logger = logging.getLogger(__name__)
 
-# IMPORTANT: keep mapped_types sorted by value!
-mapped_types = {
-    "Ride": "Biking",
-    "VirtualRide": "Biking",
-    "Velomobile": "Biking",
-    "Handcycle": "Biking",
-    "GravelRide": "Biking",
-    "MountainBikeRide": "Biking",
-    "Run": "Running",
-    "VirtualRun": "Running",
-    "TrailRun": "Running",
-    "BackcountrySki": "Hiking",
-    "Hike": "Hiking",
-    "Snowshoe": "Hiking",
-    "AlpineSki": "Alpine Snow Sports",
-    "Snowboard": "Alpine Snow Sports",
-    "IceSkate": "Nordic Ski / Inline",
-    "InlineSkate": "Nordic Ski / Inline",
-    "NordicSki": "Nordic Ski / Inline",
-    "RollerSki": "Nordic Ski / Inline",
-    "Crossfit": "Gym",
-    "WeightTraining": "Gym",
-    "Workout": "Gym",
-    "HighIntensityIntervalTraining": "Gym",
-    "Soccer": "Ball Sports",
-    "Badminton": "Ball Sports",
-    "Pickleball": "Ball Sports",
-    "Racquetball": "Ball Sports",
-    "Squash": "Ball Sports",
-    "TableTennis": "Ball Sports",
-    "Tennis": "Ball Sports",
-    "RockClimbing": "Climbing",
-    "Kayaking": "Water Sports",
-    "Kitesurf": "Water Sports",
-    "Windsurf": "Water Sports",
-    "Rowing": "Water Sports",
-    "VirtualRow": "Water Sports",
-    "Sail": "Water Sports",
-    "Canoeing": "Water Sports",
-    "StandUpPaddling": "Water Sports",
-    "Surfing": "Water Sports",
-    "Swim": "Water Sports",
-    "Windsurf": "Water Sports",
-}
-
-def get_full_leaderboard():
+
+def get_all_seasons():
+    """
+    Return all challenge seasons.
+    """
+    return [season.to_dict() for season in get_seasons()]
+
+
+def get_leaderboard_etag(season_id=None):
     """
-    Fetch all activities from athlete and return aggregated result.
+    Return an ETag for the leaderboard of a season that changes whenever the data or the current season changes.
     """
+    season = find_season(season_id)
+    return f"{get_data_version()}-{season.season_id if season else season_id}"
+
+
+def get_full_leaderboard(season_id=None):
+    """
+    Read the materialized category totals of all athletes of a season (default: the current one)
+    and return the season together with its rankings.
+    """
+    season = find_season(season_id)
+    if not season:
+        raise ParamError(f"Unknown season: {season_id}", status_code=404)
+
     athlete_repo = AthleteRepository()
-    activity_repo = ActivityRepository()
-    logger.info("Fetching all athletes.")
+    logger.info(f"Fetching all athletes for season {season.season_id}.")
 
-    athletes = athlete_repo.get_all_athletes()
+    athletes = [a for a in athlete_repo.get_all_athletes() if season.includes_athlete(a.athlete_id)]
+    totals = get_category_totals(athletes, season)
 
     logger.info("Start calculating rankings for each category.")
-    all = [] # [{name: Biking, rankings: [athlete, athlete, ...]}, {name, rankings}, ...]
-    last_type = ""
-    category = [] # [athelete with points, another athlete with points, ...]
-    for t in mapped_types:
-        if last_type == "":
-            last_type = mapped_types[t]
-
-        # switch activity category pool
-        if mapped_types[t] != last_type:
-            category.sort(key=lambda x: x["points"], reverse=True)
-            all.append({"name": last_type, "rankings": category})
-            category = []
-            last_type = mapped_types[t]
-
-        for a in athletes:
-            activities = activity_repo.find_activities_by_athlete_and_type_with_year2025(a.athlete_id, t)
-            moving_time = calc_total_moving_time(activities)
-
-            # insert new athlete to activity pool
-            # or update athelte's points
-            entry = next((x for x in category if x["id"] == a.athlete_id), [])
-            if entry:
-                category.remove(entry)
-                category.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": entry["points"] + moving_time})
-            else:
-                category.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": moving_time})
-
-    category.sort(key=lambda x: x["points"], reverse=True)
-    all.append({"name": last_type, "rankings": category})
+    all = rank_categories(athletes, totals, season.category_names()) # [{name: Biking, rankings: [athlete, athlete, ...]}, {name, rankings}, ...]
 
     # add total ranking to list
     logger.info("Add overall leaderboard to rankings.")
+    all.append({"name": "Overall", "rankings": rank_overall(athletes, all)})
+
+    return season, all
+
+def rank_categories(athletes, totals, category_names):
+    """
+    Rank all athletes in every category by their moving time, ties keep the athlete order.
+    """
+    categories = []
+    for category_name in category_names:
+        category = [ # [athelete with points, another athlete with points, ...]
+            {"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": totals.get((a.athlete_id, category_name), 0)}
+            for a in athletes
+        ]
+        category.sort(key=lambda x: x["points"], reverse=True)
+        categories.append({"name": category_name, "rankings": category})
+    return categories
+
+def rank_overall(athletes, categories):
+    """
+    Build the overall leaderboard from the best 3 category places of every athlete.
+    A place is worth 10 - rank points, only categories with moving time count.
+    """
+    places = {a.athlete_id: [] for a in athletes} # athlete id -> [(rank, mov), ...]
+    for cat in categories:
+        for rank, entry in enumerate(cat["rankings"]):
+            if entry["points"] != 0:
+                places[entry["id"]].append((rank, entry["points"]))
+
     total = [] # equal to category
     for a in athletes:
-        places = []
-        for cat in all:
-            indices = [x for x in cat["rankings"] if x["id"] == a.athlete_id]
-            if indices[0]["points"] != 0:
-                places.append({"rank": cat["rankings"].index(indices[0]), "mov": indices[0]["points"]})
-        # sort places list for a better usage later when taking only the best 3 places
-        places.sort(key=lambda x: x["rank"])
-
-        sum = 0
-        sum_mov = 0
-        # take the best 3 places of an athlete and append the entry to the overall leaderboard
-        for i in range(3):
-            if i == len(places):
-                break
-            sum += 10 - places[i]["rank"]
-            sum_mov += places[i]["mov"]
-        total.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": sum, "mov": sum_mov})
+        # only the best 3 places of an athlete count for the overall leaderboard
+        best_places = sorted(places[a.athlete_id], key=lambda x: x[0])[:3]
+        total.append({
+            "id": a.athlete_id,
+            "name": a.first_name + " " + a.last_name,
+            "points": sum(10 - rank for rank, _ in best_places),
+            "mov": sum(mov for _, mov in best_places),
+        })
 
     # sort overall leaderboard in search for a tie
-    total = sort_overall_leaderboard(total)
-    all.append({"name": "Overall", "rankings": total})
+    return sort_overall_leaderboard(total)
 
-    return all
-
-def calc_total_moving_time(activities):
+def get_category_totals(athletes, season):
     """
-    Function for calculating overall moving time in a specific category (grouped activities).
+    Return {(athlete_id, category): moving_time} from the materialized leaderboard totals.
+    Aggregates the activities instead if the season has not been materialized yet, its stored
+    totals would only hold the deltas applied since.
     """
-    sum = 0
-    for a in activities:
-        sum += a.moving_time
-
-    return sum
+    if season.totals_materialized:
+        return LeaderboardRepository().find_totals_by_season(season.season_id)
+
+    logger.info(f"Leaderboard totals of season {season.season_id} not materialized, aggregating activities.")
+    totals = {}
+    moving_times = ActivityRepository().sum_moving_time_by_athlete_and_type(
+        season.categories.keys(), season.start_date, season.end_date, [a.athlete_id for a in athletes]
+    )
+    for (athlete_id, activity_type), (moving_time, _) in moving_times.items():
+        key = (athlete_id, season.categories[activity_type])
+        totals[key] = totals.get(key, 0) + moving_time
+    return totals
 
 def sort_overall_leaderboard(leaderboard):
     """
-    Function for sorting the overall leaderboard. This is diffferent then pythons sort function since there has to be differentiation if two athletes have equal points.
+    Function for sorting the overall leaderboard. Athletes with equal points are ordered by their moving time.
+    If points and moving time are equal, the athlete that comes later in the input is ranked first.
     """
-    new_leaderboard = []
-    for person in leaderboard:
-        if new_leaderboard == []:
-            new_leaderboard.append(person)
-            continue
-
-        i = 0
-        # move counter (i) to the specific location where the athlete has to be inserted
-        while i < len(new_leaderboard) and (person["points"] < new_leaderboard[i]["points"] or (person["points"] == new_leaderboard[i]["points"] and person["mov"] < new_leaderboard[i]["mov"])):
-            i += 1
-
-        # if the athelete has the least points, just append the list
-        if i == len(new_leaderboard):
-            new_leaderboard.append(person)
-        else:
-            new_leaderboard.insert(i, person)
-
-    return new_leaderboard
+    # sorted() is stable and keeps the (reversed) input order for full ties
+    return sorted(reversed(leaderboard), key=lambda x: (x["points"], x["mov"]), reverse=True)
@@ -1,17 +1,269 @@
 import logging
+import orjson
+from polyline import decode as decode_polyline, encode as encode_polyline
 from repositories.athlete_repo import AthleteRepository
 from repositories.activity_repo import ActivityRepository
+from repositories.change_log_repo import ChangeLogRepository, UPSERT, DELETE_ATHLETE
+from services.core_services.map_tiles import TileCache, padded_tile_bounds
+from services.core_services.map_slices import SliceCache
+from services.core_services.compressed_cache import CompressedCache
+from services.core_services.strava_client import StravaClient
+from utils.geometry import viewport_polygon, select_lod, clip_polyline
+from utils.route_buffer import pack_routes
+from utils.json_stream import ORJSON_OPTIONS
+from utils.compression import compress_frame
+from utils.pagination import encode_cursor, parse_cursor
 
 logger = logging.getLogger(__name__)
 
 
-def get_activities_with_polylines(years, athlete_ids):
+def to_geojson(activity):
+    """
+    Replace the encoded polyline of an activity by the GeoJSON summary_polyline of the default format.
+    """
+    coordinates = decode_polyline(activity.pop("encoded_polyline"))
+    activity["summary_polyline"] = {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in coordinates]}
+    return activity
+
+
+def get_activities_with_polylines(years, athlete_ids, encoded=False, lod=None, bbox=None):
     """
     Fetch all activities that have a polyline and match the provided athlete IDs and years.
+    With lod the routes are simplified for that zoom level, with bbox only routes within it are returned.
     """
     logger.debug(f"Fetching activities for years {years} and athlete_ids {athlete_ids}.")
     activity_repo = ActivityRepository()
-    return activity_repo.list_activities_with_polylines(athlete_ids, years)
+    viewport = viewport_polygon(*bbox) if bbox else None
+    activities = activity_repo.list_activities_with_polylines(athlete_ids, years, encoded, lod, viewport)
+    if lod is not None and not encoded:
+        activities = [to_geojson(activity) for activity in activities]
+    return activities
+
+
+def iter_activities_with_polylines(years, athlete_ids, batch_size, encoded=False, lod=None, bbox=None):
+    """
+    Yield the activities that have a polyline and match the provided athlete IDs and years in batches.
+    With lod the routes are simplified for that zoom level, with bbox only routes within it are returned.
+    """
+    logger.debug(f"Streaming activities for years {years} and athlete_ids {athlete_ids}.")
+    activity_repo = ActivityRepository()
+    viewport = viewport_polygon(*bbox) if bbox else None
+    batches = activity_repo.iter_activities_with_polylines(athlete_ids, years, batch_size, encoded, lod, viewport)
+    if lod is not None and not encoded:
+        return ([to_geojson(activity) for activity in batch] for batch in batches)
+    return batches
+
+
+def get_activities_page(years, athlete_ids, page_size, cursor=None, encoded=False, lod=None, bbox=None):
+    """
+    Fetch one page of the activities that have a polyline and match the provided athlete IDs and years,
+    continuing after the cursor of the previous page. Returns the activities and the cursor of the next page,
+    None on the last one. Raises ValueError for a malformed cursor.
+    """
+    logger.debug(f"Fetching a page of activities for years {years} and athlete_ids {athlete_ids}.")
+    after = parse_cursor(cursor) if cursor else None
+    activity_repo = ActivityRepository()
+    viewport = viewport_polygon(*bbox) if bbox else None
+    activities, next_key = activity_repo.list_activities_page(athlete_ids, years, page_size, after, encoded, lod, viewport)
+    if lod is not None and not encoded:
+        activities = [to_geojson(activity) for activity in activities]
+    return activities, encode_cursor(next_key) if next_key else None
+
+
+def render_slices(years, athlete_ids, encoded=False, lod=None):
+    """
+    Serialize the routes of the athletes and years per (athlete_id, year) slice with a single query.
+    Returns {(athlete_id, year): comma separated JSON of the routes without brackets}.
+    """
+    if not encoded and lod is None:
+        return render_fragment_slices(years, athlete_ids)
+    return serialize_slices(years, athlete_ids, encoded, lod)
+
+
+def serialize_slices(years, athlete_ids, encoded=False, lod=None):
+    """
+    Serialize the routes of the athletes and years per (athlete_id, year) slice from the decoded documents.
+    Each batch is serialized into the slices as it arrives, so only one batch of documents is held in memory.
+    """
+    chunks = {(athlete_id, year): [] for athlete_id in athlete_ids for year in years}
+    for batch in iter_activities_with_polylines(years, athlete_ids, 500, encoded, lod):
+        grouped = {}
+        for activity in batch:
+            grouped.setdefault((activity["athlete_id"], activity["year"]), []).append(activity)
+        for key, activities in grouped.items():
+            chunks[key].append(orjson.dumps(activities, option=ORJSON_OPTIONS)[1:-1])
+    return {key: b",".join(parts) for key, parts in chunks.items()}
+
+
+def render_fragment_slices(years, athlete_ids):
+    """
+    Join the pre-rendered map JSON of the activities per (athlete_id, year) slice, without decoding
+    the routes. Slices with activities stored before the map JSON existed are serialized as usual.
+    """
+    fragments = {(athlete_id, year): [] for athlete_id in athlete_ids for year in years}
+    outdated = set()
+    for batch in ActivityRepository().iter_map_fragments(athlete_ids, years):
+        for athlete_id, year, fragment in batch:
+            if fragment is None:
+                outdated.add((athlete_id, year))
+            else:
+                fragments[(athlete_id, year)].append(fragment)
+    slices = {key: b",".join(parts) for key, parts in fragments.items()}
+
+    if outdated:
+        logger.warning(f"{len(outdated)} map slices lack pre-rendered map JSON, run scripts/backfill_polylines.py.")
+        serialized = serialize_slices(sorted({year for _, year in outdated}), sorted({athlete_id for athlete_id, _ in outdated}))
+        slices.update({key: serialized[key] for key in outdated})
+    return slices
+
+
+def map_slice_keys(years, athlete_ids):
+    """
+    Return the (athlete_id, year) slices of the athletes and years, ordered like the uncached map response.
+    """
+    return [(athlete_id, year) for athlete_id in sorted(set(athlete_ids), reverse=True) for year in sorted(set(years))]
+
+
+def load_map_slice(athlete_id, year, version, encoded=False, lod=None):
+    """
+    Return the serialized routes of one (athlete_id, year) slice from the slice cache, rendered and cached if it is missing.
+    """
+    slice_cache = SliceCache()
+    key = SliceCache.key(athlete_id, year, "encoded" if encoded else "json", lod)
+    value = slice_cache.get(key, version)
+    if value is None:
+        logger.debug(f"Rendering the map slice of athlete {athlete_id} in {year}.")
+        value = render_slices([year], [athlete_id], encoded, lod)[(athlete_id, year)]
+        slice_cache.put(key, value, version)
+    return value
+
+
+def get_map_slices(years, athlete_ids, version, encoded=False, lod=None):
+    """
+    Yield the serialized routes of the athletes and years as one slice per (athlete_id, year), ordered like
+    the uncached map response. Slices missing in the slice cache are rendered and cached when they are
+    reached, so the first slice is sent before the others are loaded.
+    """
+    for athlete_id, year in map_slice_keys(years, athlete_ids):
+        yield load_map_slice(athlete_id, year, version, encoded, lod)
+
+
+def get_compressed_map_slices(years, athlete_ids, version, encoding, encoded=False, lod=None):
+    """
+    Yield the slices of get_map_slices, each compressed on its own with compress_frame
+    (empty slices stay empty). The compressed slices are cached next to the plain ones, so a slice is
+    compressed once per change of its activities, whatever selection it is requested in.
+    """
+    slice_cache = SliceCache()
+    map_format = "encoded" if encoded else "json"
+    for athlete_id, year in map_slice_keys(years, athlete_ids):
+        key = SliceCache.key(athlete_id, year, map_format, lod, encoding)
+        frame = slice_cache.get(key, version)
+        if frame is None:
+            value = load_map_slice(athlete_id, year, version, encoded, lod)
+            frame = compress_frame(value, encoding) if value else b""
+            slice_cache.put(key, frame, version)
+        yield frame
+
+
+def get_map_changes(since, version, years, athlete_ids, encoded=False):
+    """
+    Return the map changes of the athletes and years between the data versions since and version:
+    the added or modified activities (upserted), the IDs of removed activities (deleted) and the athletes
+    whose activities were all removed (deleted_athletes). Returns reset instead if the change log doesn't
+    cover all versions in between (expired, or changed by a script), then the client refetches the map.
+    """
+    logger.debug(f"Fetching map changes since version {since} for years {years} and athlete_ids {athlete_ids}.")
+    change_log_repo = ChangeLogRepository()
+    if since > version or change_log_repo.count_versions(since) < version - since:
+        return {"version": version, "reset": True}
+
+    # the last change of an activity wins, deleting an athlete overrides the changes before it
+    last_ops = {}
+    deleted_athletes = set()
+    for change in change_log_repo.find_changes(since, athlete_ids, years):
+        if change["op"] == DELETE_ATHLETE:
+            deleted_athletes.add(change["athlete_id"])
+            last_ops = {
+                activity_id: (op, athlete_id) for activity_id, (op, athlete_id) in last_ops.items()
+                if athlete_id != change["athlete_id"]
+            }
+        else:
+            last_ops[change["activity_id"]] = (change["op"], change["athlete_id"])
+
+    upserted_ids = [activity_id for activity_id, (op, _) in last_ops.items() if op == UPSERT]
+    activities = ActivityRepository().list_activities_by_ids(upserted_ids, athlete_ids, years, encoded) if upserted_ids else []
+    # upserted activities without a (valid) route or of an excluded type aren't on the map either
+    found = {activity["activity_id"] for activity in activities}
+    deleted = sorted(activity_id for activity_id in last_ops if activity_id not in found)
+    return {"version": version, "upserted": activities, "deleted": deleted, "deleted_athletes": sorted(deleted_athletes)}
+
+
+def get_cache_stats():
+    """
+    Return the entries, size and hit/miss counters of the map slice, tile and compressed response caches.
+    """
+    return {"slices": SliceCache().stats(), "tiles": TileCache().stats(), "compressed": CompressedCache().stats()}
+
+
+def get_strava_latency_stats():
+    """
+    Return the latency histograms and approximate p50/p95 of the Strava API calls per endpoint.
+    """
+    return StravaClient().latency_stats()
+
+
+def get_activities_binary(years, athlete_ids, lod=None, bbox=None):
+    """
+    Fetch all activities that have a polyline and match the provided athlete IDs and years
+    packed into the binary route buffer (see utils.route_buffer).
+    """
+    logger.debug(f"Packing activities for years {years} and athlete_ids {athlete_ids}.")
+    activity_repo = ActivityRepository()
+    viewport = viewport_polygon(*bbox) if bbox else None
+    batches = activity_repo.iter_activities_with_polylines(athlete_ids, years, encoded=True, lod=lod, viewport=viewport)
+    return pack_routes([activity for batch in batches for activity in batch])
+
+
+def render_tile(z, x, y, athlete_ids, years):
+    """
+    Render the routes of the athletes and years within a map tile as JSON list. Every route carries
+    its metadata and the pieces of its simplified polyline clipped to the tile as encoded strings.
+    """
+    min_lng, min_lat, max_lng, max_lat = padded_tile_bounds(z, x, y)
+    lod = select_lod(zoom=z)
+    activity_repo = ActivityRepository()
+    batches = activity_repo.iter_activities_with_polylines(
+        athlete_ids,
+        years,
+        encoded=True,
+        lod=str(lod) if lod is not None else None,
+        viewport=viewport_polygon(min_lng, min_lat, max_lng, max_lat),
+    )
+
+    routes = []
+    for batch in batches:
+        for activity in batch:
+            points = decode_polyline(activity.pop("encoded_polyline"))
+            segments = clip_polyline(points, min_lat, min_lng, max_lat, max_lng)
+            if segments:
+                activity["segments"] = [encode_polyline(segment) for segment in segments]
+                routes.append(activity)
+    return orjson.dumps(routes)
+
+
+def get_tile(z, x, y, athlete_ids, years, version):
+    """
+    Return the rendered map tile from the tile cache, rendering and caching it on a miss.
+    """
+    tile_cache = TileCache()
+    key = TileCache.key(z, x, y, athlete_ids, years)
+    tile = tile_cache.get(key, version)
+    if tile is None:
+        logger.debug(f"Rendering map tile {z}/{x}/{y} for years {years} and athlete_ids {athlete_ids}.")
+        tile = render_tile(z, x, y, athlete_ids, years)
+        tile_cache.put(key, tile, version)
+    return tile
 
 
 def get_all_athletes():
@@ -0,0 +1,11 @@
+import logging
+from repositories.data_version_repo import DataVersionRepository
+
+logger = logging.getLogger(__name__)
+
+
+def get_data_version():
+    """
+    Return the current version of the activity and athlete data.
+    """
+    return DataVersionRepository().get_version()
@@ -0,0 +1,123 @@
+import logging
+
+from models.activity import Activity
+from repositories.data_version_repo import DataVersionRepository
+from repositories.leaderboard_repo import LeaderboardRepository
+from repositories.heatmap_repo import HeatmapRepository
+from repositories.change_log_repo import ChangeLogRepository, UPSERT, DELETE, DELETE_ATHLETE, ATHLETE_CHANGED
+from services.core_services.heatmap import calc_heatmap_deltas, merge_heatmap_deltas, heatmap_activities
+from services.core_services.leaderboard_totals import calc_leaderboard_deltas, merge_leaderboard_deltas, get_seasons
+from services.core_services.map_tiles import invalidate_activity_tiles, invalidate_athlete_tiles
+from services.core_services.map_slices import invalidate_activity_slices, invalidate_athlete_slices
+
+logger = logging.getLogger(__name__)
+
+# Cascading updates that have to run whenever the core services mutate activities or athletes.
+# Every hook bumps the data version and returns the new version.
+
+
+def on_activities_created(activities: list[Activity]):
+    """
+    Update derived data after activities were inserted.
+    """
+    if not activities:
+        return
+    LeaderboardRepository().apply_deltas(calc_leaderboard_deltas(activities, get_seasons()))
+    HeatmapRepository().apply_deltas(calc_heatmap_deltas(heatmap_activities(activities)))
+    logger.debug(f"Applied leaderboard and heatmap deltas for {len(activities)} new activities.")
+    version = DataVersionRepository().bump_version()
+    ChangeLogRepository().record(
+        version, [(UPSERT, activity.activity_id, activity.athlete_id, activity.year) for activity in activities]
+    )
+    invalidate_activity_tiles(activities, version)
+    invalidate_activity_slices(activities, version)
+    return version
+
+
+def on_activity_updated(before: Activity, after: Activity):
+    """
+    Update derived data after an activity was modified.
+    """
+    return on_activities_updated([(before, after)])
+
+
+def on_activities_updated(changes: list[tuple[Activity, Activity]]):
+    """
+    Update derived data after activities were modified, changes are (before, after) pairs.
+    """
+    if not changes:
+        return
+    before = [activity for activity, _ in changes]
+    after = [activity for _, activity in changes]
+    seasons = get_seasons()
+    deltas = merge_leaderboard_deltas(
+        calc_leaderboard_deltas(before, seasons, sign=-1),
+        calc_leaderboard_deltas(after, seasons),
+    )
+    LeaderboardRepository().apply_deltas(deltas)
+    covered = {activity.activity_id for activity in heatmap_activities(after)}
+    HeatmapRepository().apply_deltas(merge_heatmap_deltas(
+        calc_heatmap_deltas([activity for activity in before if activity.activity_id in covered], sign=-1),
+        calc_heatmap_deltas([activity for activity in after if activity.activity_id in covered]),
+    ))
+    logger.debug(f"Applied leaderboard and heatmap deltas for {len(changes)} updated activities.")
+    version = DataVersionRepository().bump_version()
+    records = []
+    for old, new in changes:
+        if (old.athlete_id, old.year) != (new.athlete_id, new.year):
+            # clients showing the former athlete or year have to drop the activity
+            records.append((DELETE, old.activity_id, old.athlete_id, old.year))
+        records.append((UPSERT, new.activity_id, new.athlete_id, new.year))
+    ChangeLogRepository().record(version, records)
+    invalidate_activity_tiles(before + after, version)
+    invalidate_activity_slices(before + after, version)
+    return version
+
+
+def on_activities_upserted(result: dict):
+    """
+    Update derived data after a bulk upsert, given the result of ActivityRepository.bulk_upsert_activities.
+    Unchanged activities don't bump the data version.
+    """
+    on_activities_created(result["inserted"])
+    on_activities_updated(result["updated"])
+
+
+def on_activity_deleted(activity: Activity):
+    """
+    Update derived data after an activity was removed.
+    """
+    LeaderboardRepository().apply_deltas(calc_leaderboard_deltas([activity], get_seasons(), sign=-1))
+    HeatmapRepository().apply_deltas(calc_heatmap_deltas(heatmap_activities([activity]), sign=-1))
+    logger.debug(f"Applied leaderboard and heatmap deltas for deleted activity {activity.activity_id}.")
+    version = DataVersionRepository().bump_version()
+    ChangeLogRepository().record(version, [(DELETE, activity.activity_id, activity.athlete_id, activity.year)])
+    invalidate_activity_tiles([activity], version)
+    invalidate_activity_slices([activity], version)
+    return version
+
+
+def on_athlete_deleted(athlete_id: int):
+    """
+    Remove derived data of an athlete whose activities were deleted.
+    """
+    LeaderboardRepository().delete_totals_by_athlete_id(athlete_id)
+    HeatmapRepository().delete_by_athlete_id(athlete_id)
+    version = DataVersionRepository().bump_version()
+    ChangeLogRepository().record(version, [(DELETE_ATHLETE, None, athlete_id, None)])
+    invalidate_athlete_tiles(athlete_id, version)
+    invalidate_athlete_slices(athlete_id, version)
+    return version
+
+
+def on_athlete_changed(athlete_id: int):
+    """
+    Invalidate derived data after an athlete was registered or its profile changed.
+    """
+    logger.debug(f"Athlete {athlete_id} changed.")
+    version = DataVersionRepository().bump_version()
+    ChangeLogRepository().record(version, [(ATHLETE_CHANGED, None, athlete_id, None)])
+    # profiles aren't part of the map tiles and slices, only keep the caches in step with the version
+    invalidate_activity_tiles([], version)
+    invalidate_activity_slices([], version)
+    return version
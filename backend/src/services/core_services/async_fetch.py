@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import logging
+
+import httpx
+
+from api.exceptions import RateLimitExceededException
+from services.core_services.rate_limit_tracker import RateLimitTracker
+from services.core_services.strava_client import StravaClient, STRAVA_TIMEOUT
+from services.core_services.fetch_athlete_activities import AthleteSync, PER_PAGE, page_data
+
+logger = logging.getLogger(__name__)
+
+# requests in flight at once over all athletes of a batch
+ASYNC_FETCH_CONCURRENCY = int(os.getenv("ASYNC_FETCH_CONCURRENCY", 10))
+
+
+class AsyncStravaClient:
+    """
+    asyncio counterpart of the StravaClient for fetching many athletes at once. Up to concurrency
+    requests share one pooled keep-alive httpx client, every request is counted against the limits of
+    the RateLimitTracker before it is sent and its latency goes into the StravaClient's histograms.
+    Not a singleton like the StravaClient, as an httpx AsyncClient is bound to its event loop.
+    """
+    def __init__(self, concurrency: int = ASYNC_FETCH_CONCURRENCY, base_url: str = None):
+        self.concurrency = concurrency
+        self.base_url = base_url or StravaClient().base_url
+        self.client = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            # requests queue on the semaphore, not the connection pool
+            timeout=httpx.Timeout(STRAVA_TIMEOUT[1], connect=STRAVA_TIMEOUT[0], pool=None),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def request(self, method: str, path: str, endpoint: str = None, **kwargs):
+        """
+        Send a request to the Strava path, raises RateLimitExceededException instead if the limits are reached.
+        """
+        histogram = StravaClient().latency_histogram(f"{method.upper()} {endpoint or path}")
+        async with self.semaphore:
+            RateLimitTracker().reserve()
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        if "X-ReadRateLimit-Usage" in response.headers:
+            RateLimitTracker().update_limits(response.headers)
+        return response
+
+    async def get(self, path: str, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+
+async def iter_activity_pages_async(client: AsyncStravaClient, athlete_id: int, access_token: str, after: int = 0):
+    """
+    Async version of iter_activity_pages, yields the pages of the activities started after the timestamp.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    page = 1
+    while True:
+        params = {"page": page, "per_page": PER_PAGE, "after": after}
+        response = await client.get("/api/v3/athlete/activities", headers=headers, params=params)
+
+        data = page_data(response, athlete_id)
+        if data:
+            yield data
+        if len(data) < PER_PAGE:
+            return
+        page += 1
+
+
+async def sync_athlete(client: AsyncStravaClient, athlete_id: int, full: bool = False):
+    """
+    fetch_athlete_activities on the event loop: the pages are requested async, the blocking token
+    refresh and database writes run in worker threads so the other athletes' requests go on meanwhile.
+    """
+    sync = await asyncio.to_thread(AthleteSync, athlete_id, full)
+    try:
+        async for page in iter_activity_pages_async(client, athlete_id, sync.access_token, sync.after):
+            await asyncio.to_thread(sync.store_page, page)
+    except RateLimitExceededException as e:
+        await asyncio.to_thread(sync.wait, e.delay)
+        raise
+    except Exception as e:
+        await asyncio.to_thread(sync.fail, e)
+        raise
+    return await asyncio.to_thread(sync.finish)
+
+
+async def sync_athletes(athlete_ids, full: bool = False, concurrency: int = ASYNC_FETCH_CONCURRENCY):
+    async with AsyncStravaClient(concurrency) as client:
+        results = await asyncio.gather(
+            *(sync_athlete(client, athlete_id, full) for athlete_id in athlete_ids), return_exceptions=True
+        )
+    return dict(zip(athlete_ids, results))
+
+
+def fetch_athletes_activities(athlete_ids, full: bool = False, concurrency: int = ASYNC_FETCH_CONCURRENCY):
+    """
+    Fetch the activities of several athletes concurrently. Each athlete's pages are fetched in order and
+    checkpointed like in fetch_athlete_activities, the athletes' requests are interleaved.
+    Returns the totals per athlete, or the exception that stopped the athlete's sync.
+    """
+    results = asyncio.run(sync_athletes(athlete_ids, full, concurrency))
+    for athlete_id, result in results.items():
+        if isinstance(result, Exception):
+            logger.error(f"Failed to fetch the activities of athlete {athlete_id}: {result}")
+    return results
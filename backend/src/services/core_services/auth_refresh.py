@@ -1,8 +1,8 @@
 from datetime import datetime, timedelta
-import requests
 import logging
 from repositories.athlete_repo import AthleteRepository
 from models.athlete import Athlete
+from services.core_services.strava_client import StravaClient
 import os
 
 logger = logging.getLogger(__name__)
@@ -37,7 +37,7 @@ def refresh_token(athlete: Athlete):
         'refresh_token': refresh_token
     }
 
-    response = requests.post('https://www.strava.com/oauth/token', data=data)
+    response = StravaClient().post('/oauth/token', data=data)
     if response.status_code == 200:
         data = response.json()
         new_tokens = {
@@ -0,0 +1,80 @@
+import logging
+
+from models.activity import GeoJSONLineString, render_map_fragment
+from repositories.activity_repo import ActivityRepository
+from repositories.data_version_repo import DataVersionRepository
+from repositories.migration_repo import MigrationRepository
+from services.core_services.heatmap import rebuild_heatmap, HEATMAP_MIGRATION
+from services.core_services.leaderboard_totals import store_default_season, materialize_leaderboard_totals
+
+logger = logging.getLogger(__name__)
+
+ROUTE_FIELDS_MIGRATION = "route_fields"
+# claimed on every start and never done, seasons can be created unmaterialized at any time
+SEASONS_MIGRATION = "seasons"
+
+
+def backfill_route_fields(recompute_all: bool = False, batch_size: int = 500):
+    """
+    Derive the encoded polyline, its simplified variants, the bounding box and the pre-rendered map JSON
+    of the stored activities from their GeoJSON polyline, only of those missing them unless recompute_all.
+    Returns the number of updated activities.
+    """
+    activity_repo = ActivityRepository()
+    # the newest derived field, activities lacking an older one lack it as well
+    missing_field = None if recompute_all else "map_fragment"
+
+    modified = 0
+    for batch in activity_repo.iter_polyline_documents(batch_size, missing_field):
+        updates = {}
+        for doc in batch:
+            polyline = GeoJSONLineString.from_mongo(doc["summary_polyline"])
+            if len(polyline.points) < 2:
+                continue
+            updates[doc["activity_id"]] = {
+                **polyline.route_fields(doc.get("encoded_polyline")),
+                "map_fragment": render_map_fragment(doc),
+            }
+        modified += activity_repo.bulk_set_fields(updates, missing_field)
+        MigrationRepository().save_checkpoint(ROUTE_FIELDS_MIGRATION, None)
+        logger.info(f"Backfilled the route fields of {modified} activities.")
+
+    if modified:
+        DataVersionRepository().bump_version()
+    MigrationRepository().mark_done(ROUTE_FIELDS_MIGRATION)
+    return modified
+
+
+def run_backfills():
+    """
+    Derive the data added to existing activities by later versions once per database, when the backend
+    starts on a database that predates them: the materialized leaderboard totals of the seasons, the route
+    fields the encoded map formats filter on and the heatmap.
+    Runs as background task of the TaskService. Each backfill is claimed first, so only one worker runs it,
+    and one that was interrupted continues where it stopped.
+    """
+    migration_repo = MigrationRepository()
+    if migration_repo.claim(SEASONS_MIGRATION):
+        try:
+            store_default_season()
+            # until then the leaderboards of unmaterialized seasons are aggregated from the activities
+            materialize_leaderboard_totals()
+        finally:
+            migration_repo.release(SEASONS_MIGRATION)
+
+    if migration_repo.claim(ROUTE_FIELDS_MIGRATION):
+        logger.info("Backfilling the route fields of stored activities.")
+        try:
+            backfill_route_fields()
+        except Exception:
+            migration_repo.release(ROUTE_FIELDS_MIGRATION)
+            raise
+
+    migration = migration_repo.claim(HEATMAP_MIGRATION)
+    if migration:
+        logger.info("Building the heatmap from the stored activities.")
+        try:
+            rebuild_heatmap(checkpoint=migration.get("checkpoint"))
+        except Exception:
+            migration_repo.release(HEATMAP_MIGRATION)
+            raise
@@ -0,0 +1,27 @@
+import os
+import logging
+
+from utils.lru_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_CACHE_BYTES = int(os.getenv("COMPRESSED_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+class CompressedCache(VersionedCache):
+    """
+    Compressed response bodies keyed by (payload key, Content-Encoding). Nothing invalidates single
+    entries, every new data version clears the cache, so a payload is compressed once per data change.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CompressedCache, cls).__new__(cls)
+            VersionedCache.__init__(cls._instance, COMPRESSED_CACHE_BYTES)
+            logger.info("CompressedCache initialized with %d bytes.", COMPRESSED_CACHE_BYTES)
+        return cls._instance
+
+    def __init__(self):
+        # initialized once in __new__
+        pass
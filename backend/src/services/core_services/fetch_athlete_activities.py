@@ -1,71 +1,181 @@
-import requests
 import logging
-from datetime import datetime
-from polyline import decode as decode_polyline
+from datetime import datetime, timedelta
 
+from api.exceptions import RateLimitExceededException
 from services.core_services.rate_limit_tracker import RateLimitTracker
+from services.core_services.strava_client import StravaClient
+from utils.datetime_utils import parse_datetime
 from models.activity import Activity
 from repositories.activity_repo import ActivityRepository
 from repositories.athlete_repo import AthleteRepository
 from services.core_services.auth_refresh import refresh_token
+from services.core_services.activity_events import on_activities_upserted
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_athlete_activities(athlete_id):
-    """
-    Fetch all activities for an athlete, respecting Strava API rate limits.
-    """
-    rate_limit_tracker = RateLimitTracker()
-    activity_repo = ActivityRepository()
-    athlete_repo = AthleteRepository()
+PER_PAGE = 200
 
-    athlete = athlete_repo.find_by_athlete_id(athlete_id)
-    try:
-        athlete = refresh_token(athlete)
-    except Exception as e:
-        logger.error(f"{e}")
-        raise Exception("Token refresh failed. Cannot proceed with API request.")
+# status of the sync cursor on the athlete, every status but done is resumed after a restart
+SYNC_RUNNING = "running"
+SYNC_WAITING = "waiting"  # for the rate limit to reset, until retry_at
+SYNC_FAILED = "failed"
+SYNC_DONE = "done"
 
-    access_token = athlete.tokens["access_token"]
+# an unfinished sync is left to the process running it until sync_cursor.lease_until, which the sync
+# renews with every page, so a restart only resumes the syncs no live process is working on
+SYNC_LEASE = timedelta(minutes=2)
 
-    activities = []
-    page = 1
-    PER_PAGE = 200
-    end_of_results = False
 
-    while not end_of_results:
-        rate_limit_tracker.wait_if_needed()
+def start_timestamp(activity_data: dict):
+    """
+    Unix timestamp of the UTC start_date Strava's after parameter compares with, None if it is missing.
+    """
+    start_date = activity_data.get("start_date")
+    return int(parse_datetime(start_date).timestamp()) if start_date else None
+
 
-        headers = {"Authorization": f"Bearer {access_token}"}
-        params = {"page": page, "per_page": PER_PAGE}
-        response = requests.get("https://www.strava.com/api/v3/athlete/activities", headers=headers, params=params)
+def page_data(response, athlete_id: int) -> list:
+    """
+    Activities of an /athlete/activities response, raises if the request failed.
+    """
+    if response.status_code != 200:
+        raise Exception(
+            f"Failed to fetch activities for athlete {athlete_id}. "
+            f"Status code: {response.status_code}, Response: {response.text}"
+        )
+    return response.json()
 
-        if response.status_code != 200:
-            logger.error("Failed to fetch activities for athlete %d: %s", athlete_id, response.text)
-            break
 
-        rate_limit_tracker.update_limits(response.headers)
+def iter_activity_pages(athlete_id: int, access_token: str, after: int = 0):
+    """
+    Yield the pages of /athlete/activities that started after the given Unix timestamp one at a time,
+    respecting Strava API rate limits. With after, Strava returns the activities oldest first.
+    """
+    rate_limit_tracker = RateLimitTracker()
+    strava_client = StravaClient()
+    headers = {"Authorization": f"Bearer {access_token}"}
+    page = 1
+    while True:
+        rate_limit_tracker.wait_if_needed()
 
-        data = response.json()
-        if not data:
-            end_of_results = True
-        else:
-            activities.extend(data)
-            page += 1
+        params = {"page": page, "per_page": PER_PAGE, "after": after}
+        response = strava_client.get("/api/v3/athlete/activities", headers=headers, params=params)
 
+        data = page_data(response, athlete_id)
+        if data:
+            yield data
         if len(data) < PER_PAGE:
-            end_of_results = True
+            return
+        page += 1
 
-    logger.info("Fetched %d activities for athlete %d.", len(activities), athlete_id)
 
-    for activity_data in activities:
+def parse_activities(activities_data, athlete_id: int):
+    """
+    Create Activities from Strava activity data, skipping the ones that can't be parsed.
+    """
+    for activity_data in activities_data:
         try:
-            activity = Activity.create_activity_from_data(activity_data, athlete_id)
-
-            activity_repo.create_activity(activity)
-            logger.debug(f"Inserted activity {activity.activity_id} for athlete {athlete_id}.")
+            yield Activity.create_activity_from_data(activity_data, athlete_id)
         except Exception as e:
             logger.debug(f"Failed to process activity {activity_data.get('id')}: {e}")
 
-    logger.info("Inserted activities for athlete %d.", athlete_id)
+
+class AthleteSync:
+    """
+    One activity sync of an athlete: refreshes the token, starts or resumes the sync cursor and stores
+    the fetched pages, checkpointing the cursor after every page. Shared by the blocking fetch task and
+    the concurrent async fetch, which only differ in how the pages are requested.
+    """
+    def __init__(self, athlete_id: int, full: bool = False):
+        self.athlete_id = athlete_id
+        self.activity_repo = ActivityRepository()
+        self.athlete_repo = AthleteRepository()
+
+        athlete = self.athlete_repo.find_by_athlete_id(athlete_id)
+        try:
+            athlete = refresh_token(athlete)
+        except Exception as e:
+            logger.error(f"{e}")
+            raise Exception("Token refresh failed. Cannot proceed with API request.")
+
+        self.access_token = athlete.tokens["access_token"]
+        cursor = athlete.sync_cursor or {}
+        resuming = cursor.get("status") not in (None, SYNC_DONE)
+        self.after = 0 if full and not resuming else cursor.get("after", 0)
+        self.pages, self.activities = (cursor.get("pages", 0), cursor.get("activities", 0)) if resuming else (0, 0)
+        self.totals = {"fetched": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+
+        progress = {
+            "status": SYNC_RUNNING, "after": self.after, "pages": self.pages, "activities": self.activities,
+            "retry_at": None, "error": None, "lease_until": datetime.utcnow() + SYNC_LEASE,
+        }
+        if not resuming:
+            progress["started_at"] = datetime.utcnow()
+            progress["finished_at"] = None
+        self.athlete_repo.update_sync_cursor(athlete_id, progress)
+        if resuming:
+            logger.info("Resuming the sync of athlete %d after page %d.", athlete_id, self.pages)
+
+    def store_page(self, page: list):
+        result = self.activity_repo.bulk_upsert_activities(list(parse_activities(page, self.athlete_id)))
+        on_activities_upserted(result)
+        self.totals["fetched"] += len(page)
+        self.totals["inserted"] += len(result["inserted"])
+        self.totals["updated"] += len(result["updated"])
+        self.totals["unchanged"] += result["unchanged"]
+
+        # pages come oldest first, everything up to the newest start of this page is stored
+        self.pages += 1
+        self.activities += len(page)
+        self.after = max([self.after, *filter(None, map(start_timestamp, page))])
+        self.athlete_repo.update_sync_cursor(self.athlete_id, {
+            "after": self.after, "pages": self.pages, "activities": self.activities, "synced_at": datetime.utcnow(),
+            "lease_until": datetime.utcnow() + SYNC_LEASE,
+        })
+        logger.debug("Stored page %d of %d activities for athlete %d.", self.pages, len(page), self.athlete_id)
+
+    def wait(self, delay: float):
+        # the task requeued for retry_at keeps the lease
+        retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        self.athlete_repo.update_sync_cursor(
+            self.athlete_id, {"status": SYNC_WAITING, "retry_at": retry_at, "lease_until": retry_at + SYNC_LEASE}
+        )
+
+    def fail(self, error: Exception):
+        # held while the task retries
+        self.athlete_repo.update_sync_cursor(self.athlete_id, {
+            "status": SYNC_FAILED, "error": str(error), "lease_until": datetime.utcnow() + SYNC_LEASE,
+        })
+
+    def finish(self):
+        self.athlete_repo.update_sync_cursor(self.athlete_id, {
+            "status": SYNC_DONE, "finished_at": datetime.utcnow(), "lease_until": None,
+        })
+        logger.info(
+            "Fetched %d activities for athlete %d in %d pages: %d inserted, %d updated, %d unchanged.",
+            self.totals["fetched"], self.athlete_id, self.pages,
+            self.totals["inserted"], self.totals["updated"], self.totals["unchanged"],
+        )
+        return self.totals
+
+
+def fetch_athlete_activities(athlete_id, full: bool = False):
+    """
+    Fetch the activities an athlete started since the last sync and store them page by page, so memory
+    stays bounded by one page and every stored page shows up in the app right away. The sync cursor on
+    the athlete is checkpointed after every page: a sync interrupted by the rate limit, an error or a
+    restart resumes after the last stored page and keeps counting its pages and activities.
+    full re-fetches the whole history, unless an unfinished sync is resumed.
+    """
+    sync = AthleteSync(athlete_id, full)
+    try:
+        for page in iter_activity_pages(athlete_id, sync.access_token, sync.after):
+            sync.store_page(page)
+    except RateLimitExceededException as e:
+        sync.wait(e.delay)
+        raise
+    except Exception as e:
+        sync.fail(e)
+        raise
+    return sync.finish()
@@ -2,6 +2,7 @@ import logging
 
 from models.activity import Activity, GeoJSONLineString
 from repositories.activity_repo import ActivityRepository
+from services.core_services.activity_events import on_activity_deleted
 
 logger = logging.getLogger(__name__)
 
@@ -35,4 +36,5 @@ def perform_post_deletion_cleanup(activity: Activity):
     """
     Perform any necessary cleanup after deleting an activity.
     """
+    on_activity_deleted(activity)
     logger.info(f"Post-deletion cleanup for activity {activity.activity_id} completed.")
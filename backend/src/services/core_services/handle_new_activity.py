@@ -1,12 +1,13 @@
-import requests
 import logging
 from datetime import datetime
 
 from services.core_services.rate_limit_tracker import RateLimitTracker
+from services.core_services.strava_client import StravaClient
 from models.activity import Activity
 from repositories.activity_repo import ActivityRepository
 from repositories.athlete_repo import AthleteRepository
 from services.core_services.auth_refresh import refresh_token
+from services.core_services.activity_events import on_activities_upserted
 
 logger = logging.getLogger(__name__)
 
@@ -30,12 +31,12 @@ def handle_new_activity(activity_id: int, athlete_id: int):
 
     access_token = athlete.tokens["access_token"]
 
-    activity_url = f"https://www.strava.com/api/v3/activities/{activity_id}"
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
         rate_limit_tracker.wait_if_needed()
-        response = requests.get(activity_url, headers=headers)
-        rate_limit_tracker.update_limits(response.headers)
+        response = StravaClient().get(
+            f"/api/v3/activities/{activity_id}", endpoint="/api/v3/activities/{id}", headers=headers
+        )
 
         if response.status_code != 200:
             raise Exception(
@@ -50,8 +51,9 @@ def handle_new_activity(activity_id: int, athlete_id: int):
 
     try:
         activity = Activity.create_activity_from_data(activity_data, athlete_id)
-        activity_repo.create_activity(activity)
+        # Strava redelivers events, an upsert stores the activity once and updates it if it changed
+        on_activities_upserted(activity_repo.bulk_upsert_activities([activity]))
 
-        logger.debug(f"Inserted activity {activity.activity_id} for athlete {athlete_id}.")
+        logger.debug(f"Stored activity {activity.activity_id} for athlete {athlete_id}.")
     except Exception as e:
         raise Exception(f"Failed to process activity {activity_data.get('id')}") from e
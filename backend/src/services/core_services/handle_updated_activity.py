@@ -1,6 +1,7 @@
 import logging
 from models.activity import Activity
 from repositories.activity_repo import ActivityRepository
+from services.core_services.activity_events import on_activity_updated
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +19,9 @@ def handle_updated_activity(activity_id: int, updated_fields: dict):
 
     mapped_fields = {WEBHOOK_TO_API_FIELD_MAP.get(k, k): v for k, v in updated_fields.items()}
     try:
-        updated_activity = activity_repo.update_activity(activity_id, mapped_fields)
+        # the stored activity is the one the update replaced, a concurrent change can't skew the deltas
+        activity, updated_activity = activity_repo.update_activity_returning_stored(activity_id, mapped_fields)
+        on_activity_updated(activity, updated_activity)
         logger.info(f"Successfully updated activity {activity_id} with fields: {mapped_fields}")
         return updated_activity
 
@@ -2,6 +2,7 @@ import logging
 
 from repositories.athlete_repo import AthleteRepository
 from repositories.activity_repo import ActivityRepository
+from services.core_services.activity_events import on_athlete_deleted
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,7 @@ def handle_updated_athlete(athlete_id: int, updated_fields: dict):
                 logger.warning(f"Athlete {athlete_id} not found. No deletion performed.")
 
             activity_repo.delete_activities_by_athlete_id(athlete_id)
+            on_athlete_deleted(athlete_id)
 
             logger.info(f"Successfully handled deauthorization for athlete {athlete_id}.")
         else:
@@ -0,0 +1,135 @@
+import logging
+import math
+from collections import Counter
+
+import numpy as np
+
+from models.activity import Activity, GeoJSONLineString
+from repositories.activity_repo import ActivityRepository
+from repositories.data_version_repo import DataVersionRepository
+from repositories.heatmap_repo import HeatmapRepository
+from repositories.migration_repo import MigrationRepository
+from utils.geometry import MAX_LATITUDE, TILE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# routes are rasterized into TILE_SIZE x TILE_SIZE cells per web mercator tile of this zoom (~150 m cells)
+HEATMAP_ZOOM = 10
+
+# recorded once the heatmap was built from all stored activities
+HEATMAP_MIGRATION = "heatmap"
+
+
+def project(coordinates, zoom: int = HEATMAP_ZOOM):
+    """
+    Project (lat, lng) coordinates to global web mercator pixel coordinates (x, y) of a zoom level.
+    """
+    points = np.asarray(coordinates, dtype=np.float64)
+    lat = np.radians(np.clip(points[:, 0], -MAX_LATITUDE, MAX_LATITUDE))
+    size = TILE_SIZE * 2 ** zoom
+    x = (points[:, 1] + 180) / 360 * size
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * size
+    return np.clip(np.stack((x, y), axis=1), 0, size - 1e-9)
+
+
+def rasterize_route(coordinates):
+    """
+    Return the global pixel indices (y * width + x) of the heatmap cells a route passes through.
+    The segments are sampled at least once per cell, so lines don't skip cells.
+    """
+    if len(coordinates) < 2:
+        return np.zeros(0, dtype=np.int64)
+    points = project(coordinates)
+    deltas = points[1:] - points[:-1]
+    steps = np.maximum(np.ceil(np.abs(deltas).max(axis=1)), 1).astype(np.int64)
+
+    segment = np.repeat(np.arange(len(deltas)), steps)
+    position = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    samples = points[segment] + deltas[segment] * (position / steps[segment])[:, None]
+    samples = np.vstack((samples, points[-1:]))
+
+    cells = np.floor(samples).astype(np.int64)
+    return np.unique(cells[:, 1] * (TILE_SIZE * 2 ** HEATMAP_ZOOM) + cells[:, 0])
+
+
+def calc_route_deltas(routes, sign: int = 1):
+    """
+    Return the {(athlete_id, year, x, y): {cell_index: count}} deltas of adding (sign=1)
+    or removing (sign=-1) routes given as (athlete_id, year, coordinates).
+    """
+    width = TILE_SIZE * 2 ** HEATMAP_ZOOM
+    deltas = {}
+    for athlete_id, year, coordinates in routes:
+        pixels = rasterize_route(coordinates)
+        px, py = pixels % width, pixels // width
+        tiles_x, tiles_y = px // TILE_SIZE, py // TILE_SIZE
+        cells = (py % TILE_SIZE) * TILE_SIZE + px % TILE_SIZE
+        for x, y, cell in zip(tiles_x.tolist(), tiles_y.tolist(), cells.tolist()):
+            deltas.setdefault((athlete_id, year, x, y), Counter())[cell] += sign
+    return deltas
+
+
+def calc_heatmap_deltas(activities: list[Activity], sign: int = 1):
+    """
+    Return the heatmap deltas of adding (sign=1) or removing (sign=-1) the routes of the activities.
+    """
+    return calc_route_deltas(
+        ((activity.athlete_id, activity.year, activity.polyline.points) for activity in activities if activity.polyline),
+        sign,
+    )
+
+
+def merge_heatmap_deltas(*deltas):
+    """
+    Sum heatmap deltas, e.g. the removal of the old and the addition of the new route of an updated activity.
+    """
+    merged = {}
+    for delta in deltas:
+        for key, cells in delta.items():
+            merged.setdefault(key, Counter()).update(cells)
+    return merged
+
+
+def heatmap_activities(activities: list[Activity]) -> list[Activity]:
+    """
+    Return the activities whose routes the heatmap holds: all of them once the HEATMAP_MIGRATION is done.
+    While it runs only those up to its checkpoint, the rebuild rasterizes the others in their current
+    state when it reaches them, so changes to them are left out of the live deltas.
+    """
+    migration = MigrationRepository().find(HEATMAP_MIGRATION)
+    if migration is not None and migration.get("done_at") is not None:
+        return activities
+    checkpoint = migration.get("checkpoint") if migration else None
+    if checkpoint is None:
+        return []
+    return [activity for activity in activities if activity.activity_id <= checkpoint]
+
+
+def rebuild_heatmap(batch_size: int = 500, checkpoint: int = None):
+    """
+    Recompute the heatmap of all athletes from the activities collection in activity_id order, as the
+    claimed HEATMAP_MIGRATION. Without checkpoint it is restarted and the heatmap cleared, otherwise it
+    continues after that activity_id. Every batch is checkpointed. Returns the number of rasterized routes.
+    """
+    heatmap_repo = HeatmapRepository()
+    migration_repo = MigrationRepository()
+    if checkpoint is None:
+        # no live deltas reach the heatmap until the first checkpoint
+        migration_repo.restart(HEATMAP_MIGRATION)
+        heatmap_repo.delete_all()
+        checkpoint = 0
+        migration_repo.save_checkpoint(HEATMAP_MIGRATION, checkpoint)
+
+    routes = 0
+    for batch in ActivityRepository().iter_polyline_documents(batch_size, after=checkpoint):
+        heatmap_repo.apply_deltas(calc_route_deltas(
+            (doc["athlete_id"], doc["year"], GeoJSONLineString.from_mongo(doc["summary_polyline"]).points)
+            for doc in batch
+        ))
+        migration_repo.save_checkpoint(HEATMAP_MIGRATION, batch[-1]["activity_id"])
+        routes += len(batch)
+        logger.info(f"Rasterized {routes} routes into the heatmap.")
+
+    DataVersionRepository().bump_version()
+    migration_repo.mark_done(HEATMAP_MIGRATION)
+    return routes
@@ -0,0 +1,211 @@
+import logging
+from datetime import datetime
+
+from models.season import Season
+from repositories.activity_repo import ActivityRepository
+from repositories.data_version_repo import DataVersionRepository
+from repositories.leaderboard_repo import LeaderboardRepository
+from repositories.season_repo import SeasonRepository
+
+logger = logging.getLogger(__name__)
+
+# Category mapping of the default season
+# IMPORTANT: keep mapped_types sorted by value!
+mapped_types = {
+    "Ride": "Biking",
+    "VirtualRide": "Biking",
+    "Velomobile": "Biking",
+    "Handcycle": "Biking",
+    "GravelRide": "Biking",
+    "MountainBikeRide": "Biking",
+    "Run": "Running",
+    "VirtualRun": "Running",
+    "TrailRun": "Running",
+    "BackcountrySki": "Hiking",
+    "Hike": "Hiking",
+    "Snowshoe": "Hiking",
+    "AlpineSki": "Alpine Snow Sports",
+    "Snowboard": "Alpine Snow Sports",
+    "IceSkate": "Nordic Ski / Inline",
+    "InlineSkate": "Nordic Ski / Inline",
+    "NordicSki": "Nordic Ski / Inline",
+    "RollerSki": "Nordic Ski / Inline",
+    "Crossfit": "Gym",
+    "WeightTraining": "Gym",
+    "Workout": "Gym",
+    "HighIntensityIntervalTraining": "Gym",
+    "Soccer": "Ball Sports",
+    "Badminton": "Ball Sports",
+    "Pickleball": "Ball Sports",
+    "Racquetball": "Ball Sports",
+    "Squash": "Ball Sports",
+    "TableTennis": "Ball Sports",
+    "Tennis": "Ball Sports",
+    "RockClimbing": "Climbing",
+    "Kayaking": "Water Sports",
+    "Kitesurf": "Water Sports",
+    "Windsurf": "Water Sports",
+    "Rowing": "Water Sports",
+    "VirtualRow": "Water Sports",
+    "Sail": "Water Sports",
+    "Canoeing": "Water Sports",
+    "StandUpPaddling": "Water Sports",
+    "Surfing": "Water Sports",
+    "Swim": "Water Sports",
+    "Windsurf": "Water Sports",
+}
+
+DEFAULT_SEASON_ID = "2025"
+
+# moving time (minutes) two totals may differ by before they count as drift
+DRIFT_TOLERANCE = 1e-6
+
+
+def default_season():
+    """
+    The 2025 season, stored by store_default_season and used as long as no seasons are stored.
+    """
+    return Season(
+        season_id=DEFAULT_SEASON_ID,
+        name="Challenge 2025",
+        start_date=datetime(2025, 1, 1),
+        end_date=datetime(2026, 1, 1),
+        categories=mapped_types,
+    )
+
+
+def store_default_season():
+    """
+    Store the default season if it is missing, so it stays a season once other seasons are created.
+    """
+    if SeasonRepository().insert_season_if_missing(default_season()):
+        logger.info(f"Stored the default season {DEFAULT_SEASON_ID}.")
+
+
+def get_seasons():
+    """
+    Return all configured seasons, ordered by start date.
+    """
+    return SeasonRepository().get_all_seasons() or [default_season()]
+
+
+def find_season(season_id=None, seasons=None):
+    """
+    Return the season with the given id, or the current season if no id is given.
+    The current season is the one running right now, otherwise the latest one that started.
+    """
+    seasons = seasons or get_seasons()
+    if season_id is not None:
+        return next((s for s in seasons if s.season_id == season_id), None)
+
+    now = datetime.utcnow()
+    running = [s for s in seasons if s.includes_date(now)]
+    if running:
+        return running[-1]
+    started = [s for s in seasons if s.start_date <= now]
+    return started[-1] if started else seasons[0]
+
+
+def calc_leaderboard_deltas(activities, seasons, sign=1):
+    """
+    Group activities into {(athlete_id, category, season_id): (moving_time, activity_count)} deltas
+    for every season they count for. A sign of -1 produces the deltas for removing the activities.
+    """
+    deltas = {}
+    for activity in activities:
+        for season in seasons:
+            category = season.category_for(activity)
+            if not category:
+                continue
+
+            key = (activity.athlete_id, category, season.season_id)
+            moving_time, activity_count = deltas.get(key, (0, 0))
+            deltas[key] = (moving_time + sign * (activity.moving_time or 0), activity_count + sign)
+
+    return deltas
+
+
+def merge_leaderboard_deltas(*deltas):
+    """
+    Sum several delta dicts into one.
+    """
+    merged = {}
+    for delta in deltas:
+        for key, (moving_time, activity_count) in delta.items():
+            merged_moving_time, merged_activity_count = merged.get(key, (0, 0))
+            merged[key] = (merged_moving_time + moving_time, merged_activity_count + activity_count)
+    return merged
+
+
+def calc_season_totals(season: Season):
+    """
+    Aggregate {(athlete_id, category, season_id): (moving_time, activity_count)} for a season from the activities.
+    """
+    activity_repo = ActivityRepository()
+
+    totals = {}
+    rows = activity_repo.sum_moving_time_by_athlete_and_type(
+        season.categories.keys(), season.start_date, season.end_date, season.athlete_ids
+    )
+    for (athlete_id, activity_type), (moving_time, activity_count) in rows.items():
+        key = (athlete_id, season.categories[activity_type], season.season_id)
+        total_moving_time, total_count = totals.get(key, (0, 0))
+        totals[key] = (total_moving_time + moving_time, total_count + activity_count)
+    return totals
+
+
+def rebuild_leaderboard_totals(verify_only=False, season_id=None):
+    """
+    Recompute the materialized leaderboard totals of all seasons (or only the given one) from
+    the activities collection. Returns every (athlete, category, season) entry whose stored total
+    drifted from the recomputed one. Unless verify_only is set, the stored totals are replaced and
+    the seasons are marked as materialized, so their leaderboards are served from the totals.
+    """
+    leaderboard_repo = LeaderboardRepository()
+
+    seasons = get_seasons()
+    if season_id is not None:
+        seasons = [s for s in seasons if s.season_id == season_id]
+        if not seasons:
+            raise Exception(f"No season found with season_id {season_id}.")
+
+    expected = {}
+    for season in seasons:
+        expected.update(calc_season_totals(season))
+
+    stored = leaderboard_repo.find_all_totals(season_id)
+
+    drift = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        expected_moving_time, expected_count = expected.get(key, (0, 0))
+        stored_moving_time, stored_count = stored.get(key, (0, 0))
+        if expected_count != stored_count or abs(expected_moving_time - stored_moving_time) > DRIFT_TOLERANCE:
+            athlete_id, category, season = key
+            drift.append({
+                "athlete_id": athlete_id,
+                "category": category,
+                "season": season,
+                "stored": {"moving_time": stored_moving_time, "activity_count": stored_count},
+                "expected": {"moving_time": expected_moving_time, "activity_count": expected_count},
+            })
+
+    logger.info(f"Leaderboard totals verified: {len(expected)} entries, {len(drift)} drifted.")
+    if not verify_only:
+        leaderboard_repo.replace_totals(expected, season_id)
+        SeasonRepository().set_totals_materialized([season.season_id for season in seasons])
+        DataVersionRepository().bump_version()
+        logger.info("Leaderboard totals rebuilt from activities.")
+
+    return drift
+
+
+def materialize_leaderboard_totals():
+    """
+    Rebuild the totals of every stored season that was never materialized, e.g. after a deploy to an
+    existing database. Until then its leaderboard is aggregated from the activities, as the deltas
+    applied so far only cover the activities stored since the deploy.
+    """
+    for season in SeasonRepository().get_all_seasons():
+        if not season.totals_materialized:
+            logger.info(f"Materializing the leaderboard totals of season {season.season_id}.")
+            rebuild_leaderboard_totals(season_id=season.season_id)
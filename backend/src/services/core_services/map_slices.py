@@ -0,0 +1,51 @@
+import os
+import logging
+
+from models.activity import Activity
+from utils.lru_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+SLICE_CACHE_BYTES = int(os.getenv("MAP_SLICE_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+class SliceCache(VersionedCache):
+    """
+    The serialized map routes of one athlete and year, keyed by (athlete_id, year, format, lod, encoding).
+    A value is the comma separated JSON of the routes without brackets, empty if there are none,
+    so /api/map answers by joining the slices of the requested athletes and years. With an encoding
+    the value is that JSON compressed, so compressed responses are joined from the slices as well.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SliceCache, cls).__new__(cls)
+            VersionedCache.__init__(cls._instance, SLICE_CACHE_BYTES)
+            logger.info("SliceCache initialized with %d bytes.", SLICE_CACHE_BYTES)
+        return cls._instance
+
+    def __init__(self):
+        # initialized once in __new__
+        pass
+
+    @staticmethod
+    def key(athlete_id: int, year: int, map_format: str, lod: str = None, encoding: str = None):
+        return athlete_id, year, map_format, lod, encoding
+
+
+def invalidate_activity_slices(activities: list[Activity], version: int):
+    """
+    Drop the cached slices containing any of the activities.
+    """
+    slices = {(activity.athlete_id, activity.year) for activity in activities}
+    removed = SliceCache().invalidate(lambda key: key[:2] in slices, version)
+    logger.debug(f"Invalidated {removed} map slices.")
+
+
+def invalidate_athlete_slices(athlete_id: int, version: int):
+    """
+    Drop the cached slices of the athlete.
+    """
+    removed = SliceCache().invalidate(lambda key: key[0] == athlete_id, version)
+    logger.debug(f"Invalidated {removed} map slices of athlete {athlete_id}.")
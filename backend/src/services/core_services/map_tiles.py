@@ -0,0 +1,91 @@
+import os
+import logging
+
+from models.activity import Activity
+from utils.geometry import MAX_LATITUDE, TILE_SIZE, tile_bounds
+from utils.lru_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+MAX_TILE_ZOOM = 18
+# routes are clipped to the tile plus this many pixels, so lines don't end exactly at the tile border
+TILE_BUFFER_PIXELS = 4
+TILE_CACHE_BYTES = int(os.getenv("MAP_TILE_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+class TileCache(VersionedCache):
+    """
+    Rendered map tiles keyed by (z, x, y, athlete_ids, years). The activity event hooks invalidate
+    only the tiles a changed activity touches. Changes made outside of this process (e.g. by scripts)
+    show up as unexpected data version and clear the whole cache.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TileCache, cls).__new__(cls)
+            VersionedCache.__init__(cls._instance, TILE_CACHE_BYTES)
+            logger.info("TileCache initialized with %d bytes.", TILE_CACHE_BYTES)
+        return cls._instance
+
+    def __init__(self):
+        # initialized once in __new__
+        pass
+
+    @staticmethod
+    def key(z: int, x: int, y: int, athlete_ids, years):
+        return z, x, y, tuple(sorted(set(athlete_ids))), tuple(sorted(set(years)))
+
+
+def padded_tile_bounds(z: int, x: int, y: int):
+    """
+    Returns the (minLng, minLat, maxLng, maxLat) bounds of a tile plus the buffer routes are clipped to.
+    """
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+    buffer = (max_lng - min_lng) * TILE_BUFFER_PIXELS / TILE_SIZE
+    return (
+        max(min_lng - buffer, -180.0),
+        max(min_lat - buffer, -MAX_LATITUDE),
+        min(max_lng + buffer, 180.0),
+        min(max_lat + buffer, MAX_LATITUDE),
+    )
+
+
+def route_extent(activity: Activity):
+    """
+    Returns the athlete ID, year and (minLat, minLng, maxLat, maxLng) route extent of an activity, None without route.
+    """
+    if not activity.polyline or not len(activity.polyline.points):
+        return None
+    min_lat, min_lng = activity.polyline.points.min(axis=0).tolist()
+    max_lat, max_lng = activity.polyline.points.max(axis=0).tolist()
+    return activity.athlete_id, activity.year, (min_lat, min_lng, max_lat, max_lng)
+
+
+def tile_shows(key, extent) -> bool:
+    """
+    Check if the cached tile with the given key shows a route with the given extent.
+    """
+    z, x, y, athlete_ids, years = key
+    athlete_id, year, (route_min_lat, route_min_lng, route_max_lat, route_max_lng) = extent
+    if athlete_id not in athlete_ids or year not in years:
+        return False
+    min_lng, min_lat, max_lng, max_lat = padded_tile_bounds(z, x, y)
+    return route_min_lat <= max_lat and route_max_lat >= min_lat and route_min_lng <= max_lng and route_max_lng >= min_lng
+
+
+def invalidate_activity_tiles(activities: list[Activity], version: int):
+    """
+    Drop the cached tiles showing any of the activities.
+    """
+    extents = [extent for extent in map(route_extent, activities) if extent]
+    removed = TileCache().invalidate(lambda key: any(tile_shows(key, extent) for extent in extents), version)
+    logger.debug(f"Invalidated {removed} map tiles.")
+
+
+def invalidate_athlete_tiles(athlete_id: int, version: int):
+    """
+    Drop the cached tiles showing routes of the athlete.
+    """
+    removed = TileCache().invalidate(lambda key: athlete_id in key[3], version)
+    logger.debug(f"Invalidated {removed} map tiles of athlete {athlete_id}.")
@@ -37,12 +37,15 @@ class RateLimitTracker:
         return now.replace(minute=reset_minute, second=0, microsecond=0)
 
     def update_limits(self, headers):
-        """Update rate limits and usage directly from API response headers."""
+        """
+        Update rate limits and usage from API response headers. The usage only grows until the reset in
+        wait_if_needed, responses of concurrent requests arrive out of order and carry older counts.
+        """
         with self.lock:
             self.limit_15_min = int(headers.get("X-ReadRateLimit-Limit", "200").split(",")[0])
             self.limit_daily = int(headers.get("X-ReadRateLimit-Limit", "1000").split(",")[1])
-            self.requests_15_min = int(headers.get("X-ReadRateLimit-Usage", "0").split(",")[0])
-            self.requests_daily = int(headers.get("X-ReadRateLimit-Usage", "0").split(",")[1])
+            self.requests_15_min = max(self.requests_15_min, int(headers.get("X-ReadRateLimit-Usage", "0").split(",")[0]))
+            self.requests_daily = max(self.requests_daily, int(headers.get("X-ReadRateLimit-Usage", "0").split(",")[1]))
 
             logger.info("Rate limits updated: 15-min=%d/%d, daily=%d/%d",
                         self.requests_15_min, self.limit_15_min,
@@ -72,3 +75,14 @@ class RateLimitTracker:
                 sleep_time = max(sleep_time_15_min, sleep_time_daily)
                 logger.warning(f"Rate limit reached. Pausing for {sleep_time:.2f} seconds.")
                 raise RateLimitExceededException(delay=sleep_time)
+
+    def reserve(self):
+        """
+        Check the limits like wait_if_needed and count the request right away. Concurrent requests can't
+        all pass the check before the usage headers of their responses arrive, the headers still raise
+        the count afterwards if Strava counted more.
+        """
+        self.wait_if_needed()
+        with self.lock:
+            self.requests_15_min += 1
+            self.requests_daily += 1
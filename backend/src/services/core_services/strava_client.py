@@ -0,0 +1,90 @@
+import os
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.core_services.rate_limit_tracker import RateLimitTracker
+from utils.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+# overridable to run against a local Strava stub
+STRAVA_BASE_URL = os.getenv("STRAVA_BASE_URL", "https://www.strava.com")
+# (connect, read) timeout in seconds of calls that don't pass their own
+STRAVA_TIMEOUT = (float(os.getenv("STRAVA_CONNECT_TIMEOUT", 5)), float(os.getenv("STRAVA_READ_TIMEOUT", 30)))
+STRAVA_POOL_SIZE = int(os.getenv("STRAVA_POOL_SIZE", 10))
+
+
+def json_bound(bound):
+    return "inf" if bound == float("inf") else bound
+
+
+class StravaClient:
+    """
+    Shared HTTP client of all Strava calls. One pooled keep-alive session saves the TLS handshake per
+    call, every call gets a timeout, responses carrying rate limit headers update the RateLimitTracker
+    and the latency of every endpoint is recorded in a histogram.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(StravaClient, cls).__new__(cls)
+            cls._instance.base_url = STRAVA_BASE_URL
+            cls._instance.session = cls.create_session()
+            cls._instance.lock = threading.Lock()
+            cls._instance.latencies = {}
+            logger.info("StravaClient initialized for %s with %d pooled connections.", STRAVA_BASE_URL, STRAVA_POOL_SIZE)
+        return cls._instance
+
+    @staticmethod
+    def create_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=STRAVA_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def request(self, method: str, path: str, endpoint: str = None, timeout=STRAVA_TIMEOUT, **kwargs):
+        """
+        Send a request to the Strava path (e.g. /api/v3/athlete/activities). endpoint names the path in
+        the latency stats, pass a template for paths with IDs (e.g. /api/v3/activities/{id}).
+        """
+        key = f"{method.upper()} {endpoint or path}"
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+        finally:
+            self.latency_histogram(key).observe(time.perf_counter() - start)
+
+        if "X-ReadRateLimit-Usage" in response.headers:
+            RateLimitTracker().update_limits(response.headers)
+        return response
+
+    def get(self, path: str, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def latency_histogram(self, key: str) -> Histogram:
+        with self.lock:
+            histogram = self.latencies.get(key)
+            if histogram is None:
+                histogram = self.latencies[key] = Histogram()
+            return histogram
+
+    def latency_stats(self):
+        """
+        Return the latency histogram and the approximate median and 95th percentile per endpoint.
+        Percentiles beyond the last bucket are "inf" like its bucket key, JSON has no infinity.
+        """
+        with self.lock:
+            latencies = dict(self.latencies)
+        return {
+            key: {**histogram.stats(), "p50": json_bound(histogram.quantile(0.5)), "p95": json_bound(histogram.quantile(0.95))}
+            for key, histogram in sorted(latencies.items())
+        }
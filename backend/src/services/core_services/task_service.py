@@ -8,21 +8,29 @@ import threading
 
 from api.exceptions import RateLimitExceededException
 
-from services.core_services.fetch_athlete_activities import fetch_athlete_activities
+from repositories.athlete_repo import AthleteRepository
+from services.core_services.fetch_athlete_activities import (
+    fetch_athlete_activities, SYNC_DONE, SYNC_LEASE, SYNC_RUNNING, SYNC_WAITING,
+)
+from services.core_services.async_fetch import fetch_athletes_activities
 from services.core_services.handle_updated_activity import handle_updated_activity
 from services.core_services.handle_updated_athlete import handle_updated_athlete
 from services.core_services.handle_deleted_activiy import handle_deleted_activity
 from services.core_services.handle_new_activity import handle_new_activity
+from services.core_services.backfills import run_backfills
 
 logger = logging.getLogger(__name__)
 
 
 class TaskType(Enum):
     FETCH_ACTIVITIES = "fetch_activities"
+    FETCH_ACTIVITIES_BATCH = "fetch_activities_batch"
     HANDLE_NEW_ACTIVITY = "handle_new_activity"
     HANDLE_UPDATED_ACTIVITY = "handle_updated_activity"
     HANDLE_DELETED_ACTIVITY = "handle_deleted_activity"
     HANDLE_UPDATED_ATHLETE = "handle_updated_athlete"
+    RUN_BACKFILLS = "run_backfills"
+    RESUME_SYNCS = "resume_syncs"
 
 
 @dataclass
@@ -101,6 +109,22 @@ class TaskService:
                 fetch_athlete_activities(athlete_id=task.athlete_id)
                 logger.info(f"Finished processing FETCH_ACTIVITIES task for athlete {task.athlete_id}.")
 
+            elif task.task_type == TaskType.FETCH_ACTIVITIES_BATCH:
+                athlete_ids = task.params.get("athlete_ids")
+                if not athlete_ids:
+                    logger.error("Missing 'athlete_ids' in params for FETCH_ACTIVITIES_BATCH.")
+                    return
+                results = fetch_athletes_activities(athlete_ids)
+                unfinished = [athlete_id for athlete_id, result in results.items() if isinstance(result, Exception)]
+                if unfinished:
+                    # only the athletes that didn't finish are retried or requeued, from their checkpoints
+                    task.params["athlete_ids"] = unfinished
+                    delays = [result.delay for result in results.values() if isinstance(result, RateLimitExceededException)]
+                    if delays:
+                        raise RateLimitExceededException(delay=max(delays))
+                    raise Exception(f"Failed to fetch the activities of athletes {unfinished}.")
+                logger.info(f"Finished processing FETCH_ACTIVITIES_BATCH task for athletes {athlete_ids}.")
+
             elif task.task_type == TaskType.HANDLE_NEW_ACTIVITY:
                 activity_id = task.params.get("activity_id")
                 if not activity_id:
@@ -134,6 +158,14 @@ class TaskService:
                 handle_updated_athlete(task.athlete_id, updates)
                 logger.info(f"Handled updated athlete: {task.params}")
 
+            elif task.task_type == TaskType.RUN_BACKFILLS:
+                run_backfills()
+                logger.info("Finished processing RUN_BACKFILLS task.")
+
+            elif task.task_type == TaskType.RESUME_SYNCS:
+                self.resume_interrupted_syncs()
+                logger.info("Finished processing RESUME_SYNCS task.")
+
             else:
                 logger.warning(f"Unhandled task type: {task.task_type}")
         except RateLimitExceededException as e:
@@ -145,6 +177,61 @@ class TaskService:
             logger.error("Error processing task: %s", str(e))
             raise
 
+    def start(self):
+        """
+        Queue the work a starting backend does in the background instead of while booting: the default
+        season, the leaderboard totals of unmaterialized seasons, the backfills of data added by later versions
+        and the activity syncs a restart interrupted. Called once per worker process (see gunicorn.conf.py),
+        the tasks claim their work in the database, so they don't run twice.
+        """
+        self.submit_task(Task(athlete_id=None, endpoint=None, params={}, task_type=TaskType.RUN_BACKFILLS))
+        self.submit_task(Task(athlete_id=None, endpoint=None, params={}, task_type=TaskType.RESUME_SYNCS))
+
+    def resume_interrupted_syncs(self):
+        """
+        Resubmit the activity syncs that didn't finish before their process stopped, they continue from
+        their checkpoints. Each sync is claimed first, so syncs a live process still runs or requeued are
+        left alone and no sync is queued twice. The ones that can continue right away are fetched
+        concurrently in one batch, syncs waiting for the rate limit are scheduled for when it resets.
+        Running and waiting syncs whose lease is still held are checked again when it expires.
+        """
+        athlete_repo = AthleteRepository()
+        ready, held = [], []
+        for doc in athlete_repo.find_unfinished_syncs(SYNC_DONE):
+            cursor = doc["sync_cursor"]
+            retry_at = cursor.get("retry_at")
+            if not athlete_repo.claim_sync(doc["athlete_id"], SYNC_DONE, (retry_at or datetime.utcnow()) + SYNC_LEASE):
+                if cursor.get("status") in (SYNC_RUNNING, SYNC_WAITING) and cursor.get("lease_until"):
+                    held.append(cursor["lease_until"])
+                continue
+            if retry_at is None:
+                ready.append(doc["athlete_id"])
+                continue
+            self.submit_task(Task(
+                athlete_id=doc["athlete_id"],
+                endpoint="https://api.strava.com/api/v3/athlete/activities",
+                params={},
+                task_type=TaskType.FETCH_ACTIVITIES,
+                # retry_at is UTC, tasks are scheduled in local time
+                execute_after=datetime.now() + (retry_at - datetime.utcnow()),
+            ))
+            logger.info(f"Resumed the activity sync of athlete {doc['athlete_id']}.")
+
+        if ready:
+            self.submit_task(Task(
+                athlete_id=None,
+                endpoint="https://api.strava.com/api/v3/athlete/activities",
+                params={"athlete_ids": ready},
+                task_type=TaskType.FETCH_ACTIVITIES_BATCH,
+            ))
+            logger.info(f"Resumed the activity syncs of athletes {ready}.")
+
+        if held:
+            self.submit_task(Task(
+                athlete_id=None, endpoint=None, params={}, task_type=TaskType.RESUME_SYNCS,
+                execute_after=datetime.now() + max(min(held) - datetime.utcnow(), timedelta(0)),
+            ))
+
     def shutdown(self):
         logger.info("Shutting down ApiRequestService.")
         self.executor.shutdown(wait=True)
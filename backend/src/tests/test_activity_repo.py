@@ -1,7 +1,11 @@
 import pytest
-from datetime import datetime
+from datetime import datetime, timezone
+from unittest.mock import patch
 from models.activity import Activity, GeoJSONLineString
 from repositories.activity_repo import ActivityRepository
+from utils.geometry import viewport_polygon
+from polyline import decode as decode_polyline
+import orjson
 
 
 @pytest.fixture(scope="module")
@@ -18,7 +22,7 @@ def sample_activities():
             athlete_id=67890,
             name="Morning Ride",
             type="Ride",
-            start_date=datetime.utcnow(),
+            start_date=datetime(2024, 5, 1, 8, 0),
             moving_time=3600.0,
             distance=25000.0,
             total_elevation_gain=500.0,
@@ -33,7 +37,7 @@ def sample_activities():
             athlete_id=67890,
             name="Evening Ride",
             type="Ride",
-            start_date=datetime.utcnow(),
+            start_date=datetime(2024, 5, 1, 18, 0),
             moving_time=3600.0,
             distance=30000.0,
             total_elevation_gain=700.0,
@@ -48,7 +52,7 @@ def sample_activities():
             athlete_id=12345,
             name="Afternoon Swim",
             type="Swim",
-            start_date=datetime.utcnow(),
+            start_date=datetime(2024, 5, 2, 14, 0),
             moving_time=2700.0,
             distance=2000.0,
             total_elevation_gain=0.0,
@@ -90,6 +94,15 @@ def test_update_activity(activity_repo, sample_activities):
     assert updated_activity.name == "Evening Ride"
 
 
+def test_update_activity_returning_stored(activity_repo, sample_activities):
+    activity_id = sample_activities[0].activity_id
+    name = activity_repo.find_activity_by_id(activity_id).name
+    stored, updated = activity_repo.update_activity_returning_stored(activity_id, {"name": "Night Ride"})
+    assert (stored.name, updated.name) == (name, "Night Ride")
+    assert activity_repo.find_activity_by_id(activity_id).name == "Night Ride"
+    assert b"Night Ride" in activity_repo.collection.find_one({"activity_id": activity_id})["map_fragment"]
+
+
 def test_list_activities_by_athlete_and_year(activity_repo, sample_activities):
     activities = activity_repo.list_activities_by_athlete_and_year(sample_activities[0].athlete_id, sample_activities[0].year)
     assert len(activities) > 0
@@ -161,3 +174,234 @@ def test_create_activity_with_invalid_polyline(activity_repo):
         assert created_activity.polyline is None  # Invalid polyline should result in None
     finally:
         activity_repo.delete_activity(activity_id)
+
+def test_sum_moving_time_by_athlete_and_type(activity_repo):
+    start_date, end_date = datetime(2024, 1, 1), datetime(2025, 1, 1)
+    totals = activity_repo.sum_moving_time_by_athlete_and_type(["Ride", "Swim"], start_date, end_date, [67890, 12345])
+    assert totals[(67890, "Ride")] == (7200.0, 2)
+    assert totals[(12345, "Swim")] == (2700.0, 1)
+    assert (12345, "Ride") not in totals
+
+    totals = activity_repo.sum_moving_time_by_athlete_and_type(["Ride"], datetime(2024, 5, 1, 12, 0), end_date, [67890])
+    assert totals == {(67890, "Ride"): (3600.0, 1)}
+
+    totals = activity_repo.sum_moving_time_by_athlete_and_type(["Ride"], datetime(2025, 1, 1), datetime(2026, 1, 1), [67890])
+    assert totals == {}
+
+
+def test_iter_activities_with_polylines(activity_repo):
+    listed = activity_repo.list_activities_with_polylines([67890, 12345], [2024])
+    batches = list(activity_repo.iter_activities_with_polylines([67890, 12345], [2024], batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert [doc for batch in batches for doc in batch] == listed
+    assert all("_id" not in doc and "kudos" not in doc for doc in listed)
+
+
+def test_encoded_polyline_and_bbox_are_stored(activity_repo):
+    doc = activity_repo.collection.find_one({"activity_id": 1})
+    assert decode_polyline(doc["encoded_polyline"]) == [(37.7, -122.5), (37.8, -122.6)]
+    assert doc["bbox"] == {
+        "type": "Polygon",
+        "coordinates": [[[-122.6, 37.7], [-122.5, 37.7], [-122.5, 37.8], [-122.6, 37.8], [-122.6, 37.7]]],
+    }
+
+
+def test_list_activities_with_encoded_polylines(activity_repo):
+    activities = activity_repo.list_activities_with_polylines([67890], [2024], encoded=True)
+    assert len(activities) == 2
+    for activity in activities:
+        assert activity["encoded_polyline"]
+        assert "summary_polyline" not in activity and "bbox" not in activity
+
+    activities = activity_repo.list_activities_with_polylines([67890], [2024])
+    assert all("encoded_polyline" not in activity for activity in activities)
+
+
+def test_map_fragments_match_the_map_documents(activity_repo, sample_activities):
+    activity_repo.update_activity(sample_activities[1].activity_id, {"name": "Late Ride"})
+    listed = activity_repo.list_activities_with_polylines([67890, 12345], [2024])
+    fragments = [fragment for batch in activity_repo.iter_map_fragments([67890, 12345], [2024], batch_size=2) for fragment in batch]
+
+    assert [(athlete_id, year) for athlete_id, year, _ in fragments] == [(doc["athlete_id"], doc["year"]) for doc in listed]
+    assert [orjson.loads(fragment) for _, _, fragment in fragments] == listed
+    assert "map_fragment" not in listed[0]
+    assert any(b'"name":"Late Ride"' in fragment for _, _, fragment in fragments)
+
+
+def test_list_activities_page(activity_repo):
+    listed = activity_repo.list_activities_with_polylines([67890, 12345], [2024])
+    assert [(doc["athlete_id"], doc["activity_id"]) for doc in listed] == [(67890, 2), (67890, 1), (12345, 3)]
+
+    pages, after = [], None
+    while True:
+        page, after = activity_repo.list_activities_page([67890, 12345], [2024], 2, after)
+        pages.append(page)
+        if after is None:
+            break
+    assert [len(page) for page in pages] == [2, 1]
+    assert [doc for page in pages for doc in page] == listed
+
+    page, after = activity_repo.list_activities_page([67890, 12345], [2024], 3)
+    assert len(page) == 3 and after is None
+
+
+def test_bbox_of_degenerate_polylines():
+    line = GeoJSONLineString(type="LineString", coordinates=[[47.0, 11.0], [47.0, 11.5]])
+    assert line.bbox_to_mongo() == {"type": "LineString", "coordinates": [[11.0, 47.0], [11.5, 47.0]]}
+    point = GeoJSONLineString(type="LineString", coordinates=[[47.0, 11.0], [47.0, 11.0]])
+    assert point.bbox_to_mongo() == {"type": "Point", "coordinates": [11.0, 47.0]}
+
+
+def test_polyline_from_mongo_is_converted_lazily():
+    stored = {"type": "LineString", "coordinates": [[-122.5, 37.7], [-122.6, 37.8]]}
+    line = GeoJSONLineString.from_mongo(stored)
+    # unchanged lines are written back as read
+    assert line.to_mongo()["coordinates"] is stored["coordinates"]
+    assert line.coordinates == [[37.7, -122.5], [37.8, -122.6]]
+    assert line.points.tolist() == [[37.7, -122.5], [37.8, -122.6]]
+
+    line.coordinates = [[47.0, 11.0], [47.1, 11.1]]
+    assert line.to_mongo() == {"type": "LineString", "coordinates": [[11.0, 47.0], [11.1, 47.1]]}
+    assert GeoJSONLineString(type="LineString", coordinates=[[37.7]]).points.shape == (0, 2)
+
+
+def test_activity_from_mongo_converts_fields_on_access(sample_activities):
+    doc = sample_activities[0].to_mongo()
+    doc["start_date"] = "2024-05-01T08:00:00Z"
+    activity = Activity.from_mongo(doc)
+    assert activity.distance == 25000.0
+    assert not activity.is_loaded("polyline") and not activity.is_loaded("start_date")
+
+    assert activity.start_date == datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc)
+    assert activity.polyline.coordinates == sample_activities[0].polyline.coordinates
+    assert Activity.from_mongo({**doc, "summary_polyline": None}).polyline is None
+    # missing optional fields read as None, assignments replace the document's values
+    del doc["calories"]
+    activity.name = "Evening Ride"
+    assert activity.calories is None
+    assert activity.to_mongo()["name"] == "Evening Ride" and doc["name"] == "Morning Ride"
+
+
+def test_list_activities_with_simplified_polylines(activity_repo):
+    # a wiggly route along a meridian, the wiggles vanish at low zoom levels
+    coordinates = [[47.0 + i * 0.01, 11.0 + (0.001 if i % 2 else 0.0)] for i in range(50)]
+    activity = Activity(
+        activity_id=4,
+        athlete_id=24680,
+        name="Wiggly Ride",
+        type="Ride",
+        start_date=datetime(2024, 6, 1, 8, 0),
+        moving_time=3600.0,
+        distance=50000.0,
+        total_elevation_gain=100.0,
+        polyline=GeoJSONLineString(type="LineString", coordinates=coordinates),
+        kudos=0,
+        suffer_score=0,
+        url="http://example.com/activity/4",
+        year=2024,
+    )
+    activity_repo.create_activity(activity)
+    try:
+        full = activity_repo.list_activities_with_polylines([24680], [2024], encoded=True)
+        overview = activity_repo.list_activities_with_polylines([24680], [2024], encoded=True, lod="6")
+        detail = list(activity_repo.iter_activities_with_polylines([24680], [2024], encoded=True, lod="12"))[0]
+
+        assert len(decode_polyline(full[0]["encoded_polyline"])) == 50
+        assert decode_polyline(overview[0]["encoded_polyline"]) == [(47.0, 11.0), (47.49, 11.001)]
+        assert "simplified_polylines" not in overview[0]
+        # the wiggles are larger than a pixel at zoom 12, nothing to simplify
+        assert detail[0]["encoded_polyline"] == full[0]["encoded_polyline"]
+    finally:
+        activity_repo.delete_activity(4)
+
+
+def test_list_activities_within_viewport(activity_repo):
+    # the sample routes run from (lat 37.7, lng -122.5) to (lat 37.8, lng -122.6)
+    inside = viewport_polygon(-122.7, 37.6, -122.4, 37.9)
+    crossing = viewport_polygon(-122.58, 37.72, -122.0, 38.0)  # both end points are outside
+    elsewhere = viewport_polygon(11.0, 47.0, 11.5, 47.5)
+
+    assert len(activity_repo.list_activities_with_polylines([67890, 12345], [2024], viewport=inside)) == 3
+    assert len(activity_repo.list_activities_with_polylines([67890, 12345], [2024], viewport=crossing)) == 3
+    assert activity_repo.list_activities_with_polylines([67890, 12345], [2024], viewport=elsewhere) == []
+
+    batches = list(activity_repo.iter_activities_with_polylines([67890], [2024], encoded=True, viewport=inside))
+    assert [len(batch) for batch in batches] == [2]
+    assert all("encoded_polyline" in activity for activity in batches[0])
+
+
+def test_map_sort_index_is_created(activity_repo):
+    keys = [index["key"] for index in activity_repo.collection.index_information().values()]
+    assert [("athlete_id", -1), ("activity_id", -1)] in keys
+
+
+def test_bulk_upsert_activities_is_idempotent(activity_repo):
+    def make(activity_id, name):
+        return Activity.create_activity_from_data({
+            "id": activity_id,
+            "name": name,
+            "sport_type": "Ride",
+            "start_date_local": "2024-07-01T08:00:00Z",
+            "moving_time": 3600,
+            "distance": 30000,
+            "map": {"summary_polyline": "_p~iF~ps|U_ulLnnqC"},
+        }, 13579)
+
+    try:
+        result = activity_repo.bulk_upsert_activities([make(6, "Ride"), make(7, "Ride")])
+        assert [a.activity_id for a in result["inserted"]] == [6, 7]
+        assert result["updated"] == [] and result["unchanged"] == 0
+
+        # stored dates come back as naive UTC, they still match the parsed ones
+        result = activity_repo.bulk_upsert_activities([make(6, "Ride"), make(7, "Ride")])
+        assert result["inserted"] == [] and result["updated"] == [] and result["unchanged"] == 2
+
+        bulk_write = activity_repo.collection.bulk_write
+        with patch.object(activity_repo.collection, "bulk_write", side_effect=bulk_write) as mock_bulk_write:
+            result = activity_repo.bulk_upsert_activities([make(6, "Ride"), make(7, "Long Ride"), make(8, "Ride")])
+        assert [a.activity_id for a in result["inserted"]] == [8] and result["unchanged"] == 1
+        [(before, after)] = result["updated"]
+        assert (before.name, after.name) == ("Ride", "Long Ride")
+        # one bulk write of the inserts, one of the updates
+        assert mock_bulk_write.call_count == 2
+        assert activity_repo.find_activity_by_id(7).name == "Long Ride"
+        assert b"Long Ride" in activity_repo.collection.find_one({"activity_id": 7})["map_fragment"]
+        assert activity_repo.collection.count_documents({"athlete_id": 13579}) == 3
+    finally:
+        activity_repo.delete_activities_by_athlete_id(13579)
+
+
+def test_bulk_upsert_reports_concurrently_stored_activities_once(activity_repo):
+    def make(activity_id, name):
+        return Activity.create_activity_from_data({
+            "id": activity_id,
+            "name": name,
+            "sport_type": "Ride",
+            "start_date_local": "2024-07-01T08:00:00Z",
+            "moving_time": 3600,
+            "distance": 30000,
+            "map": {"summary_polyline": "_p~iF~ps|U_ulLnnqC"},
+        }, 13580)
+
+    try:
+        # stored by a webhook after the bulk upsert read the stored documents
+        activity_repo.create_activity(make(8, "Ride"))
+        activity_repo.create_activity(make(9, "Ride"))
+        find = activity_repo.collection.find
+        calls = []
+
+        def find_before_the_webhook(*args, **kwargs):
+            calls.append(args)
+            return iter([]) if len(calls) == 1 else find(*args, **kwargs)
+
+        with patch.object(activity_repo.collection, "find", side_effect=find_before_the_webhook):
+            result = activity_repo.bulk_upsert_activities([make(8, "Ride"), make(9, "Long Ride"), make(10, "Ride")])
+
+        assert [a.activity_id for a in result["inserted"]] == [10]
+        [(before, after)] = result["updated"]
+        assert (before.activity_id, before.name, after.name) == (9, "Ride", "Long Ride")
+        assert result["unchanged"] == 1
+        assert activity_repo.collection.count_documents({"athlete_id": 13580}) == 3
+    finally:
+        activity_repo.delete_activities_by_athlete_id(13580)
@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from api.exceptions import RateLimitExceededException
+from scripts.strava_simulator import StravaSimulator
+from services.core_services import fetch_athlete_activities as fetch
+from services.core_services.async_fetch import fetch_athletes_activities
+from services.core_services.fetch_athlete_activities import PER_PAGE
+from services.core_services.rate_limit_tracker import RateLimitTracker
+from services.core_services.strava_client import StravaClient
+
+
+@pytest.fixture
+def simulator():
+    simulator = StravaSimulator(activities=2 * PER_PAGE + 50, latency=0.05).start()
+    with patch.object(StravaClient, "_instance", None), patch.object(RateLimitTracker, "_instance", None):
+        StravaClient().base_url = simulator.url
+        yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def athlete_repo():
+    def find_by_athlete_id(athlete_id):
+        athlete = MagicMock(tokens={"access_token": f"athlete-{athlete_id}"}, sync_cursor=None)
+        return athlete
+
+    with patch.object(fetch, "on_activities_upserted"), \
+         patch.object(fetch, "refresh_token", side_effect=lambda athlete: athlete), \
+         patch.object(fetch, "AthleteRepository") as mock_athlete_repo, \
+         patch.object(fetch, "ActivityRepository") as mock_activity_repo:
+        mock_athlete_repo.return_value.find_by_athlete_id.side_effect = find_by_athlete_id
+        mock_activity_repo.return_value.bulk_upsert_activities.side_effect = (
+            lambda activities: {"inserted": activities, "updated": [], "unchanged": 0}
+        )
+        yield mock_athlete_repo.return_value
+
+
+def test_athletes_are_fetched_concurrently(simulator, athlete_repo):
+    results = fetch_athletes_activities([1, 2, 3, 4])
+
+    activities = 2 * PER_PAGE + 50
+    assert results == {
+        athlete_id: {"fetched": activities, "inserted": activities, "updated": 0, "unchanged": 0}
+        for athlete_id in (1, 2, 3, 4)
+    }
+    # three pages per athlete, the athletes' requests overlap
+    assert simulator.requests == 12
+    assert simulator.max_in_flight > 1
+
+    # every athlete's cursor is checkpointed after each of its pages, in order
+    for athlete_id in (1, 2, 3, 4):
+        updates = [call[0][1] for call in athlete_repo.update_sync_cursor.call_args_list if call[0][0] == athlete_id]
+        assert [update.get("pages") for update in updates] == [0, 1, 2, 3, None]
+        assert updates[-1]["status"] == "done"
+
+    assert StravaClient().latency_stats()["GET /api/v3/athlete/activities"]["count"] == 12
+    assert (RateLimitTracker().requests_15_min, RateLimitTracker().limit_15_min) == (12, 100_000)
+
+
+def test_concurrency_is_bounded(simulator, athlete_repo):
+    fetch_athletes_activities(list(range(1, 9)), concurrency=3)
+    assert simulator.max_in_flight <= 3
+
+
+def test_athletes_stop_at_the_rate_limit(simulator, athlete_repo):
+    tracker = RateLimitTracker()
+    tracker.requests_15_min = tracker.limit_15_min
+
+    results = fetch_athletes_activities([1, 2, 3])
+
+    assert simulator.requests == 0
+    assert all(isinstance(result, RateLimitExceededException) for result in results.values())
+    for athlete_id in (1, 2, 3):
+        last = [call[0][1] for call in athlete_repo.update_sync_cursor.call_args_list if call[0][0] == athlete_id][-1]
+        assert last["status"] == "waiting"
+
+
+def test_failed_athletes_dont_stop_the_others(simulator, athlete_repo):
+    find_by_athlete_id = athlete_repo.find_by_athlete_id.side_effect
+
+    def find_with_bad_token(athlete_id):
+        athlete = find_by_athlete_id(athlete_id)
+        if athlete_id == 2:
+            athlete.tokens = {"access_token": "revoked"}
+        return athlete
+
+    athlete_repo.find_by_athlete_id.side_effect = find_with_bad_token
+
+    results = fetch_athletes_activities([1, 2, 3])
+
+    assert "401" in str(results[2])
+    assert results[1]["fetched"] == results[3]["fetched"] == 2 * PER_PAGE + 50
@@ -1,5 +1,5 @@
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from models.athlete import Athlete
 from repositories.athlete_repo import AthleteRepository
 
@@ -42,3 +42,44 @@ def test_update_athlete(athlete_repo, sample_athlete):
     assert updated_athlete is not None
     assert updated_athlete.first_name == "Jane"
 
+
+
+def test_athlete_from_mongo_converts_fields_on_access(sample_athlete):
+    doc = {**sample_athlete.to_mongo(), "created_at": 1700000000}
+    athlete = Athlete.from_mongo(doc)
+    assert athlete.first_name == "John"
+    assert not athlete.is_loaded("created_at")
+    assert athlete.to_dict()["created_at"] == datetime.fromtimestamp(1700000000).isoformat()
+    assert athlete.is_loaded("created_at")
+
+
+def test_sync_cursor_survives_re_registration(athlete_repo, sample_athlete):
+    athlete_repo.update_sync_cursor(sample_athlete.athlete_id, {"after": 1700000000, "pages": 2})
+    athlete_repo.update_athlete(sample_athlete.athlete_id, sample_athlete.to_mongo())
+    athlete = athlete_repo.find_by_athlete_id(sample_athlete.athlete_id)
+    assert athlete.sync_cursor == {"after": 1700000000, "pages": 2}
+    assert sample_athlete.sync_cursor is None
+
+
+def test_find_unfinished_syncs(athlete_repo, sample_athlete):
+    athlete_repo.update_sync_cursor(sample_athlete.athlete_id, {"status": "waiting", "pages": 3})
+    assert athlete_repo.find_unfinished_syncs("done") == [
+        {"athlete_id": sample_athlete.athlete_id, "sync_cursor": {"after": 1700000000, "pages": 3, "status": "waiting"}},
+    ]
+    athlete_repo.update_sync_cursor(sample_athlete.athlete_id, {"status": "done"})
+    assert athlete_repo.find_unfinished_syncs("done") == []
+
+
+def test_claim_sync_once_its_lease_expired(athlete_repo, sample_athlete):
+    athlete_id = sample_athlete.athlete_id
+    lease_until = (datetime.utcnow() + timedelta(minutes=2)).replace(microsecond=0)
+    assert not athlete_repo.claim_sync(athlete_id, "done", lease_until)
+
+    athlete_repo.update_sync_cursor(athlete_id, {"status": "running", "lease_until": lease_until})
+    assert not athlete_repo.claim_sync(athlete_id, "done", lease_until)
+
+    athlete_repo.update_sync_cursor(athlete_id, {"lease_until": datetime.utcnow() - timedelta(seconds=1)})
+    assert athlete_repo.claim_sync(athlete_id, "done", lease_until)
+    assert not athlete_repo.claim_sync(athlete_id, "done", lease_until)
+    assert athlete_repo.find_by_athlete_id(athlete_id).sync_cursor["lease_until"] == lease_until
+    athlete_repo.update_sync_cursor(athlete_id, {"status": "done", "lease_until": None})
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from models.athlete import Athlete
+from services.api_services import auth_service
+from services.api_services.auth_service import process_strava_callback
+
+ATHLETE_ID = 64384000
+
+
+def token_response(first_name="Anna"):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {
+        "access_token": "new-access",
+        "refresh_token": "new-refresh",
+        "expires_at": 1_900_000_000,
+        "athlete": {
+            "id": ATHLETE_ID, "username": "anna", "firstname": first_name, "lastname": "Doe",
+            "created_at": "2024-01-01T00:00:00Z", "profile_medium": "medium.jpg", "profile": "full.jpg",
+        },
+    }
+    return response
+
+
+@pytest.fixture
+def login():
+    stored = Athlete.from_mongo({
+        "athlete_id": ATHLETE_ID, "username": "anna", "first_name": "Anna", "last_name": "Doe",
+        "created_at": "2024-01-01T00:00:00Z", "profile": {"medium": "medium.jpg", "full": "full.jpg"},
+        "tokens": {"access_token": "old-access", "refresh_token": "old-refresh", "expires_at": 1_800_000_000},
+    })
+    with patch.object(auth_service, "StravaClient") as mock_client, \
+         patch.object(auth_service, "AthleteRepository") as mock_athlete_repo, \
+         patch.object(auth_service, "on_athlete_changed") as mock_on_athlete_changed:
+        mock_athlete_repo.return_value.find_by_athlete_id.return_value = stored
+        yield mock_client.return_value.post, mock_athlete_repo.return_value, mock_on_athlete_changed
+
+
+def test_login_with_unchanged_profile_keeps_the_version(login):
+    mock_post, athlete_repo, on_athlete_changed = login
+    mock_post.return_value = token_response()
+
+    process_strava_callback("code")
+
+    stored_tokens = athlete_repo.update_athlete.call_args[0][1]["tokens"]
+    assert stored_tokens["access_token"] == "new-access"
+    on_athlete_changed.assert_not_called()
+
+
+def test_login_with_changed_profile_bumps_the_version(login):
+    mock_post, _, on_athlete_changed = login
+    mock_post.return_value = token_response(first_name="Anne")
+
+    process_strava_callback("code")
+
+    on_athlete_changed.assert_called_once_with(ATHLETE_ID)
@@ -0,0 +1,108 @@
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from models.activity import Activity, GeoJSONLineString
+from repositories.activity_repo import ActivityRepository
+from repositories.heatmap_repo import HeatmapRepository
+from repositories.migration_repo import MigrationRepository
+from services.core_services import backfills
+from services.core_services.backfills import run_backfills, ROUTE_FIELDS_MIGRATION, SEASONS_MIGRATION
+from services.core_services.heatmap import HEATMAP_MIGRATION, heatmap_activities
+
+ATHLETE_ID = 55501
+
+
+@pytest.fixture
+def old_activity():
+    """An activity stored before the route fields and the heatmap existed."""
+    activity_repo = ActivityRepository()
+    activity = Activity(
+        activity_id=555010001,
+        athlete_id=ATHLETE_ID,
+        name="Old Ride",
+        type="Ride",
+        start_date=datetime(2024, 6, 1, 8, 0),
+        moving_time=60.0,
+        distance=20.0,
+        total_elevation_gain=100.0,
+        polyline=GeoJSONLineString(type="LineString", coordinates=[[47.26, 11.39], [47.27, 11.41], [47.28, 11.40]]),
+        kudos=1,
+        suffer_score=5,
+        url="https://www.strava.com/activities/555010001",
+        year=2024,
+    )
+    activity_repo.create_activity(activity)
+    activity_repo.collection.update_one(
+        {"activity_id": activity.activity_id},
+        {"$unset": {"encoded_polyline": "", "simplified_polylines": "", "bbox": "", "map_fragment": ""}},
+    )
+    MigrationRepository().collection.delete_many({})
+    with patch.object(backfills, "store_default_season"), patch.object(backfills, "materialize_leaderboard_totals"):
+        yield activity
+    activity_repo.delete_activity(activity.activity_id)
+    HeatmapRepository().delete_by_athlete_id(ATHLETE_ID)
+    MigrationRepository().collection.delete_many({})
+
+
+def test_old_activities_are_backfilled_once(old_activity):
+    activity_repo = ActivityRepository()
+    assert activity_repo.list_activities_with_polylines([ATHLETE_ID], [2024], encoded=True) == []
+
+    run_backfills()
+
+    routes = activity_repo.list_activities_with_polylines([ATHLETE_ID], [2024], encoded=True)
+    assert [route["activity_id"] for route in routes] == [old_activity.activity_id]
+    assert activity_repo.collection.find_one({"activity_id": old_activity.activity_id})["map_fragment"]
+    assert HeatmapRepository().collection.count_documents({"athlete_id": ATHLETE_ID}) > 0
+
+    with patch.object(backfills, "backfill_route_fields") as mock_backfill, \
+         patch.object(backfills, "rebuild_heatmap") as mock_rebuild_heatmap:
+        run_backfills()
+    mock_backfill.assert_not_called()
+    mock_rebuild_heatmap.assert_not_called()
+
+
+def test_claimed_backfills_are_left_to_their_runner(old_activity):
+    lease_until = datetime.utcnow() + timedelta(minutes=5)
+    MigrationRepository().collection.insert_many([
+        {"_id": ROUTE_FIELDS_MIGRATION, "done_at": None, "lease_until": lease_until},
+        {"_id": HEATMAP_MIGRATION, "done_at": None, "lease_until": lease_until},
+    ])
+    with patch.object(backfills, "backfill_route_fields") as mock_backfill, \
+         patch.object(backfills, "rebuild_heatmap") as mock_rebuild_heatmap:
+        run_backfills()
+    mock_backfill.assert_not_called()
+    mock_rebuild_heatmap.assert_not_called()
+
+
+def test_interrupted_heatmap_rebuild_continues_after_its_checkpoint(old_activity):
+    # the runner stopped after rasterizing old_activity
+    MigrationRepository().collection.insert_one({
+        "_id": HEATMAP_MIGRATION, "done_at": None, "checkpoint": old_activity.activity_id,
+        "lease_until": datetime.utcnow() - timedelta(minutes=1),
+    })
+    assert heatmap_activities([old_activity]) == [old_activity]
+    assert heatmap_activities([SimpleNamespace(activity_id=old_activity.activity_id + 1)]) == []
+
+    with patch.object(backfills, "backfill_route_fields"), \
+         patch.object(HeatmapRepository, "delete_all") as mock_delete_all:
+        run_backfills()
+
+    mock_delete_all.assert_not_called()
+    assert HeatmapRepository().collection.count_documents({"athlete_id": ATHLETE_ID}) == 0
+    assert MigrationRepository().is_done(HEATMAP_MIGRATION)
+
+
+def test_seasons_are_prepared_on_every_start_by_one_runner(old_activity):
+    run_backfills()
+    run_backfills()
+    assert backfills.materialize_leaderboard_totals.call_count == 2
+    assert not MigrationRepository().is_done(SEASONS_MIGRATION)
+
+    MigrationRepository().collection.update_one(
+        {"_id": SEASONS_MIGRATION}, {"$set": {"lease_until": datetime.utcnow() + timedelta(minutes=5)}}
+    )
+    run_backfills()
+    assert backfills.materialize_leaderboard_totals.call_count == 2
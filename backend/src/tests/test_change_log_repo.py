@@ -0,0 +1,36 @@
+import pytest
+from repositories.change_log_repo import ChangeLogRepository, UPSERT, DELETE, DELETE_ATHLETE, ATHLETE_CHANGED
+
+# far beyond the data versions of the test database
+BASE_VERSION = 10 ** 9
+
+
+@pytest.fixture(scope="module")
+def change_log_repo():
+    repo = ChangeLogRepository()
+    yield repo
+    repo.collection.delete_many({"version": {"$gt": BASE_VERSION}})
+
+
+def test_record_and_find_changes(change_log_repo):
+    change_log_repo.record(BASE_VERSION + 1, [(UPSERT, 1, 424242, 2024), (UPSERT, 2, 424242, 2023)])
+    change_log_repo.record(BASE_VERSION + 2, [(DELETE, 1, 424242, 2024), (UPSERT, 1, 424242, 2025)])
+    change_log_repo.record(BASE_VERSION + 3, [(ATHLETE_CHANGED, None, 424242, None)])
+    change_log_repo.record(BASE_VERSION + 4, [(DELETE_ATHLETE, None, 424242, None)])
+
+    changes = change_log_repo.find_changes(BASE_VERSION, [424242], [2024, 2025])
+    assert [(c["version"] - BASE_VERSION, c["op"], c["activity_id"]) for c in changes] == [
+        (1, UPSERT, 1),
+        (2, DELETE, 1),
+        (2, UPSERT, 1),
+        (4, DELETE_ATHLETE, None),
+    ]
+    assert change_log_repo.find_changes(BASE_VERSION + 4, [424242], [2024]) == []
+    assert change_log_repo.count_versions(BASE_VERSION) == 4
+    assert change_log_repo.count_versions(BASE_VERSION + 2) == 2
+
+
+def test_indexes_are_created(change_log_repo):
+    indexes = change_log_repo.collection.index_information().values()
+    assert [("op", 1), ("version", 1)] in [index["key"] for index in indexes]
+    assert any(index["key"] == [("created_at", 1)] and index.get("expireAfterSeconds") for index in indexes)
@@ -0,0 +1,52 @@
+import zlib
+import pytest
+from werkzeug.http import parse_accept_header
+from utils.compression import ENCODINGS, FRAMED_ENCODINGS, compress, compress_frame, decompress, negotiate_encoding
+from utils.json_stream import join_compressed_json_array, join_json_array
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_compress_round_trip(encoding):
+    data = b'[{"activity_id":1,"name":"Morning Ride"}]' * 100
+    compressed = compress(data, encoding)
+    assert len(compressed) < len(data)
+    assert decompress(compressed, encoding) == data
+
+
+def decompress_stream(data: bytes, encoding: str) -> bytes:
+    """
+    Decompress a payload joined from frames, which has to be one stream: browsers stop after the first gzip member.
+    """
+    if encoding != "gzip":
+        return decompress(data, encoding)
+    decompressor = zlib.decompressobj(wbits=31)
+    decompressed = decompressor.decompress(data)
+    assert decompressor.eof and decompressor.unused_data == b""
+    return decompressed
+
+
+@pytest.mark.parametrize("encoding", FRAMED_ENCODINGS)
+def test_join_compressed_json_array(encoding):
+    fragments = [b'{"activity_id":1},{"activity_id":2}', b"", b'{"activity_id":3}' * 1000]
+    frames = [compress_frame(fragment, encoding) if fragment else b"" for fragment in fragments]
+    joined = decompress_stream(b"".join(join_compressed_json_array(frames, encoding)), encoding)
+    assert joined == b"".join(join_json_array(fragments))
+    assert decompress_stream(b"".join(join_compressed_json_array([], encoding)), encoding) == b"[]"
+
+
+def test_unsupported_encoding():
+    with pytest.raises(ValueError):
+        compress(b"[]", "deflate")
+    with pytest.raises(ValueError):
+        compress_frame(b"[]", "br")
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(parse_accept_header("")) is None
+    assert negotiate_encoding(parse_accept_header("identity")) is None
+    assert negotiate_encoding(parse_accept_header("gzip;q=0")) is None
+    assert negotiate_encoding(parse_accept_header("deflate, gzip")) == "gzip"
+    # the client preference wins, ties go to the server preference
+    assert negotiate_encoding(parse_accept_header("gzip;q=1.0, br;q=0.5"), ("br", "gzip")) == "gzip"
+    assert negotiate_encoding(parse_accept_header("gzip, br"), ("br", "gzip")) == "br"
+    assert negotiate_encoding(parse_accept_header("*"), ("zstd", "gzip")) == "zstd"
@@ -0,0 +1,343 @@
+import orjson
+import pytest
+from services.core_services.compressed_cache import CompressedCache
+from services.core_services.map_slices import SliceCache
+from utils.compression import ENCODINGS, FRAMED_ENCODINGS, decompress
+from tests.test_compression import decompress_stream
+from unittest.mock import patch
+from flask import Flask, jsonify
+from api.map import map_blueprint
+from api.leaderboard import leaderboard_blueprint
+from services.core_services.leaderboard_totals import default_season
+
+
+@pytest.fixture(scope="function")
+def app():
+    """Provide a Flask app instance for testing."""
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.register_blueprint(map_blueprint, url_prefix="/api/map")
+    app.register_blueprint(leaderboard_blueprint, url_prefix="/api/leaderboard")
+    yield app
+
+
+@pytest.fixture(scope="function")
+def client(app):
+    """Provide a test client with a logged in user."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 12345
+    return client
+
+
+@patch("api.map.get_map_slices", return_value=[b'{"activity_id":1}'])
+@patch("api.map.get_data_version", return_value=7)
+def test_map_etag(mock_version, mock_activities, client):
+    response = client.get("/api/map?years=2024&athletes=1")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == 'W/"7"'
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert mock_activities.call_count == 1
+
+    # unchanged data: 304 without touching the activities
+    response = client.get("/api/map?years=2024&athletes=1", headers={"If-None-Match": 'W/"7"'})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert mock_activities.call_count == 1
+
+    # a webhook bumped the version: full response
+    mock_version.return_value = 8
+    response = client.get("/api/map?years=2024&athletes=1", headers={"If-None-Match": 'W/"7"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == 'W/"8"'
+    assert mock_activities.call_count == 2
+
+
+@patch("api.leaderboard.get_full_leaderboard", return_value=(default_season(), []))
+@patch("api.leaderboard.get_leaderboard_etag", return_value="3-2025")
+@patch("api.leaderboard.get_data_version", return_value=3)
+def test_leaderboard_etag(mock_version, mock_etag, mock_leaderboard, client):
+    response = client.get("/api/leaderboard?season=2025")
+    assert response.status_code == 200
+    assert response.json["season"]["season_id"] == "2025"
+    mock_etag.assert_called_once_with("2025")
+
+    response = client.get("/api/leaderboard?season=2025", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert mock_leaderboard.call_count == 1
+
+
+@patch("api.map.get_data_version", return_value=7)
+def test_conditional_get_requires_login(mock_version, app):
+    response = app.test_client().get("/api/map/years", headers={"If-None-Match": 'W/"7"'})
+    assert response.status_code == 401
+
+
+@patch("api.map.get_all_years", side_effect=Exception("db down"))
+@patch("api.map.get_data_version", return_value=7)
+def test_errors_are_not_tagged(mock_version, mock_years, client):
+    response = client.get("/api/map/years")
+    assert response.status_code == 500
+    assert "ETag" not in response.headers
+
+
+@patch("api.map.get_activities_with_polylines")
+@patch("api.map.iter_activities_with_polylines")
+@patch("api.map.get_data_version", return_value=7)
+def test_map_stream_matches_buffered_response(mock_version, mock_iter, mock_activities, client):
+    activities = [{"activity_id": i, "name": f"Activity {i}"} for i in range(5)]
+    mock_activities.return_value = activities
+    mock_iter.return_value = iter([activities[:2], [], activities[2:4], activities[4:]])
+
+    streamed = client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5,47.5")
+    buffered = client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5,47.5&stream=false")
+
+    assert streamed.is_streamed
+    assert streamed.status_code == buffered.status_code == 200
+    assert streamed.data == buffered.data == orjson.dumps(activities)
+    assert streamed.headers["ETag"] == 'W/"7"'
+    mock_iter.assert_called_once_with([2024], [1], 200, False, None, (11.0, 47.0, 11.5, 47.5))
+
+
+@patch("api.map.get_map_slices")
+@patch("api.map.get_data_version", return_value=7)
+def test_map_slices_stream_matches_buffered_response(mock_version, mock_slices, client):
+    activities = [{"activity_id": i, "name": f"Activity {i}"} for i in range(5)]
+    mock_slices.return_value = [orjson.dumps(activities[:2])[1:-1], b"", orjson.dumps(activities[2:])[1:-1]]
+
+    streamed = client.get("/api/map?years=2023,2024&athletes=1,2")
+    buffered = client.get("/api/map?years=2023,2024&athletes=1,2&stream=false")
+
+    assert streamed.is_streamed
+    assert streamed.status_code == buffered.status_code == 200
+    assert streamed.data == buffered.data == orjson.dumps(activities)
+    mock_slices.assert_called_with([2023, 2024], [1, 2], 7, False, None)
+
+
+@patch("api.map.get_map_slices", return_value=[b"", b""])
+@patch("api.map.iter_activities_with_polylines", side_effect=lambda *args: iter([]))
+@patch("api.map.get_data_version", return_value=7)
+def test_map_stream_empty(mock_version, mock_iter, mock_slices, client):
+    response = client.get("/api/map?years=2024&athletes=1")
+    assert response.status_code == 200
+    assert response.json == []
+
+    response = client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5,47.5")
+    assert response.status_code == 200
+    assert response.json == []
+
+
+@patch("api.map.iter_activities_with_polylines")
+@patch("api.map.get_data_version", return_value=7)
+def test_map_stream_error_before_first_batch(mock_version, mock_iter, client):
+    def failing(*args):
+        raise Exception("db down")
+        yield
+
+    mock_iter.return_value = failing()
+    response = client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5,47.5")
+    assert response.status_code == 500
+    assert "ETag" not in response.headers
+
+
+@patch("api.map.get_map_slices", side_effect=Exception("db down"))
+@patch("api.map.get_data_version", return_value=7)
+def test_map_slices_error(mock_version, mock_slices, client):
+    response = client.get("/api/map?years=2024&athletes=1")
+    assert response.status_code == 500
+    assert "ETag" not in response.headers
+
+
+@patch("api.map.get_map_slices", return_value=[b'{"activity_id":1,"encoded_polyline":"_p~iF~ps|U"}'])
+@patch("api.map.get_data_version", return_value=7)
+def test_map_encoded_format(mock_version, mock_slices, client):
+    response = client.get("/api/map?years=2024&athletes=1&format=encoded")
+    assert response.status_code == 200
+    assert response.json == [{"activity_id": 1, "encoded_polyline": "_p~iF~ps|U"}]
+    mock_slices.assert_called_once_with([2024], [1], 7, True, None)
+
+    response = client.get("/api/map?years=2024&athletes=1&format=xml")
+    assert response.status_code == 400
+
+
+@patch("api.map.get_map_slices", return_value=[])
+@patch("api.map.get_data_version", return_value=7)
+def test_map_zoom_and_tolerance(mock_version, mock_slices, client):
+    assert client.get("/api/map?years=2024&athletes=1&zoom=4").status_code == 200
+    mock_slices.assert_called_with([2024], [1], 7, False, "6")
+
+    assert client.get("/api/map?years=2024&athletes=1&format=encoded&tolerance=0.003").status_code == 200
+    mock_slices.assert_called_with([2024], [1], 7, True, "9")
+
+    assert client.get("/api/map?years=2024&athletes=1&zoom=18").status_code == 200
+    mock_slices.assert_called_with([2024], [1], 7, False, None)
+
+    assert client.get("/api/map?years=2024&athletes=1&zoom=far").status_code == 400
+
+
+@patch("api.map.iter_activities_with_polylines", side_effect=lambda *args: iter([]))
+@patch("api.map.get_data_version", return_value=7)
+def test_map_bbox(mock_version, mock_iter, client):
+    assert client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5,47.5").status_code == 200
+    mock_iter.assert_called_with([2024], [1], 200, False, None, (11.0, 47.0, 11.5, 47.5))
+
+    assert client.get("/api/map?years=2024&athletes=1&bbox=11.0,47.0,11.5").status_code == 400
+    assert client.get("/api/map?years=2024&athletes=1&bbox=11.5,47.0,11.0,47.5").status_code == 400
+
+
+@patch("api.map.get_tile", return_value=b'[{"activity_id": 1, "segments": ["_p~iF~ps|U_ulLnnqC"]}]')
+@patch("api.map.get_data_version", return_value=7)
+def test_map_tile(mock_version, mock_tile, client):
+    response = client.get("/api/map/tiles/10/544/361?years=2024&athletes=1,2,3,4,5,6,7,8")
+    assert response.status_code == 200
+    assert response.json[0]["activity_id"] == 1
+    assert response.headers["ETag"] == 'W/"7"'
+    mock_tile.assert_called_once_with(10, 544, 361, [1, 2, 3, 4, 5, 6, 7, 8], [2024], 7)
+
+    assert client.get("/api/map/tiles/10/1024/361?years=2024&athletes=1").status_code == 400
+    assert client.get("/api/map/tiles/19/0/0?years=2024&athletes=1").status_code == 400
+
+
+@patch("api.map.get_activities_binary", return_value=b"SCRB")
+@patch("api.map.get_data_version", return_value=7)
+def test_map_binary_format(mock_version, mock_binary, client):
+    response = client.get("/api/map?years=2024&athletes=1&format=binary&zoom=4")
+    assert response.status_code == 200
+    assert response.mimetype == "application/octet-stream"
+    assert response.data == b"SCRB"
+    mock_binary.assert_called_once_with([2024], [1], "6", None)
+
+
+@patch("api.map.get_heatmap_tile", return_value=b"\x89PNG")
+@patch("api.map.get_data_version", return_value=7)
+def test_map_heatmap(mock_version, mock_heatmap, client):
+    response = client.get("/api/map/heatmap/3/4/2?years=2023,2024&athletes=1")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    mock_heatmap.assert_called_once_with(3, 4, 2, [1], [2023, 2024], "png")
+
+    response = client.get("/api/map/heatmap/3/4/2?years=2024&athletes=1&format=array")
+    assert response.mimetype == "application/octet-stream"
+    assert client.get("/api/map/heatmap/3/4/2?years=2024&athletes=1&format=gif").status_code == 400
+
+
+@pytest.fixture
+def compressed_cache():
+    CompressedCache._instance = None
+    yield CompressedCache()
+    CompressedCache._instance = None
+
+
+@pytest.fixture
+def slice_cache():
+    SliceCache._instance = None
+    yield SliceCache()
+    SliceCache._instance = None
+
+
+def render_slices(years, athlete_ids, encoded=False, lod=None):
+    return {(athlete_id, year): f'{{"activity_id":{athlete_id}}}'.encode() for athlete_id in athlete_ids for year in years}
+
+
+@pytest.mark.parametrize("encoding", FRAMED_ENCODINGS)
+@patch("services.api_services.map_service.render_slices", side_effect=render_slices)
+@patch("api.map.get_data_version", return_value=7)
+def test_map_compressed_once_per_version(mock_version, mock_slices, encoding, client, slice_cache):
+    headers = {"Accept-Encoding": f"{encoding}, identity;q=0.5"}
+    response = client.get("/api/map?years=2024&athletes=1,2", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["ETag"] == 'W/"7"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.mimetype == "application/json"
+    assert orjson.loads(decompress_stream(response.data, encoding)) == [{"activity_id": 2}, {"activity_id": 1}]
+
+    # the same slices in another selection are served from the cache, compressed
+    assert client.get("/api/map?years=2024&athletes=2,1", headers=headers).data == response.data
+    response = client.get("/api/map?years=2024&athletes=2&stream=false", headers=headers)
+    assert orjson.loads(decompress_stream(response.data, encoding)) == [{"activity_id": 2}]
+    # one render per slice
+    assert mock_slices.call_count == 2
+
+    mock_version.return_value = 8
+    client.get("/api/map?years=2024&athletes=1,2", headers=headers).get_data()
+    assert mock_slices.call_count == 4
+
+    # clients without a supported encoding get the plain response
+    response = client.get("/api/map?years=2024&athletes=1,2", headers={"Accept-Encoding": "deflate"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json == [{"activity_id": 2}, {"activity_id": 1}]
+
+
+@pytest.mark.skipif("br" not in ENCODINGS, reason="brotli isn't installed")
+@patch("services.api_services.map_service.render_slices", side_effect=render_slices)
+@patch("api.map.get_data_version", return_value=7)
+def test_map_slices_are_not_compressed_with_brotli(mock_version, mock_slices, client, slice_cache):
+    # concatenated brotli streams don't decode as one
+    response = client.get("/api/map?years=2024&athletes=1", headers={"Accept-Encoding": "br"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json == [{"activity_id": 1}]
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+@patch("api.map.get_activities_binary", return_value=b"\x01\x02\x03" * 100)
+@patch("api.map.get_data_version", return_value=7)
+def test_map_binary_compressed_once_per_version(mock_version, mock_binary, encoding, client, compressed_cache):
+    for _ in range(2):
+        response = client.get("/api/map?years=2024&athletes=1&format=binary", headers={"Accept-Encoding": encoding})
+        assert response.headers["Content-Encoding"] == encoding
+        assert decompress(response.data, encoding) == b"\x01\x02\x03" * 100
+    assert mock_binary.call_count == 1
+
+
+@patch("api.map.get_all_years", return_value=[2023, 2024])
+@patch("api.map.get_data_version", return_value=7)
+def test_years_compressed(mock_version, mock_years, client, compressed_cache):
+    for _ in range(2):
+        response = client.get("/api/map/years", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert orjson.loads(decompress(response.data, "gzip")) == [2023, 2024]
+    assert mock_years.call_count == 1
+    assert compressed_cache.stats()["hits"] == 1
+
+
+@patch("services.api_services.map_service.render_slices", side_effect=Exception("db down"))
+@patch("api.map.get_data_version", return_value=7)
+def test_map_compressed_error(mock_version, mock_slices, client, slice_cache):
+    response = client.get("/api/map?years=2024&athletes=1", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 500
+    assert slice_cache.stats()["entries"] == 0
+
+
+@patch("api.map.get_activities_page", return_value=([{"activity_id": 1}], "WzEsMV0"))
+@patch("api.map.get_data_version", return_value=7)
+def test_map_pages(mock_version, mock_page, client):
+    response = client.get("/api/map?years=2024&athletes=1,2,3,4,5,6,7,8&page_size=1")
+    assert response.status_code == 200
+    assert response.json == {"activities": [{"activity_id": 1}], "next_cursor": "WzEsMV0"}
+    assert response.headers["ETag"] == 'W/"7"'
+    mock_page.assert_called_once_with([2024], [1, 2, 3, 4, 5, 6, 7, 8], 1, None, False, None, None)
+
+    response = client.get("/api/map?years=2024&athletes=1&format=encoded&cursor=WzEsMV0")
+    assert response.status_code == 200
+    mock_page.assert_called_with([2024], [1], 5000, "WzEsMV0", True, None, None)
+
+    assert client.get("/api/map?years=2024&athletes=1&page_size=0").status_code == 400
+    assert client.get("/api/map?years=2024&athletes=1&page_size=5001").status_code == 400
+    assert client.get("/api/map?years=2024&athletes=1&page_size=ten").status_code == 400
+    assert client.get("/api/map?years=2024&athletes=1&cursor=garbage").status_code == 400
+    assert client.get("/api/map?years=2024&athletes=1&format=binary&page_size=10").status_code == 400
+
+
+@patch("api.map.get_map_changes", return_value={"version": 9, "upserted": [], "deleted": [3], "deleted_athletes": []})
+@patch("api.map.get_data_version", return_value=9)
+def test_map_changes(mock_version, mock_changes, client):
+    response = client.get("/api/map/changes?since=7&years=2024&athletes=1&format=encoded")
+    assert response.status_code == 200
+    assert response.json["deleted"] == [3]
+    assert response.headers["ETag"] == 'W/"9"'
+    mock_changes.assert_called_once_with(7, 9, [2024], [1], True)
+
+    assert client.get("/api/map/changes?years=2024&athletes=1").status_code == 400
+    assert client.get("/api/map/changes?since=x&years=2024&athletes=1").status_code == 400
+    assert client.get("/api/map/changes?since=7&years=2024&athletes=1&format=binary").status_code == 400
@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from api.exceptions import RateLimitExceededException
+from services.core_services import fetch_athlete_activities as fetch
+from services.core_services.fetch_athlete_activities import PER_PAGE, fetch_athlete_activities
+
+START = int(datetime(2025, 5, 1, tzinfo=timezone.utc).timestamp())
+
+
+def activity_data(activity_id):
+    # one activity per minute, in the oldest first order Strava uses with after
+    start_date = datetime.fromtimestamp(START + 60 * activity_id, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {"id": activity_id, "name": "Ride", "sport_type": "Ride", "start_date": start_date, "start_date_local": start_date}
+
+
+def page_response(activity_ids, status_code=200):
+    response = MagicMock(status_code=status_code, headers={})
+    response.json.return_value = [activity_data(activity_id) for activity_id in activity_ids]
+    return response
+
+
+@pytest.fixture
+def mock_get():
+    with patch.object(fetch, "StravaClient") as mock_client:
+        yield mock_client.return_value.get
+
+
+@pytest.fixture
+def repos():
+    with patch.object(fetch, "on_activities_upserted"), \
+         patch.object(fetch, "refresh_token", side_effect=lambda athlete: athlete), \
+         patch.object(fetch, "RateLimitTracker"), \
+         patch.object(fetch, "AthleteRepository") as mock_athlete_repo, \
+         patch.object(fetch, "ActivityRepository") as mock_activity_repo:
+        athlete = mock_athlete_repo.return_value.find_by_athlete_id.return_value
+        athlete.tokens = {"access_token": "token"}
+        athlete.sync_cursor = None
+        mock_activity_repo.return_value.bulk_upsert_activities.side_effect = (
+            lambda activities: {"inserted": activities, "updated": [], "unchanged": 0}
+        )
+        yield mock_athlete_repo.return_value, mock_activity_repo.return_value
+
+
+def test_pages_are_stored_as_they_are_fetched(mock_get, repos):
+    athlete_repo, activity_repo = repos
+    events = []
+    pages = [page_response(range(1, PER_PAGE + 1)), page_response(range(PER_PAGE + 1, PER_PAGE + 4))]
+
+    def get(*args, params, **kwargs):
+        events.append(("get", params["page"], params["after"]))
+        return pages[params["page"] - 1]
+
+    def upsert(activities):
+        events.append(("upsert", len(activities)))
+        return {"inserted": activities, "updated": [], "unchanged": 0}
+
+    mock_get.side_effect = get
+    activity_repo.bulk_upsert_activities.side_effect = upsert
+
+    totals = fetch_athlete_activities(10)
+
+    # every page is stored before the next one is requested
+    assert events == [("get", 1, 0), ("upsert", PER_PAGE), ("get", 2, 0), ("upsert", 3)]
+    assert totals == {"fetched": PER_PAGE + 3, "inserted": PER_PAGE + 3, "updated": 0, "unchanged": 0}
+    updates = [call[0][1] for call in athlete_repo.update_sync_cursor.call_args_list]
+    assert updates[0]["status"] == "running" and updates[0]["pages"] == 0
+    assert [(update["after"], update["pages"], update["activities"]) for update in updates[1:3]] == [
+        (START + 60 * PER_PAGE, 1, PER_PAGE),
+        (START + 60 * (PER_PAGE + 3), 2, PER_PAGE + 3),
+    ]
+    assert updates[3]["status"] == "done"
+
+
+def test_sync_continues_after_the_cursor(mock_get, repos):
+    athlete_repo, activity_repo = repos
+    athlete_repo.find_by_athlete_id.return_value.sync_cursor = {"after": START + 60 * 5, "pages": 1, "status": "done"}
+    mock_get.return_value = page_response([])
+
+    totals = fetch_athlete_activities(10)
+
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["params"]["after"] == START + 60 * 5
+    assert totals["fetched"] == 0
+    activity_repo.bulk_upsert_activities.assert_not_called()
+    assert [call[0][1]["status"] for call in athlete_repo.update_sync_cursor.call_args_list] == ["running", "done"]
+
+    fetch_athlete_activities(10, full=True)
+    assert mock_get.call_args.kwargs["params"]["after"] == 0
+
+
+def test_pages_stored_before_an_error_are_kept(mock_get, repos):
+    athlete_repo, activity_repo = repos
+    mock_get.side_effect = [page_response(range(1, PER_PAGE + 1)), page_response([], status_code=500)]
+
+    with pytest.raises(Exception, match="Failed to fetch activities"):
+        fetch_athlete_activities(10)
+
+    assert activity_repo.bulk_upsert_activities.call_count == 1
+    updates = [call[0][1] for call in athlete_repo.update_sync_cursor.call_args_list]
+    assert updates[1]["after"] == START + 60 * PER_PAGE
+    assert updates[2]["status"] == "failed" and "500" in updates[2]["error"]
+
+
+def test_rate_limited_sync_resumes_at_its_checkpoint(mock_get, repos):
+    athlete_repo, activity_repo = repos
+    mock_get.return_value = page_response(range(1, PER_PAGE + 1))
+    fetch.RateLimitTracker.return_value.wait_if_needed.side_effect = [None, RateLimitExceededException(delay=60)]
+
+    with pytest.raises(RateLimitExceededException):
+        fetch_athlete_activities(10, full=True)
+
+    waiting = athlete_repo.update_sync_cursor.call_args[0][1]
+    assert waiting["status"] == "waiting" and waiting["retry_at"] > datetime.utcnow()
+
+    # the requeued task continues after the stored page, even if it asks for a full sync
+    athlete_repo.update_sync_cursor.reset_mock()
+    athlete_repo.find_by_athlete_id.return_value.sync_cursor = {
+        "status": "waiting", "after": START + 60 * PER_PAGE, "pages": 1, "activities": PER_PAGE,
+    }
+    fetch.RateLimitTracker.return_value.wait_if_needed.side_effect = None
+    mock_get.return_value = page_response(range(PER_PAGE + 1, PER_PAGE + 6))
+
+    fetch_athlete_activities(10, full=True)
+
+    assert mock_get.call_args.kwargs["params"] == {"page": 1, "per_page": PER_PAGE, "after": START + 60 * PER_PAGE}
+    updates = [call[0][1] for call in athlete_repo.update_sync_cursor.call_args_list]
+    assert "started_at" not in updates[0]
+    assert (updates[1]["pages"], updates[1]["activities"]) == (2, PER_PAGE + 5)
+    assert updates[2]["status"] == "done"
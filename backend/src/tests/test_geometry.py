@@ -0,0 +1,85 @@
+import pytest
+from utils.geometry import (
+    LOD_ZOOMS,
+    MAX_LATITUDE,
+    clip_polyline,
+    parse_bbox,
+    select_lod,
+    simplify_douglas_peucker,
+    tile_bounds,
+    viewport_polygon,
+    zoom_tolerance,
+)
+
+
+def test_simplify_drops_points_within_tolerance():
+    points = [[0.0, 0.0], [1.0, 0.05], [2.0, -0.05], [3.0, 5.0], [4.0, 6.0], [5.0, 7.0]]
+    assert simplify_douglas_peucker(points, 0.1) == [[0.0, 0.0], [2.0, -0.05], [3.0, 5.0], [5.0, 7.0]]
+    # only the point exactly on the line is dropped
+    assert simplify_douglas_peucker(points, 0.0) == points[:4] + points[5:]
+    assert simplify_douglas_peucker(points, 100.0) == [points[0], points[-1]]
+
+
+def test_simplify_closed_loop_keeps_the_far_point():
+    loop = [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]
+    assert simplify_douglas_peucker(loop, 0.8) == [[0.0, 0.0], [1.0, 1.0], [0.0, 0.0]]
+
+
+def test_simplify_short_lines():
+    assert simplify_douglas_peucker([[0.0, 0.0], [1.0, 1.0]], 10.0) == [[0.0, 0.0], [1.0, 1.0]]
+
+
+def test_select_lod():
+    assert zoom_tolerance(0) == 360 / 256
+    assert zoom_tolerance(LOD_ZOOMS[0] + 1) == zoom_tolerance(LOD_ZOOMS[0]) / 2
+
+    assert select_lod() is None
+    assert select_lod(zoom=3) == LOD_ZOOMS[0]
+    assert select_lod(zoom=LOD_ZOOMS[1]) == LOD_ZOOMS[1]
+    assert select_lod(zoom=LOD_ZOOMS[-1] + 1) is None
+    assert select_lod(tolerance=1.0) == LOD_ZOOMS[0]
+    assert select_lod(tolerance=zoom_tolerance(LOD_ZOOMS[1])) == LOD_ZOOMS[1]
+    assert select_lod(tolerance=0.0) is None
+
+
+def test_parse_bbox():
+    assert parse_bbox("11.0, 47.0, 11.5, 47.5") == (11.0, 47.0, 11.5, 47.5)
+    assert parse_bbox("-180,-90,180,90") == (-180.0, -MAX_LATITUDE, 180.0, MAX_LATITUDE)
+    for value in ("11.0,47.0,11.5", "11.5,47.0,11.0,47.5", "-190,0,10,10", "0,86,10,89", "a,b,c,d"):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+
+def test_viewport_polygon():
+    polygon = viewport_polygon(10.0, 47.0, 12.5, 48.0)
+    ring = polygon["coordinates"][0]
+    assert ring[0] == ring[-1] == [10.0, 47.0]
+    # densified south edge from west to east, north edge back from east to west
+    assert [point[0] for point in ring[:4]] == [10.0, 10.0 + 2.5 / 3, 10.0 + 5.0 / 3, 12.5]
+    assert ring[3:5] == [[12.5, 47.0], [12.5, 48.0]]
+    assert len(ring) == 9
+    assert "strictwinding" in polygon["crs"]["properties"]["name"]
+
+    assert viewport_polygon(-170.0, -60.0, 170.0, 60.0) is None
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180.0, -MAX_LATITUDE, 180.0, MAX_LATITUDE))
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(1, 1, 0)
+    assert (min_lng, max_lng) == (0.0, 180.0)
+    assert min_lat == pytest.approx(0.0)
+    assert max_lat == pytest.approx(MAX_LATITUDE)
+
+
+def test_clip_polyline():
+    box = (0.0, 0.0, 10.0, 10.0)
+    inside = [(1.0, 1.0), (2.0, 2.0), (3.0, 1.0)]
+    assert clip_polyline(inside, *box) == [inside]
+    assert clip_polyline([(20.0, 20.0), (30.0, 20.0)], *box) == []
+
+    # leaves the box and comes back: two pieces, cut at the border
+    leaving = [(5.0, 5.0), (5.0, 15.0), (7.0, 15.0), (7.0, 5.0)]
+    assert clip_polyline(leaving, *box) == [[(5.0, 5.0), (5.0, 10.0)], [(7.0, 10.0), (7.0, 5.0)]]
+
+    # crosses the box without a point inside it
+    assert clip_polyline([(-5.0, 5.0), (15.0, 5.0)], *box) == [[(0.0, 5.0), (10.0, 5.0)]]
@@ -0,0 +1,94 @@
+import zlib
+import numpy as np
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models.activity import Activity, GeoJSONLineString
+from services.core_services.heatmap import HEATMAP_ZOOM, calc_heatmap_deltas, merge_heatmap_deltas, project, rasterize_route
+from services.api_services.heatmap_service import get_heatmap_grid, get_heatmap_tile
+from utils.geometry import TILE_SIZE
+
+WIDTH = TILE_SIZE * 2 ** HEATMAP_ZOOM
+
+
+def make_activity(activity_id, athlete_id, coordinates, year=2024):
+    return Activity(
+        activity_id=activity_id,
+        athlete_id=athlete_id,
+        name="Activity",
+        type="Ride",
+        start_date=datetime(year, 5, 1),
+        moving_time=60.0,
+        distance=10.0,
+        total_elevation_gain=100.0,
+        kudos=0,
+        suffer_score=0,
+        url="http://example.com/activity",
+        year=year,
+        polyline=GeoJSONLineString(type="LineString", coordinates=coordinates),
+    )
+
+
+def test_project():
+    x, y = project([[0.0, 0.0], [85.0511287798, -180.0]]).T
+    assert x.tolist() == pytest.approx([WIDTH / 2, 0.0])
+    assert y.tolist() == pytest.approx([WIDTH / 2, 0.0], abs=1e-6)
+
+
+def test_rasterize_route_covers_every_cell_once():
+    # a line along the equator from lng 0 to the east, 10 cells long, and back
+    lng = 10 * 360 / WIDTH
+    cells = rasterize_route([[0.0, 0.0], [0.0, lng - 1e-9], [0.0, 0.0]])
+    assert cells.tolist() == [WIDTH // 2 * WIDTH + WIDTH // 2 + i for i in range(10)]
+    assert rasterize_route([[0.0, 0.0]]).size == 0
+
+
+def test_calc_heatmap_deltas():
+    route = [[47.26, 11.39], [47.27, 11.40]]
+    deltas = calc_heatmap_deltas([make_activity(1, 10, route), make_activity(2, 10, route)])
+    assert list(deltas) == [(10, 2024, 544, 359)]
+    assert set(deltas[(10, 2024, 544, 359)].values()) == {2}
+
+    removed = calc_heatmap_deltas([make_activity(1, 10, route)], sign=-1)
+    assert set(removed[(10, 2024, 544, 359)].values()) == {-1}
+
+    # an unchanged route cancels out
+    merged = merge_heatmap_deltas(removed, calc_heatmap_deltas([make_activity(1, 10, route)]))
+    assert set(merged[(10, 2024, 544, 359)].values()) == {0}
+
+
+@patch("services.api_services.heatmap_service.HeatmapRepository")
+def test_heatmap_grid_zoom_levels(mock_heatmap_repo):
+    # two base tiles with a few cells
+    mock_heatmap_repo.return_value.find_tiles.return_value = [
+        {"x": 544, "y": 359, "cells": {"0": 1, "1": 2, str(TILE_SIZE + 1): 3}},
+        {"x": 545, "y": 359, "cells": {str(TILE_SIZE * TILE_SIZE - 1): 4}},
+    ]
+
+    grid = get_heatmap_grid(HEATMAP_ZOOM - 1, 272, 179, [10], [2024])
+    mock_heatmap_repo.return_value.find_tiles.assert_called_with([10], [2024], 544, 545, 358, 359)
+    assert grid.sum() == 10
+    assert grid[128, 0] == 6  # cells (0, 0), (0, 1) and (1, 1) of the first tile
+    assert grid[255, 255] == 4
+
+    mock_heatmap_repo.return_value.find_tiles.return_value = mock_heatmap_repo.return_value.find_tiles.return_value[:1]
+    grid = get_heatmap_grid(HEATMAP_ZOOM + 1, 1088, 718, [10], [2024])
+    mock_heatmap_repo.return_value.find_tiles.assert_called_with([10], [2024], 544, 544, 359, 359)
+    assert grid.shape == (TILE_SIZE, TILE_SIZE)
+    assert grid[0:2, 0:2].tolist() == [[1, 1], [1, 1]]
+    assert grid[2:4, 2:4].tolist() == [[3, 3], [3, 3]]
+
+
+@patch("services.api_services.heatmap_service.HeatmapRepository")
+def test_heatmap_tile_formats(mock_heatmap_repo):
+    mock_heatmap_repo.return_value.find_tiles.return_value = [{"x": 544, "y": 359, "cells": {"5": 7}}]
+
+    array = np.frombuffer(get_heatmap_tile(HEATMAP_ZOOM, 544, 359, [10], [2024], "array"), dtype="<u4")
+    assert array.size == TILE_SIZE * TILE_SIZE and array[5] == 7
+
+    png = get_heatmap_tile(HEATMAP_ZOOM, 544, 359, [10], [2024])
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    idat_length = int.from_bytes(png[33:37], "big")
+    rows = np.frombuffer(zlib.decompress(png[41:41 + idat_length]), dtype=np.uint8).reshape(TILE_SIZE, -1)
+    alpha = rows[:, 1:].reshape(TILE_SIZE, TILE_SIZE, 4)[..., 3]
+    assert alpha[0, 5] > 0 and alpha.sum() == alpha[0, 5]
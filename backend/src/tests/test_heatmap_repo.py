@@ -0,0 +1,19 @@
+import pytest
+from repositories.heatmap_repo import HeatmapRepository
+
+
+@pytest.fixture(scope="module")
+def heatmap_repo():
+    repo = HeatmapRepository()
+    yield repo
+    repo.delete_by_athlete_id(424242)
+
+
+def test_apply_deltas_and_find_tiles(heatmap_repo):
+    heatmap_repo.apply_deltas({(424242, 2024, 544, 359): {5: 1, 6: 2}, (424242, 2024, 545, 359): {7: 1}})
+    heatmap_repo.apply_deltas({(424242, 2024, 544, 359): {5: 1, 6: -2}})
+
+    tiles = heatmap_repo.find_tiles([424242], [2024], 544, 544, 359, 359)
+    assert tiles == [{"x": 544, "y": 359, "cells": {"5": 2, "6": 0}}]
+    assert len(heatmap_repo.find_tiles([424242], [2024], 540, 550, 350, 360)) == 2
+    assert heatmap_repo.find_tiles([424242], [2023], 540, 550, 350, 360) == []
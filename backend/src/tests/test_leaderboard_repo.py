@@ -0,0 +1,36 @@
+import pytest
+from repositories.leaderboard_repo import LeaderboardRepository
+
+
+@pytest.fixture(scope="module")
+def leaderboard_repo():
+    return LeaderboardRepository()
+
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown(leaderboard_repo):
+    yield  # This is where the tests run
+    leaderboard_repo.delete_totals_by_athlete_id(67890)
+    leaderboard_repo.delete_totals_by_athlete_id(12345)
+
+
+def test_apply_deltas(leaderboard_repo):
+    leaderboard_repo.apply_deltas({(67890, "Biking", 1999): (30.0, 1), (12345, "Running", 1999): (10.0, 1)})
+    leaderboard_repo.apply_deltas({(67890, "Biking", 1999): (15.0, 1)})
+
+    totals = leaderboard_repo.find_totals_by_season(1999)
+    assert totals == {(67890, "Biking"): 45.0, (12345, "Running"): 10.0}
+
+
+def test_deleted_totals_are_not_returned(leaderboard_repo):
+    leaderboard_repo.apply_deltas({(67890, "Biking", 1999): (30.0, 1)})
+    leaderboard_repo.apply_deltas({(67890, "Biking", 1999): (-30.0, -1)})
+
+    assert leaderboard_repo.find_totals_by_season(1999) == {}
+
+
+
+def test_unique_index_is_created(leaderboard_repo):
+    keys = [[field for field, _ in index["key"]] for index in leaderboard_repo.collection.index_information().values()
+            if index.get("unique")]
+    assert ["season", "athlete_id", "category"] in keys
@@ -0,0 +1,217 @@
+import pytest
+import random
+from unittest.mock import patch
+from models.athlete import Athlete
+from datetime import datetime
+from api.exceptions import ParamError
+from services.api_services.leaderboard_service import (
+    get_full_leaderboard,
+    rank_categories,
+    rank_overall,
+    sort_overall_leaderboard,
+)
+from services.core_services.leaderboard_totals import mapped_types, default_season
+
+
+def make_athlete(athlete_id, first_name):
+    return Athlete(
+        athlete_id=athlete_id,
+        username=first_name.lower(),
+        first_name=first_name,
+        last_name="Doe",
+        created_at="2024-01-01T00:00:00Z",
+        profile={},
+        tokens={},
+    )
+
+
+@pytest.fixture
+def athletes():
+    return [make_athlete(1, "Anna"), make_athlete(2, "Ben"), make_athlete(3, "Cleo")]
+
+
+@pytest.fixture
+def season():
+    return default_season()
+
+
+@pytest.fixture
+def leaderboard_repos(athletes, season):
+    with patch("services.api_services.leaderboard_service.find_season", return_value=season), \
+         patch("services.api_services.leaderboard_service.AthleteRepository") as mock_athlete_repo, \
+         patch("services.api_services.leaderboard_service.ActivityRepository") as mock_activity_repo, \
+         patch("services.api_services.leaderboard_service.LeaderboardRepository") as mock_leaderboard_repo:
+        mock_athlete_repo.return_value.get_all_athletes.return_value = athletes
+        yield mock_activity_repo.return_value, mock_leaderboard_repo.return_value
+
+
+def test_leaderboard_reads_materialized_totals(leaderboard_repos, season):
+    """
+    Test that the leaderboard reads the materialized totals and does not touch the activities.
+    """
+    activity_repo, leaderboard_repo = leaderboard_repos
+    season.totals_materialized = True
+    leaderboard_repo.find_totals_by_season.return_value = {(1, "Biking"): 10.0}
+
+    season, leaderboard = get_full_leaderboard()
+
+    assert season.season_id == "2025"
+    leaderboard_repo.find_totals_by_season.assert_called_once_with("2025")
+    activity_repo.sum_moving_time_by_athlete_and_type.assert_not_called()
+    biking = next(c for c in leaderboard if c["name"] == "Biking")["rankings"]
+    assert biking[0] == {"id": 1, "name": "Anna Doe", "points": 10.0}
+
+
+def test_leaderboard_falls_back_to_single_aggregation(leaderboard_repos):
+    """
+    Test that the leaderboard is computed from one aggregation if the season is not materialized,
+    ignoring the totals the deltas created meanwhile.
+    """
+    activity_repo, leaderboard_repo = leaderboard_repos
+    leaderboard_repo.find_totals_by_season.return_value = {(1, "Biking"): 10.0}
+    activity_repo.sum_moving_time_by_athlete_and_type.return_value = {}
+
+    get_full_leaderboard()
+
+    leaderboard_repo.find_totals_by_season.assert_not_called()
+    activity_repo.sum_moving_time_by_athlete_and_type.assert_called_once()
+    activity_types, start_date, end_date, athlete_ids = activity_repo.sum_moving_time_by_athlete_and_type.call_args[0]
+    assert athlete_ids == [1, 2, 3]
+    assert set(activity_types) == set(mapped_types)
+    assert (start_date, end_date) == (datetime(2025, 1, 1), datetime(2026, 1, 1))
+
+
+def test_materialized_season_without_totals_is_not_aggregated(leaderboard_repos, season):
+    activity_repo, leaderboard_repo = leaderboard_repos
+    season.totals_materialized = True
+    leaderboard_repo.find_totals_by_season.return_value = {}
+
+    _, leaderboard = get_full_leaderboard()
+
+    activity_repo.sum_moving_time_by_athlete_and_type.assert_not_called()
+    assert all(entry["points"] == 0 for entry in leaderboard[0]["rankings"])
+
+
+def test_leaderboard_rankings(leaderboard_repos):
+    """
+    Test that types are summed per category and the ranking structure is preserved.
+    """
+    activity_repo, leaderboard_repo = leaderboard_repos
+    leaderboard_repo.find_totals_by_season.return_value = {}
+    activity_repo.sum_moving_time_by_athlete_and_type.return_value = {
+        (1, "Ride"): (30.0, 1),
+        (1, "GravelRide"): (40.0, 2),
+        (2, "Ride"): (60.0, 1),
+        (2, "Run"): (20.0, 1),
+        (3, "Run"): (50.0, 1),
+        (3, "TrailRun"): (5.0, 1),
+    }
+
+    _, leaderboard = get_full_leaderboard()
+
+    names = [category["name"] for category in leaderboard]
+    assert names[-1] == "Overall"
+    assert len(names) == len(set(mapped_types.values())) + 1
+
+    biking = next(c for c in leaderboard if c["name"] == "Biking")["rankings"]
+    assert [(x["id"], x["points"]) for x in biking] == [(1, 70.0), (2, 60.0), (3, 0)]
+
+    running = next(c for c in leaderboard if c["name"] == "Running")["rankings"]
+    assert [(x["id"], x["points"]) for x in running] == [(3, 55.0), (2, 20.0), (1, 0)]
+    assert running[0]["name"] == "Cleo Doe"
+
+    overall = next(c for c in leaderboard if c["name"] == "Overall")["rankings"]
+    assert [(x["id"], x["points"], x["mov"]) for x in overall] == [
+        (2, 18, 80.0),
+        (1, 10, 70.0),
+        (3, 10, 55.0),
+    ]
+
+
+
+def test_leaderboard_of_season_with_selected_athletes(leaderboard_repos, season):
+    """
+    Test that only the athletes and categories of the season are ranked.
+    """
+    _, leaderboard_repo = leaderboard_repos
+    season.athlete_ids = [1, 3]
+    season.categories = {"Ride": "Biking", "Run": "Running"}
+    season.totals_materialized = True
+    leaderboard_repo.find_totals_by_season.return_value = {(2, "Biking"): 50.0, (3, "Running"): 10.0}
+
+    _, leaderboard = get_full_leaderboard()
+
+    assert [c["name"] for c in leaderboard] == ["Biking", "Running", "Overall"]
+    assert [x["id"] for x in leaderboard[0]["rankings"]] == [1, 3]
+    assert [x["id"] for x in leaderboard[2]["rankings"]] == [3, 1]
+
+
+def test_unknown_season():
+    with patch("services.api_services.leaderboard_service.find_season", return_value=None):
+        with pytest.raises(ParamError) as exc_info:
+            get_full_leaderboard("1990")
+    assert exc_info.value.status_code == 404
+
+
+def reference_sort_overall_leaderboard(leaderboard):
+    """
+    The former insertion sort, kept to check that the keyed sort breaks ties identically.
+    """
+    new_leaderboard = []
+    for person in leaderboard:
+        i = 0
+        while i < len(new_leaderboard) and (person["points"] < new_leaderboard[i]["points"] or (person["points"] == new_leaderboard[i]["points"] and person["mov"] < new_leaderboard[i]["mov"])):
+            i += 1
+        new_leaderboard.insert(i, person)
+    return new_leaderboard
+
+
+def reference_rank_overall(athletes, categories):
+    """
+    The former overall pass based on list.index lookups.
+    """
+    total = []
+    for a in athletes:
+        places = []
+        for cat in categories:
+            indices = [x for x in cat["rankings"] if x["id"] == a.athlete_id]
+            if indices[0]["points"] != 0:
+                places.append({"rank": cat["rankings"].index(indices[0]), "mov": indices[0]["points"]})
+        places.sort(key=lambda x: x["rank"])
+        points = 0
+        mov = 0
+        for place in places[:3]:
+            points += 10 - place["rank"]
+            mov += place["mov"]
+        total.append({"id": a.athlete_id, "name": a.first_name + " " + a.last_name, "points": points, "mov": mov})
+    return reference_sort_overall_leaderboard(total)
+
+
+def test_sort_overall_leaderboard_tie_breaking():
+    """
+    Test that equal points are decided by mov and full ties keep the former ordering.
+    """
+    rng = random.Random(42)
+    for _ in range(50):
+        leaderboard = [
+            {"id": i, "points": rng.randint(0, 5), "mov": rng.choice([0, 10.0, 20.0])}
+            for i in range(rng.randint(0, 30))
+        ]
+        assert sort_overall_leaderboard(list(leaderboard)) == reference_sort_overall_leaderboard(leaderboard)
+
+
+def test_rankings_match_former_implementation():
+    """
+    Test the category and overall rankings against the former implementation with many ties.
+    """
+    rng = random.Random(7)
+    athletes = [make_athlete(i, f"Athlete{i}") for i in range(40)]
+    categories = list(dict.fromkeys(mapped_types.values()))
+    totals = {
+        (a.athlete_id, category): rng.choice([0, 0, 15.0, 30.0, rng.uniform(1, 500)])
+        for a in athletes
+        for category in categories
+    }
+
+    ranked = rank_categories(athletes, totals, categories)
+    assert rank_overall(athletes, ranked) == reference_rank_overall(athletes, ranked)
@@ -0,0 +1,214 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models.activity import Activity
+from models.season import Season
+from services.core_services.leaderboard_totals import (
+    calc_leaderboard_deltas,
+    default_season,
+    find_season,
+    get_seasons,
+    materialize_leaderboard_totals,
+    merge_leaderboard_deltas,
+    rebuild_leaderboard_totals,
+    store_default_season,
+)
+from repositories.season_repo import SeasonRepository
+from services.core_services.activity_events import on_activity_updated, on_activities_upserted
+
+
+def make_activity(activity_id, athlete_id, type, moving_time, year=2025):
+    return Activity(
+        activity_id=activity_id,
+        athlete_id=athlete_id,
+        name="Activity",
+        type=type,
+        start_date=datetime(year, 5, 1),
+        moving_time=moving_time,
+        distance=10.0,
+        total_elevation_gain=100.0,
+        kudos=0,
+        suffer_score=0,
+        url="http://example.com/activity",
+        year=year,
+    )
+
+
+@pytest.fixture
+def seasons():
+    return [
+        Season(
+            season_id="winter",
+            name="Winter 2024/25",
+            start_date=datetime(2024, 11, 1),
+            end_date=datetime(2025, 3, 1),
+            categories={"NordicSki": "Nordic Ski", "Run": "Running"},
+            athlete_ids=[10],
+        ),
+        default_season(),
+    ]
+
+
+def test_calc_leaderboard_deltas(seasons):
+    activities = [
+        make_activity(1, 10, "Ride", 30.0),
+        make_activity(2, 10, "GravelRide", 15.0),
+        make_activity(3, 10, "Run", 20.0),
+        make_activity(4, 10, "Run", 5.0, year=2024),
+        make_activity(5, 10, "Walk", 60.0),  # unmapped type
+        make_activity(6, 11, "Run", 10.0),  # not part of the winter season
+    ]
+    activities[3].start_date = datetime(2024, 12, 24)
+    activities[2].start_date = datetime(2025, 2, 1)
+
+    deltas = calc_leaderboard_deltas(activities, seasons)
+    assert deltas == {
+        (10, "Biking", "2025"): (45.0, 2),
+        (10, "Running", "2025"): (20.0, 1),
+        (10, "Running", "winter"): (25.0, 2),
+        (11, "Running", "2025"): (10.0, 1),
+    }
+
+    assert calc_leaderboard_deltas(activities[:1], seasons, sign=-1) == {(10, "Biking", "2025"): (-30.0, -1)}
+
+
+def test_merge_leaderboard_deltas():
+    merged = merge_leaderboard_deltas(
+        {(10, "Biking", "2025"): (-30.0, -1)},
+        {(10, "Biking", "2025"): (30.0, 1), (10, "Running", "2025"): (30.0, 1)},
+    )
+    assert merged == {(10, "Biking", "2025"): (0.0, 0), (10, "Running", "2025"): (30.0, 1)}
+
+
+@patch("services.core_services.leaderboard_totals.datetime")
+def test_find_season(mock_datetime, seasons):
+    assert find_season("winter", seasons) is seasons[0]
+    assert find_season("1990", seasons) is None
+
+    mock_datetime.utcnow.return_value = datetime(2025, 2, 1)
+    assert find_season(seasons=seasons) is seasons[1]  # both are running, the later one wins
+    mock_datetime.utcnow.return_value = datetime(2027, 2, 1)
+    assert find_season(seasons=seasons) is seasons[1]
+    mock_datetime.utcnow.return_value = datetime(2020, 2, 1)
+    assert find_season(seasons=seasons) is seasons[0]
+
+
+@patch("services.core_services.activity_events.ChangeLogRepository")
+@patch("services.core_services.activity_events.HeatmapRepository")
+@patch("services.core_services.activity_events.get_seasons", return_value=[default_season()])
+@patch("services.core_services.activity_events.DataVersionRepository")
+@patch("services.core_services.activity_events.LeaderboardRepository")
+def test_on_activity_updated_moves_points_between_categories(
+    mock_leaderboard_repo, mock_version_repo, mock_get_seasons, mock_heatmap_repo, mock_change_log_repo
+):
+    mock_version_repo.return_value.bump_version.return_value = 8
+    before = make_activity(1, 10, "Ride", 30.0)
+    after = make_activity(1, 10, "Run", 30.0)
+
+    assert on_activity_updated(before, after) == 8
+
+    deltas = mock_leaderboard_repo.return_value.apply_deltas.call_args[0][0]
+    assert deltas == {(10, "Biking", "2025"): (-30.0, -1), (10, "Running", "2025"): (30.0, 1)}
+    mock_version_repo.return_value.bump_version.assert_called_once()
+    mock_heatmap_repo.return_value.apply_deltas.assert_called_once()
+    assert mock_change_log_repo.return_value.record.call_args[0][0] == 8
+
+
+def test_default_season_is_kept_when_a_season_is_created():
+    season_repo = SeasonRepository()
+    season_repo.collection.delete_many({})
+    try:
+        store_default_season()
+        store_default_season()
+        season_repo.create_season(Season(
+            season_id="2026", name="Challenge 2026", start_date=datetime(2026, 1, 1),
+            end_date=datetime(2027, 1, 1), categories={"Run": "Running"},
+        ))
+        assert [season.season_id for season in get_seasons()] == ["2025", "2026"]
+    finally:
+        season_repo.collection.delete_many({})
+
+
+@pytest.fixture
+def rebuild_repos():
+    with patch("services.core_services.leaderboard_totals.get_seasons", return_value=[default_season()]), \
+         patch("services.core_services.leaderboard_totals.DataVersionRepository"), \
+         patch("services.core_services.leaderboard_totals.ActivityRepository") as mock_activity_repo, \
+         patch("services.core_services.leaderboard_totals.LeaderboardRepository") as mock_leaderboard_repo:
+        mock_activity_repo.return_value.sum_moving_time_by_athlete_and_type.return_value = {
+            (10, "Ride"): (30.0, 1),
+            (10, "GravelRide"): (15.0, 2),
+            (11, "Run"): (20.0, 1),
+        }
+        yield mock_leaderboard_repo.return_value
+
+
+def test_verify_reports_drift(rebuild_repos):
+    rebuild_repos.find_all_totals.return_value = {
+        (10, "Biking", "2025"): (45.0, 3),
+        (11, "Running", "2025"): (25.0, 2),
+        (12, "Running", "2025"): (0.0, 0),
+    }
+
+    drift = rebuild_leaderboard_totals(verify_only=True)
+
+    assert len(drift) == 1
+    assert drift[0]["athlete_id"] == 11
+    assert drift[0]["stored"] == {"moving_time": 25.0, "activity_count": 2}
+    assert drift[0]["expected"] == {"moving_time": 20.0, "activity_count": 1}
+    rebuild_repos.replace_totals.assert_not_called()
+
+
+def test_rebuild_replaces_totals(rebuild_repos):
+    rebuild_repos.find_all_totals.return_value = {}
+
+    drift = rebuild_leaderboard_totals()
+
+    assert len(drift) == 2
+    rebuild_repos.replace_totals.assert_called_once_with({
+        (10, "Biking", "2025"): (45.0, 3),
+        (11, "Running", "2025"): (20.0, 1),
+    }, None)
+
+
+
+def test_unmaterialized_seasons_are_rebuilt_once(rebuild_repos):
+    season_repo = SeasonRepository()
+    season_repo.collection.delete_many({})
+    try:
+        store_default_season()
+        rebuild_repos.find_all_totals.return_value = {}
+
+        materialize_leaderboard_totals()
+        materialize_leaderboard_totals()
+
+        rebuild_repos.replace_totals.assert_called_once()
+        assert rebuild_repos.replace_totals.call_args[0][1] == "2025"
+        assert season_repo.find_by_season_id("2025").totals_materialized
+    finally:
+        season_repo.collection.delete_many({})
+
+
+@patch("services.core_services.activity_events.ChangeLogRepository")
+@patch("services.core_services.activity_events.HeatmapRepository")
+@patch("services.core_services.activity_events.get_seasons", return_value=[default_season()])
+@patch("services.core_services.activity_events.DataVersionRepository")
+@patch("services.core_services.activity_events.LeaderboardRepository")
+def test_on_activities_upserted_bumps_the_version_per_kind_of_change(
+    mock_leaderboard_repo, mock_version_repo, mock_get_seasons, mock_heatmap_repo, mock_change_log_repo
+):
+    mock_version_repo.return_value.bump_version.side_effect = [8, 9]
+    inserted = make_activity(2, 10, "Run", 20.0)
+    before, after = make_activity(1, 10, "Ride", 30.0), make_activity(1, 10, "Ride", 45.0)
+
+    on_activities_upserted({"inserted": [inserted], "updated": [(before, after)], "unchanged": 3})
+
+    created, updated = [call[0][0] for call in mock_leaderboard_repo.return_value.apply_deltas.call_args_list]
+    assert created == {(10, "Running", "2025"): (20.0, 1)}
+    assert updated == {(10, "Biking", "2025"): (15.0, 0)}
+    assert mock_version_repo.return_value.bump_version.call_count == 2
+    assert [call[0][0] for call in mock_change_log_repo.return_value.record.call_args_list] == [8, 9]
+
+    mock_version_repo.reset_mock()
+    on_activities_upserted({"inserted": [], "updated": [], "unchanged": 3})
+    mock_version_repo.return_value.bump_version.assert_not_called()
@@ -0,0 +1,39 @@
+from utils.lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "b" is now the least recently used
+
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_replacing_and_oversized_values():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("a", b"123456")
+    assert cache.stats()["bytes"] == 6
+
+    cache.put("b", b"12345678901")  # larger than the whole cache
+    assert cache.get("b") is None
+    assert cache.get("a") == b"123456"
+
+
+def test_invalidate_and_stats():
+    cache = LRUCache(max_bytes=100)
+    for key in range(5):
+        cache.put(key, b"x" * key)
+
+    assert cache.invalidate(lambda key: key % 2 == 0) == 3
+    assert cache.get(2) is None
+    assert cache.get(3) == b"xxx"
+    assert cache.stats() == {"entries": 2, "bytes": 4, "max_bytes": 100, "hits": 1, "misses": 1}
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
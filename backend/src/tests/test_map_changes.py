@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import patch
+from repositories.change_log_repo import UPSERT, DELETE, DELETE_ATHLETE
+from services.api_services.map_service import get_map_changes
+
+
+def change(version, op, activity_id, athlete_id, year=2024):
+    return {"version": version, "op": op, "activity_id": activity_id, "athlete_id": athlete_id, "year": year}
+
+
+@pytest.fixture
+def repos():
+    with patch("services.api_services.map_service.ChangeLogRepository") as mock_change_log_repo, \
+            patch("services.api_services.map_service.ActivityRepository") as mock_activity_repo:
+        mock_change_log_repo.return_value.count_versions.return_value = 3
+        mock_activity_repo.return_value.list_activities_by_ids.side_effect = (
+            lambda ids, athlete_ids, years, encoded: [{"activity_id": i} for i in ids if i != 4]
+        )
+        yield mock_change_log_repo.return_value, mock_activity_repo.return_value
+
+
+def test_last_change_wins(repos):
+    change_log_repo, activity_repo = repos
+    change_log_repo.find_changes.return_value = [
+        change(8, UPSERT, 1, 10),
+        change(8, UPSERT, 2, 10),
+        change(9, DELETE, 1, 10),
+        change(9, UPSERT, 3, 11),
+        change(10, UPSERT, 4, 11),  # e.g. changed to a virtual ride
+        change(10, UPSERT, 2, 10),
+    ]
+    changes = get_map_changes(7, 10, [2024], [10, 11], encoded=True)
+
+    change_log_repo.find_changes.assert_called_once_with(7, [10, 11], [2024])
+    activity_repo.list_activities_by_ids.assert_called_once_with([2, 3, 4], [10, 11], [2024], True)
+    assert changes == {
+        "version": 10,
+        "upserted": [{"activity_id": 2}, {"activity_id": 3}],
+        "deleted": [1, 4],
+        "deleted_athletes": [],
+    }
+
+
+def test_deleted_athletes(repos):
+    change_log_repo, activity_repo = repos
+    change_log_repo.find_changes.return_value = [
+        change(8, UPSERT, 1, 10),
+        change(8, UPSERT, 3, 11),
+        change(9, DELETE_ATHLETE, None, 10, None),
+        change(10, UPSERT, 2, 10),  # registered again
+    ]
+    changes = get_map_changes(7, 10, [2024], [10, 11])
+    assert changes["deleted_athletes"] == [10]
+    assert changes["upserted"] == [{"activity_id": 3}, {"activity_id": 2}]
+    assert changes["deleted"] == []
+
+
+def test_reset_without_complete_change_log(repos):
+    change_log_repo, activity_repo = repos
+    # a script bumped version 9 without logging its changes
+    change_log_repo.count_versions.return_value = 2
+    assert get_map_changes(7, 10, [2024], [10]) == {"version": 10, "reset": True}
+    # a client ahead of the server, e.g. after a database reset
+    assert get_map_changes(11, 10, [2024], [10]) == {"version": 10, "reset": True}
+    change_log_repo.find_changes.assert_not_called()
+
+    change_log_repo.count_versions.return_value = 0
+    assert get_map_changes(10, 10, [2024], [10]) == {"version": 10, "upserted": [], "deleted": [], "deleted_athletes": []}
+    activity_repo.list_activities_by_ids.assert_not_called()
@@ -0,0 +1,140 @@
+import orjson
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from models.activity import Activity, GeoJSONLineString
+from services.core_services.map_slices import SliceCache, invalidate_activity_slices, invalidate_athlete_slices
+from services.api_services.map_service import get_map_slices, serialize_slices
+from utils.json_stream import join_json_array
+
+
+def make_activity(activity_id, athlete_id, year=2024):
+    return Activity(
+        activity_id=activity_id,
+        athlete_id=athlete_id,
+        name="Activity",
+        type="Ride",
+        start_date=datetime(year, 5, 1),
+        moving_time=60.0,
+        distance=10.0,
+        total_elevation_gain=100.0,
+        kudos=0,
+        suffer_score=0,
+        url="http://example.com/activity",
+        year=year,
+        polyline=GeoJSONLineString(type="LineString", coordinates=[[47.26, 11.39], [47.27, 11.40]]),
+    )
+
+
+ACTIVITIES = [
+    {"activity_id": 1, "athlete_id": 10, "year": 2024},
+    {"activity_id": 2, "athlete_id": 11, "year": 2023},
+    {"activity_id": 3, "athlete_id": 11, "year": 2024},
+    {"activity_id": 4, "athlete_id": 11, "year": 2024},
+]
+
+
+def fake_iter(years, athlete_ids, batch_size, encoded=False, lod=None, bbox=None):
+    yield [dict(a) for a in ACTIVITIES if a["athlete_id"] in athlete_ids and a["year"] in years]
+
+
+def fake_fragments(athlete_ids, years, batch_size=500):
+    yield [
+        (a["athlete_id"], a["year"], None if a.get("outdated") else orjson.dumps(a))
+        for a in ACTIVITIES if a["athlete_id"] in athlete_ids and a["year"] in years
+    ]
+
+
+@pytest.fixture
+def mock_fragments():
+    with patch("services.api_services.map_service.ActivityRepository") as mock_activity_repo:
+        mock_activity_repo.return_value.iter_map_fragments.side_effect = fake_fragments
+        yield mock_activity_repo.return_value.iter_map_fragments
+
+
+@pytest.fixture
+def slice_cache():
+    SliceCache._instance = None
+    yield SliceCache()
+    SliceCache._instance = None
+
+
+def load(slices):
+    return orjson.loads(b"".join(join_json_array(slices)))
+
+
+@patch("services.api_services.map_service.iter_activities_with_polylines", side_effect=fake_iter)
+def test_slices_are_cached_per_athlete_and_year(mock_iter, mock_fragments, slice_cache):
+    slices = list(get_map_slices([2023, 2024], [10, 11], 5))
+    # athletes descending, then years
+    assert [a["activity_id"] for a in load(slices)] == [2, 3, 4, 1]
+    assert slices[2] == b""  # athlete 10 has no activities in 2023
+    # each slice is rendered when it is reached
+    assert [call[0] for call in mock_fragments.call_args_list] == [([11], [2023]), ([11], [2024]), ([10], [2023]), ([10], [2024])]
+    mock_iter.assert_not_called()
+
+    assert list(get_map_slices([2024], [11], 5)) == slices[1:2]
+    assert mock_fragments.call_count == 4
+    # other formats and levels of detail are separate slices, serialized from the documents
+    list(get_map_slices([2024], [11], 5, encoded=True, lod="9"))
+    mock_iter.assert_called_once_with([2024], [11], 500, True, "9")
+
+    stats = slice_cache.stats()
+    assert stats["entries"] == 5
+    assert stats["bytes"] == sum(map(len, slices)) + len(slices[1])
+    assert stats["version"] == 5
+
+
+def test_slices_are_rendered_when_they_are_reached(mock_fragments, slice_cache):
+    slices = get_map_slices([2023, 2024], [10, 11], 5)
+    assert load([next(slices)]) == [ACTIVITIES[1]]
+    mock_fragments.assert_called_once_with([11], [2023])
+
+
+def test_changes_only_render_the_affected_slices(mock_fragments, slice_cache):
+    list(get_map_slices([2023, 2024], [10, 11], 5))
+
+    invalidate_activity_slices([make_activity(3, 11)], 6)
+    ACTIVITIES.append({"activity_id": 5, "athlete_id": 11, "year": 2024})
+    try:
+        mock_fragments.reset_mock()
+        slices = list(get_map_slices([2023, 2024], [10, 11], 6))
+    finally:
+        ACTIVITIES.pop()
+    mock_fragments.assert_called_once_with([11], [2024])
+    assert [a["activity_id"] for a in load(slices)] == [2, 3, 4, 5, 1]
+
+    invalidate_athlete_slices(10, 7)
+    mock_fragments.reset_mock()
+    list(get_map_slices([2023, 2024], [10, 11], 7))
+    assert [call[0] for call in mock_fragments.call_args_list] == [([10], [2023]), ([10], [2024])]
+
+    # a missed version renders everything again
+    mock_fragments.reset_mock()
+    list(get_map_slices([2023, 2024], [10, 11], 9))
+    assert mock_fragments.call_count == 4
+
+
+@patch("services.api_services.map_service.iter_activities_with_polylines", side_effect=fake_iter)
+def test_slices_without_map_fragments_are_serialized(mock_iter, mock_fragments, slice_cache):
+    ACTIVITIES[3]["outdated"] = True
+    try:
+        slices = list(get_map_slices([2023, 2024], [10, 11], 5))
+    finally:
+        del ACTIVITIES[3]["outdated"]
+    mock_iter.assert_called_once_with([2024], [11], 500, False, None)
+    assert [a["activity_id"] for a in load(slices)] == [2, 3, 4, 1]
+
+
+def test_slices_are_serialized_batch_by_batch():
+    def batches(years, athlete_ids, batch_size, encoded=False, lod=None, bbox=None):
+        # the routes of a slice span several batches
+        for activity in ACTIVITIES:
+            yield [dict(activity)]
+
+    with patch("services.api_services.map_service.iter_activities_with_polylines", side_effect=batches):
+        slices = serialize_slices([2023, 2024], [10, 11])
+
+    assert orjson.loads(b"[" + slices[(11, 2024)] + b"]") == ACTIVITIES[2:]
+    assert orjson.loads(b"[" + slices[(10, 2024)] + b"]") == ACTIVITIES[:1]
+    assert slices[(10, 2023)] == b""
@@ -0,0 +1,92 @@
+import orjson
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from polyline import decode as decode_polyline, encode as encode_polyline
+from models.activity import Activity, GeoJSONLineString
+from services.core_services.map_tiles import TileCache, invalidate_activity_tiles, invalidate_athlete_tiles
+from services.api_services.map_service import get_tile
+
+
+def make_activity(activity_id, athlete_id, coordinates, year=2024):
+    return Activity(
+        activity_id=activity_id,
+        athlete_id=athlete_id,
+        name="Activity",
+        type="Ride",
+        start_date=datetime(year, 5, 1),
+        moving_time=60.0,
+        distance=10.0,
+        total_elevation_gain=100.0,
+        kudos=0,
+        suffer_score=0,
+        url="http://example.com/activity",
+        year=year,
+        polyline=GeoJSONLineString(type="LineString", coordinates=coordinates),
+    )
+
+
+@pytest.fixture
+def tile_cache():
+    TileCache._instance = None
+    yield TileCache()
+    TileCache._instance = None
+
+
+# tiles of zoom 10 around Innsbruck (lat 47.26, lng 11.39) and Vienna (lat 48.2, lng 16.37)
+INNSBRUCK = TileCache.key(10, 544, 359, [10], [2024])
+VIENNA = TileCache.key(10, 558, 355, [10], [2024])
+
+
+def test_activity_invalidates_only_the_tiles_it_touches(tile_cache):
+    tile_cache.get(INNSBRUCK, 5)
+    tile_cache.put(INNSBRUCK, b"[]", 5)
+    tile_cache.put(VIENNA, b"[]", 5)
+
+    invalidate_activity_tiles([make_activity(1, 10, [[47.26, 11.39], [47.27, 11.40]])], 6)
+    assert tile_cache.get(INNSBRUCK, 6) is None
+    assert tile_cache.get(VIENNA, 6) == b"[]"
+
+    # other athletes and years don't show on the tiles
+    invalidate_activity_tiles([make_activity(2, 11, [[48.2, 16.37], [48.21, 16.38]])], 7)
+    invalidate_activity_tiles([make_activity(3, 10, [[48.2, 16.37], [48.21, 16.38]], year=2023)], 8)
+    assert tile_cache.get(VIENNA, 8) == b"[]"
+
+    invalidate_athlete_tiles(10, 9)
+    assert tile_cache.get(VIENNA, 9) is None
+
+
+def test_unexpected_versions_clear_the_cache(tile_cache):
+    tile_cache.get(INNSBRUCK, 5)
+    tile_cache.put(INNSBRUCK, b"[]", 5)
+
+    # a tile rendered before a change must not be cached after it
+    tile_cache.get(VIENNA, 6)
+    tile_cache.put(VIENNA, b"[]", 5)
+    assert tile_cache.stats()["entries"] == 0
+
+    # a change made by another process skips a version
+    tile_cache.put(VIENNA, b"[]", 6)
+    invalidate_activity_tiles([], 8)
+    assert tile_cache.get(VIENNA, 8) is None
+
+
+@patch("services.api_services.map_service.ActivityRepository")
+def test_get_tile_clips_and_caches(mock_activity_repo, tile_cache):
+    route = [(47.20, 11.39), (47.26, 11.39), (47.30, 11.39)]
+    mock_activity_repo.return_value.iter_activities_with_polylines.side_effect = lambda *args, **kwargs: iter([[
+        {"activity_id": 1, "athlete_id": 10, "encoded_polyline": encode_polyline(route)},
+        {"activity_id": 2, "athlete_id": 10, "encoded_polyline": encode_polyline([(48.2, 16.37), (48.3, 16.37)])},
+    ]])
+
+    tile = orjson.loads(get_tile(10, 544, 359, [10], [2024], 5))
+    assert [route["activity_id"] for route in tile] == [1]
+    segment = decode_polyline(tile[0]["segments"][0])
+    # clipped to the tile (lat 47.04 - 47.28) plus its buffer
+    assert segment[1] == (47.26, 11.39)
+    assert 47.28 < segment[-1][0] < 47.3
+    kwargs = mock_activity_repo.return_value.iter_activities_with_polylines.call_args.kwargs
+    assert kwargs["lod"] == "12" and kwargs["encoded"]
+
+    get_tile(10, 544, 359, [10], [2024], 5)
+    assert mock_activity_repo.return_value.iter_activities_with_polylines.call_count == 1
@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import patch
+from flask import Flask
+from api.ops import ops_blueprint
+
+
+@pytest.fixture(scope="function")
+def client():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.register_blueprint(ops_blueprint, url_prefix="/api/ops")
+    with patch("api.ops.ADMIN_ATHLETE_IDS", {1}):
+        yield app.test_client()
+
+
+def log_in(client, athlete_id):
+    with client.session_transaction() as session:
+        session["user_id"] = athlete_id
+
+
+@patch("api.ops.get_cache_stats", return_value={"slices": {"hits": 3, "misses": 1}, "tiles": {"hits": 0, "misses": 0}})
+def test_cache_stats(mock_stats, client):
+    assert client.get("/api/ops/cache").status_code == 401
+    log_in(client, 12345)
+    assert client.get("/api/ops/cache").status_code == 403
+
+    log_in(client, 1)
+    response = client.get("/api/ops/cache")
+    assert response.status_code == 200
+    assert response.json["slices"]["hits"] == 3
+    assert mock_stats.call_count == 1
+
+
+@patch("api.ops.get_strava_latency_stats", return_value={"GET /api/v3/athlete": {"count": 2, "p50": 0.1, "p95": "inf"}})
+def test_strava_latency_stats(mock_stats, client):
+    assert client.get("/api/ops/latency").status_code == 401
+    log_in(client, 12345)
+    assert client.get("/api/ops/latency").status_code == 403
+
+    log_in(client, 1)
+    response = client.get("/api/ops/latency")
+    assert response.status_code == 200
+    assert response.json["GET /api/v3/athlete"]["p95"] == "inf"
@@ -0,0 +1,14 @@
+import pytest
+from utils.pagination import encode_cursor, parse_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor((12345, 13500000000))
+    assert "=" not in cursor
+    assert parse_cursor(cursor) == (12345, 13500000000)
+
+
+@pytest.mark.parametrize("cursor", ["", "garbage!", encode_cursor((1,))[:-1], "WyJhIiwxXQ"])
+def test_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        parse_cursor(cursor)
@@ -7,8 +7,9 @@ from api.exceptions import RateLimitExceededException
 
 @pytest.fixture
 def rate_limit_tracker():
-    """Fixture for RateLimitTracker instance."""
-    return RateLimitTracker()
+    """Fixture for a fresh RateLimitTracker instance."""
+    with patch.object(RateLimitTracker, "_instance", None):
+        yield RateLimitTracker()
 
 
 def test_rate_limit_initialization(rate_limit_tracker):
@@ -50,6 +51,15 @@ def test_update_limits(rate_limit_tracker):
     assert rate_limit_tracker.requests_daily == 500
 
 
+def test_update_limits_never_lowers_the_usage(rate_limit_tracker):
+    """Test that the older headers of a late response don't move the usage backwards."""
+    rate_limit_tracker.update_limits({"X-ReadRateLimit-Limit": "100,1000", "X-ReadRateLimit-Usage": "12,512"})
+    rate_limit_tracker.update_limits({"X-ReadRateLimit-Limit": "100,1000", "X-ReadRateLimit-Usage": "9,509"})
+
+    assert rate_limit_tracker.requests_15_min == 12
+    assert rate_limit_tracker.requests_daily == 512
+
+
 @patch("services.core_services.rate_limit_tracker.datetime")
 def test_combined_logic(mock_datetime, rate_limit_tracker):
     """Test a combined scenario of updating limits and waiting."""
@@ -110,3 +120,15 @@ def test_exceeding_limits(mock_datetime, rate_limit_tracker):
         rate_limit_tracker.wait_if_needed()
 
     assert exc_info.value.delay == 20, "Expected delay did not match the longer limit reset time."
+
+
+def test_reserve_counts_requests_before_their_responses():
+    with patch.object(RateLimitTracker, "_instance", None):
+        tracker = RateLimitTracker()
+        tracker.limit_15_min = 3
+        for _ in range(3):
+            tracker.reserve()
+        assert (tracker.requests_15_min, tracker.requests_daily) == (3, 3)
+        with pytest.raises(RateLimitExceededException):
+            tracker.reserve()
+        assert tracker.requests_15_min == 3
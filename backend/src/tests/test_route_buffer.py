@@ -0,0 +1,53 @@
+import pytest
+from polyline import encode as encode_polyline
+from utils.route_buffer import HEADER, decode_polylines, pack_routes, unpack_routes
+
+ROUTES = [
+    [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)],
+    [(47.26, 11.39), (47.27, 11.4)],
+    [(-33.86785, 151.20732), (-33.85, 151.21), (-33.84, 151.22), (-33.83, 151.2)],
+]
+
+
+def test_decode_polylines_matches_polyline_decode():
+    offsets, coordinates = decode_polylines([encode_polyline(route) for route in ROUTES])
+    assert offsets.tolist() == [0, 3, 5, 9]
+    assert coordinates.tolist() == [[round(lat * 1e5), round(lng * 1e5)] for route in ROUTES for lat, lng in route]
+
+
+def test_decode_empty_polylines():
+    offsets, coordinates = decode_polylines([])
+    assert offsets.tolist() == [0] and coordinates.shape == (0, 2)
+    offsets, coordinates = decode_polylines([encode_polyline(ROUTES[1]), "", encode_polyline(ROUTES[0])])
+    assert offsets.tolist() == [0, 2, 2, 5]
+    assert coordinates[2].tolist() == [3850000, -12020000]
+
+
+@pytest.mark.parametrize("count", [0, 2, 3])
+def test_pack_and_unpack_routes(count):
+    activities = [
+        {
+            "activity_id": 12000000000 + i,
+            "athlete_id": 10 + i,
+            "name": f"Route {i}",
+            "type": "Ride",
+            "encoded_polyline": encode_polyline(route),
+        }
+        for i, route in enumerate(ROUTES[:count])
+    ]
+    buffer = pack_routes(activities)
+
+    # every array, including the coordinates just before the metadata, is 8 byte aligned
+    metadata_length = HEADER.unpack_from(buffer)[5]
+    assert (len(buffer) - metadata_length) % 8 == 0
+    unpacked = unpack_routes(buffer)
+    assert [activity["activity_id"] for activity in unpacked] == [activity["activity_id"] for activity in activities]
+    assert [activity["name"] for activity in unpacked] == [activity["name"] for activity in activities]
+    for activity, route in zip(unpacked, ROUTES):
+        assert activity["coordinates"] == [list(point) for point in route]
+        assert activity["type"] == "Ride" and "encoded_polyline" not in activity
+
+
+def test_unpack_rejects_other_buffers():
+    with pytest.raises(ValueError):
+        unpack_routes(b"\0" * HEADER.size)
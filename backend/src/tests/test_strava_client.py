@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import orjson
+import pytest
+import requests
+
+from services.core_services.rate_limit_tracker import RateLimitTracker
+from services.core_services.strava_client import StravaClient
+from utils.histogram import Histogram
+
+
+class StravaStub(BaseHTTPRequestHandler):
+    """Answers like Strava, remembering the client port of every request."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    client_ports = []
+
+    def do_GET(self):
+        self.client_ports.append(self.client_address[1])
+        if self.path.startswith("/slow"):
+            time.sleep(0.5)
+        body = orjson.dumps([{"id": 1, "name": "Ride"}])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-ReadRateLimit-Limit", "100,1000")
+        self.send_header("X-ReadRateLimit-Usage", "7,70")
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # the client timed out
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StravaStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def client(stub_url):
+    with patch.object(StravaClient, "_instance", None), patch.object(RateLimitTracker, "_instance", None):
+        client = StravaClient()
+        client.base_url = stub_url
+        yield client
+
+
+def test_requests_reuse_the_connection(client):
+    StravaStub.client_ports.clear()
+    for activity_id in (1, 2, 3):
+        response = client.get(f"/api/v3/activities/{activity_id}", endpoint="/api/v3/activities/{id}")
+        assert response.json() == [{"id": 1, "name": "Ride"}]
+    assert len(set(StravaStub.client_ports)) == 1
+
+    stats = client.latency_stats()
+    assert list(stats) == ["GET /api/v3/activities/{id}"]
+    assert stats["GET /api/v3/activities/{id}"]["count"] == 3
+
+
+def test_responses_update_the_rate_limits(client):
+    client.get("/api/v3/athlete/activities", params={"page": 1})
+    tracker = RateLimitTracker()
+    assert (tracker.limit_15_min, tracker.limit_daily) == (100, 1000)
+    assert (tracker.requests_15_min, tracker.requests_daily) == (7, 70)
+
+
+def test_timeouts_are_recorded(client):
+    with pytest.raises(requests.exceptions.Timeout):
+        client.get("/slow", timeout=0.1)
+    assert client.latency_stats()["GET /slow"]["count"] == 1
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.1, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    assert histogram.stats() == {"count": 5, "sum": 4.35, "buckets": {"0.1": 2, "1.0": 4, "inf": 5}}
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(0.95) == float("inf")
+
+
+def test_latency_stats_are_valid_json(client):
+    client.latency_histogram("GET /stuck").observe(10 ** 6)
+    stats = client.latency_stats()["GET /stuck"]
+    assert (stats["p50"], stats["p95"]) == ("inf", "inf")
+    json.dumps(stats, allow_nan=False)
@@ -0,0 +1,47 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from flask import Flask
+from api.auth import auth_blueprint
+from services.api_services.auth_service import get_sync_progress
+
+
+@pytest.fixture(scope="function")
+def client():
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.register_blueprint(auth_blueprint, url_prefix="/api/auth")
+    return app.test_client()
+
+
+@patch("services.api_services.auth_service.AthleteRepository")
+def test_get_sync_progress(mock_athlete_repo):
+    athlete = mock_athlete_repo.return_value.find_by_athlete_id.return_value
+    athlete.sync_cursor = {"status": "running", "after": 1700000000, "pages": 4, "activities": 800, "started_at": datetime(2025, 5, 1, 8, 0)}
+    assert get_sync_progress(1) == {
+        "status": "running",
+        "pages": 4,
+        "activities": 800,
+        "started_at": "2025-05-01T08:00:00Z",
+        "synced_at": None,
+        "finished_at": None,
+        "retry_at": None,
+        "error": None,
+    }
+    athlete.sync_cursor = None
+    assert get_sync_progress(1) is None
+
+
+@patch("api.auth.get_sync_progress", return_value={"status": "done", "pages": 2})
+def test_sync_status(mock_progress, client):
+    assert client.get("/api/auth/sync_status").status_code == 401
+
+    with client.session_transaction() as session:
+        session["user_id"] = 12345
+    response = client.get("/api/auth/sync_status")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "done", "pages": 2}
+    mock_progress.assert_called_once_with(12345)
+
+    mock_progress.return_value = None
+    assert client.get("/api/auth/sync_status").status_code == 404
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import patch
 from services.core_services.task_service import TaskService, Task, TaskType
 from services.core_services.rate_limit_tracker import RateLimitTracker
+from api.exceptions import RateLimitExceededException
 from datetime import datetime, timedelta
 import time
 
@@ -277,3 +278,53 @@ def test_shutdown(task_service):
 
         mock_logger.info.assert_any_call("Shutting down ApiRequestService.")
         mock_logger.info.assert_any_call("ApiRequestService shut down complete.")
+
+
+@patch("services.core_services.task_service.AthleteRepository")
+def test_resume_interrupted_syncs(mock_athlete_repo, task_service):
+    retry_at = datetime.utcnow() + timedelta(minutes=10)
+    lease_until = datetime.utcnow() + timedelta(minutes=1)
+    mock_athlete_repo.return_value.find_unfinished_syncs.return_value = [
+        {"athlete_id": 1, "sync_cursor": {"status": "running"}},
+        {"athlete_id": 2, "sync_cursor": {"status": "waiting", "retry_at": retry_at}},
+        {"athlete_id": 3, "sync_cursor": {"status": "running", "lease_until": lease_until}},
+    ]
+    # the sync of athlete 3 is still run by a live process
+    mock_athlete_repo.return_value.claim_sync.side_effect = lambda athlete_id, status, until: athlete_id != 3
+    with patch.object(task_service, "submit_task") as mock_submit:
+        task_service.resume_interrupted_syncs()
+
+    mock_athlete_repo.return_value.find_unfinished_syncs.assert_called_once_with("done")
+    claims = {call[0][0]: call[0][2] for call in mock_athlete_repo.return_value.claim_sync.call_args_list}
+    assert claims[2] > retry_at
+    waiting, batch, resume = [call[0][0] for call in mock_submit.call_args_list]
+    assert (batch.task_type, batch.params, batch.execute_after) == (TaskType.FETCH_ACTIVITIES_BATCH, {"athlete_ids": [1]}, None)
+    assert (waiting.athlete_id, waiting.task_type) == (2, TaskType.FETCH_ACTIVITIES)
+    assert abs((waiting.execute_after - datetime.now()) - timedelta(minutes=10)) < timedelta(seconds=5)
+    assert resume.task_type == TaskType.RESUME_SYNCS
+    assert abs((resume.execute_after - datetime.now()) - timedelta(minutes=1)) < timedelta(seconds=5)
+
+
+def test_start_queues_the_backfills_and_the_resumed_syncs(task_service):
+    with patch.object(task_service, "submit_task") as mock_submit:
+        task_service.start()
+    assert [call[0][0].task_type for call in mock_submit.call_args_list] == [TaskType.RUN_BACKFILLS, TaskType.RESUME_SYNCS]
+
+
+@patch("services.core_services.task_service.fetch_athletes_activities")
+def test_batch_requeues_only_unfinished_athletes(mock_fetch_batch, task_service):
+    totals = {"fetched": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    mock_fetch_batch.return_value = {1: totals, 2: RateLimitExceededException(delay=30), 3: totals}
+    task = Task(
+        athlete_id=None,
+        endpoint="https://api.strava.com/api/v3/athlete/activities",
+        params={"athlete_ids": [1, 2, 3]},
+        task_type=TaskType.FETCH_ACTIVITIES_BATCH,
+    )
+    with patch.object(task_service, "submit_task") as mock_submit:
+        task_service.process_task(task)
+
+    mock_fetch_batch.assert_called_once_with([1, 2, 3])
+    requeued = mock_submit.call_args[0][0]
+    assert requeued.params == {"athlete_ids": [2]}
+    assert abs((requeued.execute_after - datetime.now()) - timedelta(seconds=30)) < timedelta(seconds=5)
@@ -0,0 +1,115 @@
+import gzip
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:  # optional, gzip is always available
+        zstd = None
+
+# payloads are compressed once per data change, but a cache miss still waits for it:
+# levels with a good ratio that compress a few MB of map JSON well below a second
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+ZSTD_LEVEL = 9
+
+# supported Content-Encodings, preferred first
+ENCODINGS = tuple(
+    encoding for encoding, module in (("zstd", zstd), ("br", brotli), ("gzip", gzip)) if module is not None
+)
+# encodings a payload can be compressed for in parts, see compress_frame
+FRAMED_ENCODINGS = tuple(encoding for encoding in ENCODINGS if encoding != "br")
+
+# deflate, no file name, mtime 0, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# an empty final deflate block, ends a stream of sync flushed blocks
+DEFLATE_END = b"\x03\x00"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data for the given Content-Encoding.
+    """
+    if encoding == "gzip":
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "zstd" and zstd is not None:
+        return zstd.compress(data, ZSTD_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    """
+    Decompress data of the given Content-Encoding.
+    """
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(data)
+    if encoding == "zstd" and zstd is not None:
+        return zstd.decompress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def compress_frame(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data as a part of a payload with one of the FRAMED_ENCODINGS, join_frames joins the parts.
+    A zstd frame is a complete stream, concatenated streams decode as one. Browsers stop after the first
+    gzip member though, so a gzip frame is raw deflate ending on a byte boundary, followed by the CRC-32
+    and length of data for the trailer of the joined stream.
+    """
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        return deflated + struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    if encoding not in FRAMED_ENCODINGS:
+        raise ValueError(f"Unsupported framed encoding: {encoding}")
+    return compress(data, encoding)
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    CRC-32 of the concatenation of two byte strings from their CRC-32s and the length of the second.
+    """
+    # the CRC is affine in its start value, which only shifts it by the length of the data
+    zeros = bytes(length2)
+    return zlib.crc32(zeros, crc1) ^ zlib.crc32(zeros) ^ crc2
+
+
+def join_frames(frames, encoding: str):
+    """
+    Yields the frames of compress_frame as one stream of the encoding. Empty frames are skipped.
+    """
+    if encoding != "gzip":
+        yield from (frame for frame in frames if frame)
+        return
+    yield GZIP_HEADER
+    crc, length = 0, 0
+    for frame in frames:
+        if not frame:
+            continue
+        frame_crc, frame_length = struct.unpack("<II", frame[-8:])
+        crc = crc32_combine(crc, frame_crc, frame_length)
+        length += frame_length
+        yield frame[:-8]
+    yield DEFLATE_END + struct.pack("<II", crc, length & 0xFFFFFFFF)
+
+
+def negotiate_encoding(accept_encodings, encodings=ENCODINGS):
+    """
+    Pick the supported encoding the client prefers by the quality values of its Accept-Encoding
+    (a Werkzeug Accept), ties go to the server preference. None if the client accepts none of them.
+    """
+    best = max(encodings, key=lambda encoding: accept_encodings[encoding], default=None)
+    if best is None or accept_encodings[best] <= 0:
+        return None
+    return best
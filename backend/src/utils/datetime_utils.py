@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
 def parse_datetime(value):
     """
@@ -17,3 +17,11 @@ def parse_datetime(value):
         except ValueError:
             raise ValueError(f"Invalid datetime string format: {value}")
     raise TypeError(f"Unsupported datetime format: {type(value)}")
+
+def to_naive_utc(value: datetime):
+    """
+    Converts a timezone aware datetime to a naive UTC datetime, the form MongoDB returns.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
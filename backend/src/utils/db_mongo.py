@@ -1,11 +1,14 @@
 import os
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, PyMongoError
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# collections whose indexes were created by this process
+_indexed_collections = set()
+
 
 class MongoDB:
     _instance = None
@@ -38,3 +41,20 @@ class MongoDB:
                 raise
 
         return MongoDB._instance
+
+
+def ensure_indexes(collection, indexes):
+    """
+    Create the indexes of a collection once per process. mongo-init.js only runs when the database is
+    created, this gives existing databases the indexes added later. indexes are (keys, options) pairs.
+    A failure (e.g. a unique index over duplicates) is logged and retried by the next call.
+    """
+    if collection.full_name in _indexed_collections:
+        return
+    try:
+        for keys, options in indexes:
+            collection.create_index(keys, **options)
+    except PyMongoError as e:
+        logger.error(f"Failed to create the indexes of {collection.full_name}: {e}")
+        return
+    _indexed_collections.add(collection.full_name)
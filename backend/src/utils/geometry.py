@@ -0,0 +1,184 @@
+import math
+
+# zoom levels for which simplified polylines are precomputed
+LOD_ZOOMS = (6, 9, 12)
+
+TILE_SIZE = 256
+
+# latitude limit of web mercator maps, the poles would be duplicate vertices of a viewport polygon
+MAX_LATITUDE = 85.0511287798
+# longitude step of the densified viewport edges, parallels are no geodesics
+VIEWPORT_EDGE_STEP = 1.0
+# viewports spanning more longitude show (nearly) the whole world and are not filtered
+MAX_VIEWPORT_SPAN = 180.0
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """
+    Returns the simplification tolerance in degrees for a zoom level: the width of one
+    map pixel, so the simplified route is indistinguishable from the full one at that zoom.
+    """
+    return 360 / (TILE_SIZE * 2 ** zoom)
+
+
+def select_lod(zoom: int = None, tolerance: float = None):
+    """
+    Returns the coarsest precomputed zoom level that is detailed enough for the requested zoom
+    or tolerance (in degrees), None if only the full resolution is.
+    """
+    if zoom is not None:
+        return next((z for z in LOD_ZOOMS if z >= zoom), None)
+    if tolerance is not None:
+        return next((z for z in LOD_ZOOMS if zoom_tolerance(z) <= tolerance), None)
+    return None
+
+
+def point_segment_distance(point, start, end) -> float:
+    """
+    Returns the planar distance of point to the segment between start and end.
+    """
+    px, py = point
+    sx, sy = start
+    ex, ey = end
+    dx, dy = ex - sx, ey - sy
+    if dx == 0 and dy == 0:
+        return math.hypot(px - sx, py - sy)
+    t = max(0.0, min(1.0, ((px - sx) * dx + (py - sy) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (sx + t * dx), py - (sy + t * dy))
+
+
+def simplify_douglas_peucker(points, tolerance: float):
+    """
+    Simplifies a line with the Douglas-Peucker algorithm, keeping every point that deviates more
+    than tolerance from the simplified line. The end points are always kept.
+    """
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    # iterative instead of recursive, long routes would hit the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = first
+        for i in range(first + 1, last):
+            distance = point_segment_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """
+    Returns the (minLng, minLat, maxLng, maxLat) bounds of a web mercator (slippy map) tile.
+    """
+    n = 2 ** z
+
+    def tile_lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, tile_lat(y + 1), (x + 1) / n * 360 - 180, tile_lat(y)
+
+
+def clip_segment(start, end, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """
+    Clips the segment between two (lat, lng) points to a box (Liang-Barsky).
+    Returns the clipped end points, None if the segment lies outside of the box.
+    End points within the box are returned unchanged.
+    """
+    d_lat = end[0] - start[0]
+    d_lng = end[1] - start[1]
+    t0, t1 = 0.0, 1.0
+    for p, q in (
+        (-d_lat, start[0] - min_lat),
+        (d_lat, max_lat - start[0]),
+        (-d_lng, start[1] - min_lng),
+        (d_lng, max_lng - start[1]),
+    ):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        t = q / p
+        if p < 0:
+            if t > t1:
+                return None
+            t0 = max(t0, t)
+        else:
+            if t < t0:
+                return None
+            t1 = min(t1, t)
+
+    clipped_start = start if t0 == 0 else (start[0] + t0 * d_lat, start[1] + t0 * d_lng)
+    clipped_end = end if t1 == 1 else (start[0] + t1 * d_lat, start[1] + t1 * d_lng)
+    return clipped_start, clipped_end
+
+
+def clip_polyline(points, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """
+    Clips a line of (lat, lng) points to a box, returns the pieces of the line within the box.
+    """
+    pieces = []
+    current = []
+    for start, end in zip(points, points[1:]):
+        clipped = clip_segment(start, end, min_lat, min_lng, max_lat, max_lng)
+        if clipped is None:
+            if current:
+                pieces.append(current)
+                current = []
+            continue
+        clipped_start, clipped_end = clipped
+        if current and current[-1] is clipped_start:
+            current.append(clipped_end)
+        else:
+            if current:
+                pieces.append(current)
+            current = [clipped_start, clipped_end]
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def parse_bbox(value: str):
+    """
+    Parses a "minLng,minLat,maxLng,maxLat" bounding box, raises ValueError if it is malformed.
+    Latitudes are clamped to the web mercator limit.
+    """
+    parts = [float(part.strip()) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError(f"Expected 4 bbox values, got {len(parts)}")
+    min_lng, min_lat, max_lng, max_lat = parts
+    min_lat = max(min_lat, -MAX_LATITUDE)
+    max_lat = min(max_lat, MAX_LATITUDE)
+    if not (-180 <= min_lng < max_lng <= 180 and min_lat < max_lat):
+        raise ValueError(f"Invalid bbox: {value}")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def viewport_polygon(min_lng: float, min_lat: float, max_lng: float, max_lat: float):
+    """
+    Returns a GeoJSON polygon covering the viewport for $geoIntersects queries, None if the viewport
+    is too wide to be worth filtering. The north and south edges are densified so they follow the
+    parallels instead of great circles, the strict winding CRS rules out matching the complement.
+    """
+    if max_lng - min_lng > MAX_VIEWPORT_SPAN:
+        return None
+    steps = max(1, math.ceil((max_lng - min_lng) / VIEWPORT_EDGE_STEP))
+    lngs = [min_lng + (max_lng - min_lng) * i / steps for i in range(steps + 1)]
+
+    # counter clockwise: along the south edge to the east, back along the north edge to the west
+    ring = [[lng, min_lat] for lng in lngs] + [[lng, max_lat] for lng in reversed(lngs)]
+    ring.append(ring[0])
+    return {
+        "type": "Polygon",
+        "coordinates": [ring],
+        "crs": {"type": "name", "properties": {"name": "urn:x-mongodb:crs:strictwinding:EPSG:4326"}},
+    }
@@ -0,0 +1,44 @@
+import bisect
+import threading
+
+# upper bounds of the latency buckets in seconds, the last bucket takes everything slower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Thread safe histogram of observations over fixed buckets, like a Prometheus histogram.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q quantile, inf if it is in the last bucket, None without observations."""
+        with self.lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+
+    def stats(self):
+        """Return the count, sum and the cumulative count per bucket upper bound ("inf" for the last)."""
+        with self.lock:
+            cumulative, seen = {}, 0
+            for bound, count in zip(self.buckets + ("inf",), self.counts):
+                seen += count
+                cumulative[str(bound)] = seen
+            return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
@@ -0,0 +1,66 @@
+import itertools
+import orjson
+
+from utils.compression import compress_frame, join_frames
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def stream_json_array(batches):
+    """
+    Yields a JSON array as bytes fragments, serializing one batch (list) at a time.
+    The concatenated fragments equal orjson.dumps of all batches chained together.
+    """
+    # strip the brackets of the serialized batches, join_json_array adds them once
+    return join_json_array(orjson.dumps(batch, option=ORJSON_OPTIONS)[1:-1] for batch in batches if batch)
+
+
+def join_json_array(fragments):
+    """
+    Yields a JSON array as bytes fragments from already serialized, comma separated elements without brackets.
+    Empty fragments are skipped.
+    """
+    yield b"["
+    first = True
+    for fragment in fragments:
+        if not fragment:
+            continue
+        yield fragment if first else b"," + fragment
+        first = False
+    yield b"]"
+
+
+def join_compressed_json_array(frames, encoding: str):
+    """
+    Yields a JSON array compressed with one of the FRAMED_ENCODINGS from comma separated elements without
+    brackets, each compressed with compress_frame. The output decodes to the output of join_json_array.
+    Empty frames are skipped.
+    """
+    separator = compress_frame(b",", encoding)
+
+    def framed():
+        yield compress_frame(b"[", encoding)
+        first = True
+        for frame in frames:
+            if not frame:
+                continue
+            if not first:
+                yield separator
+            yield frame
+            first = False
+        yield compress_frame(b"]", encoding)
+
+    yield from join_frames(framed(), encoding)
+
+
+def prefetch(iterator):
+    """
+    Pulls the first item of iterator eagerly, so errors raised while opening it surface
+    before a streamed response has been started. Returns an equivalent iterator.
+    """
+    iterator = iter(iterator)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], iterator)
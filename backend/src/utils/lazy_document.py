@@ -0,0 +1,49 @@
+from typing import Callable, NamedTuple, Optional
+
+
+class LazyField(NamedTuple):
+    """
+    Where a model attribute comes from in the MongoDB document: the key (defaults to the attribute name)
+    and how the value is converted. Missing keys of fields that are not required read as None.
+    """
+    key: Optional[str] = None
+    parse: Optional[Callable] = None
+    required: bool = True
+
+
+class LazyDocument:
+    """
+    Base of models backed by a raw MongoDB document. Subclasses map their attributes to LazyFields in
+    _fields and list them in __slots__. An attribute is converted from the document the first time it is
+    read, later reads are plain slot lookups, so models read in bulk only pay for the fields used.
+    """
+    __slots__ = ("_doc",)
+    _fields = {}
+
+    @classmethod
+    def from_document(cls, data: dict):
+        """Create an instance whose attributes are read from data when they are accessed."""
+        instance = cls.__new__(cls)
+        instance._doc = data
+        return instance
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set yet
+        field = self._fields.get(name)
+        doc = self._doc if field is not None else None
+        if doc is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        key = field.key or name
+        value = doc[key] if field.required else doc.get(key)
+        if field.parse is not None:
+            value = field.parse(value)
+        setattr(self, name, value)
+        return value
+
+    def is_loaded(self, name: str) -> bool:
+        """Check if the attribute was assigned or read from the document already."""
+        try:
+            object.__getattribute__(self, name)
+            return True
+        except AttributeError:
+            return False
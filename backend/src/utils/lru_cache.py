@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread safe least recently used cache for bytes values, bounded by the total size of the values.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value of key and mark it as recently used, None if it isn't cached."""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: bytes):
+        """Cache value under key, evicting the least recently used entries until it fits."""
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, predicate):
+        """Remove all entries whose key matches predicate, returns the number of removed entries."""
+        with self.lock:
+            keys = [key for key in self.entries if predicate(key)]
+            for key in keys:
+                self.size -= len(self.entries.pop(key))
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return the number of entries, their size and the hit/miss counters."""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class VersionedCache:
+    """
+    LRUCache of values derived from data with a global version. Callers pass the data version they
+    read with every access: a newer version clears the cache, an older one bypasses it. Changes
+    reported through invalidate only remove the affected entries, as long as no version was missed.
+    """
+    def __init__(self, max_bytes: int):
+        self.lock = threading.Lock()
+        self.cache = LRUCache(max_bytes)
+        self.version = None
+
+    def get(self, key, version: int):
+        """
+        Return the cached value, None if it isn't cached. A version newer than the cache clears it,
+        requests that read an older version than the cache bypass it.
+        """
+        with self.lock:
+            if self.version is None or version > self.version:
+                self.cache.clear()
+                self.version = version
+            elif version < self.version:
+                return None
+        return self.cache.get(key)
+
+    def put(self, key, value: bytes, version: int):
+        """Cache a value derived at version, unless the data changed meanwhile."""
+        with self.lock:
+            if self.version != version:
+                return
+        self.cache.put(key, value)
+
+    def invalidate(self, predicate, version: int):
+        """Remove the entries matching predicate after a change that produced version."""
+        removed = self.cache.invalidate(predicate)
+        with self.lock:
+            if self.version is not None and version == self.version + 1:
+                self.version = version
+            else:
+                # missed or concurrent changes, nothing cached can be trusted
+                self.cache.clear()
+                self.version = None
+        return removed
+
+    def stats(self):
+        return {**self.cache.stats(), "version": self.version}
@@ -0,0 +1,23 @@
+import base64
+import binascii
+import orjson
+
+
+def encode_cursor(key) -> str:
+    """
+    Encodes an (athlete_id, activity_id) pagination key as opaque, URL safe cursor.
+    """
+    return base64.urlsafe_b64encode(orjson.dumps(list(key))).decode("ascii").rstrip("=")
+
+
+def parse_cursor(value: str):
+    """
+    Decodes a cursor of encode_cursor back into its key, raises ValueError if it is malformed.
+    """
+    try:
+        key = orjson.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+    except (binascii.Error, orjson.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {value}") from e
+    if not (isinstance(key, list) and len(key) == 2 and all(type(part) is int for part in key)):
+        raise ValueError(f"Invalid cursor: {value}")
+    return tuple(key)
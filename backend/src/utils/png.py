@@ -0,0 +1,25 @@
+import struct
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def encode_png(rgba: np.ndarray, compression: int = 6) -> bytes:
+    """
+    Encodes a (height, width, 4) uint8 RGBA array as PNG without row filters.
+    """
+    height, width, _ = rgba.shape
+    # every row starts with its filter type, 0 = none
+    rows = np.zeros((height, 1 + width * 4), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    return b"".join((
+        PNG_SIGNATURE,
+        png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        png_chunk(b"IDAT", zlib.compress(rows.tobytes(), compression)),
+        png_chunk(b"IEND", b""),
+    ))
@@ -0,0 +1,111 @@
+import struct
+import numpy as np
+import orjson
+
+# Layout of the binary route buffer, all numbers little endian:
+#   header       magic "SCRB", format version (uint16), reserved (uint16), route count n (uint32),
+#                point count p (uint32), metadata length m (uint32), reserved (uint32)   24 bytes
+#   activity ids int64[n]
+#   athlete ids  int64[n]
+#   offsets      uint32[n + 1], points of route i are offsets[i] to offsets[i + 1] - 1
+#   coordinates  int32[2p], interleaved lat/lng in units of 1e-5 degrees
+#   metadata     m bytes of UTF-8 JSON, the remaining fields as columns: {"name": [...], ...}
+# All arrays start 8 byte aligned, so clients can view them as typed arrays without copying.
+MAGIC = b"SCRB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+COORDINATE_SCALE = 1e5
+MIMETYPE = "application/octet-stream"
+
+
+def decode_polylines(encoded_polylines: list[str]):
+    """
+    Decodes many Google encoded polylines at once with vectorized NumPy operations.
+    Returns the uint32 route offsets and the int32 (lat, lng) coordinates in units of 1e-5 degrees.
+    """
+    offsets = np.zeros(len(encoded_polylines) + 1, dtype=np.uint32)
+    data = np.frombuffer("".join(encoded_polylines).encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if len(data) == 0:
+        return offsets, np.zeros((0, 2), dtype=np.int32)
+    lengths = np.fromiter((len(encoded) for encoded in encoded_polylines), dtype=np.int64, count=len(encoded_polylines))
+
+    # every value is a little endian sequence of 5 bit chunks, the last chunk has no continuation bit
+    ends = (data & 0x20) == 0
+    value_index = np.cumsum(ends) - ends
+    value_starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    shifts = 5 * (np.arange(len(data)) - value_starts[value_index])
+    values = np.zeros(len(value_starts), dtype=np.int64)
+    np.add.at(values, value_index, (data & 0x1f) << shifts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # values alternate between lat and lng deltas, the running sums restart for every route
+    values_before = np.concatenate(([0], np.cumsum(ends)))
+    offsets[1:] = values_before[np.cumsum(lengths)] // 2
+    deltas = values.reshape(-1, 2)
+    coordinates = np.cumsum(deltas, axis=0)
+    route_starts = offsets[:-1].astype(np.int64)
+    route_lengths = np.diff(offsets).astype(np.int64)
+    base = np.zeros_like(deltas)
+    base[1:] = coordinates[:-1]
+    coordinates -= np.repeat(base[route_starts[route_lengths > 0]], route_lengths[route_lengths > 0], axis=0)
+    return offsets, coordinates.astype(np.int32)
+
+
+def metadata_columns(activities: list[dict], exclude):
+    """
+    Collects the fields of the activities into columns, missing fields are None.
+    """
+    fields = list(dict.fromkeys(field for activity in activities for field in activity if field not in exclude))
+    return {field: [activity.get(field) for activity in activities] for field in fields}
+
+
+def pack_routes(activities: list[dict]) -> bytes:
+    """
+    Packs activities with an encoded_polyline into the binary route buffer described above.
+    """
+    offsets, coordinates = decode_polylines([activity["encoded_polyline"] for activity in activities])
+    activity_ids = np.fromiter((activity["activity_id"] for activity in activities), dtype="<i8", count=len(activities))
+    athlete_ids = np.fromiter((activity["athlete_id"] for activity in activities), dtype="<i8", count=len(activities))
+    metadata = orjson.dumps(metadata_columns(activities, ("activity_id", "athlete_id", "encoded_polyline")))
+
+    offsets = offsets.astype("<u4")
+    # pad the offsets so the coordinates stay 8 byte aligned
+    padding = b"\0" * (4 if len(offsets) % 2 else 0)
+    return b"".join((
+        HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(activities), len(coordinates), len(metadata), 0),
+        activity_ids.tobytes(),
+        athlete_ids.tobytes(),
+        offsets.tobytes(),
+        padding,
+        coordinates.astype("<i4").tobytes(),
+        metadata,
+    ))
+
+
+def unpack_routes(buffer: bytes):
+    """
+    Reads a binary route buffer back into activity dicts with (lat, lng) coordinate lists.
+    """
+    magic, version, _, route_count, point_count, metadata_length, _ = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported route buffer {magic!r} version {version}")
+
+    position = HEADER.size
+    activity_ids = np.frombuffer(buffer, dtype="<i8", count=route_count, offset=position)
+    position += 8 * route_count
+    athlete_ids = np.frombuffer(buffer, dtype="<i8", count=route_count, offset=position)
+    position += 8 * route_count
+    offsets = np.frombuffer(buffer, dtype="<u4", count=route_count + 1, offset=position)
+    position += 4 * (route_count + 1) + (4 if (route_count + 1) % 2 else 0)
+    coordinates = np.frombuffer(buffer, dtype="<i4", count=2 * point_count, offset=position).reshape(-1, 2)
+    position += 8 * point_count
+    metadata = orjson.loads(buffer[position:position + metadata_length])
+
+    activities = []
+    for i in range(route_count):
+        activity = {field: column[i] for field, column in metadata.items()}
+        activity["activity_id"] = int(activity_ids[i])
+        activity["athlete_id"] = int(athlete_ids[i])
+        activity["coordinates"] = (coordinates[offsets[i]:offsets[i + 1]] / COORDINATE_SCALE).tolist()
+        activities.append(activity)
+    return activities
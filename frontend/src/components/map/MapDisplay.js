@@ -5,6 +5,11 @@ import styled from 'styled-components';
 import { apiRequest } from '../../api';
 import websitePalette from '../../styles/palette';
 
+// selections of up to this many (athlete, year) slices are fetched in one request, served from the slice cache
+const MAP_SLICE_LIMIT = 25;
+// activities per /api/map request of larger selections
+const MAP_PAGE_SIZE = 1000;
+
 const StyledMap = styled.div`
     height: 100%;
     width: 100%;
@@ -79,6 +84,8 @@ export default function MapDisplay({ years, selectedAthletes, onLoadComplete })
             highlightedRoutesGroupRef.current.clearLayers();
         }
 
+        let cancelled = false;
+
         const fetchDataAndDraw = async () => {
             if (years.length === 0 || selectedAthletes.length === 0) {
                 onLoadComplete();
@@ -91,10 +98,30 @@ export default function MapDisplay({ years, selectedAthletes, onLoadComplete })
                 const params = new URLSearchParams({
                     years: years.join(','),
                     athletes: selectedAthletes.map((athlete) => athlete.athlete_id).join(','),
+                    format: 'encoded',
                 });
+                let data = [];
+                if (years.length * selectedAthletes.length <= MAP_SLICE_LIMIT) {
+                    data = await apiRequest(`/map/?${params.toString()}`);
+                } else {
+                    // large selections are fetched page by page
+                    params.set('page_size', MAP_PAGE_SIZE);
+                    let cursor = null;
+                    do {
+                        if (cursor) {
+                            params.set('cursor', cursor);
+                        }
+                        const page = await apiRequest(`/map/?${params.toString()}`);
+                        if (!page) {
+                            data = null;
+                            break;
+                        }
+                        data = data.concat(page.activities);
+                        cursor = page.next_cursor;
+                    } while (cursor && !cancelled);
+                }
 
-                const data = await apiRequest(`/map/?${params.toString()}`);
-                if (data) {
+                if (data && !cancelled) {
                     cancelDrawingRef.current = false;
                     setRoutesData(data || []);
                     displayRoutes(
@@ -119,6 +146,7 @@ export default function MapDisplay({ years, selectedAthletes, onLoadComplete })
         fetchDataAndDraw();
 
         return () => {
+            cancelled = true;
             cancelDrawingRef.current = true;
         };
     }, [years, selectedAthletes, onLoadComplete]);
@@ -133,6 +161,33 @@ export default function MapDisplay({ years, selectedAthletes, onLoadComplete })
 
 const isMobile = window.matchMedia("(max-width: 1000px)").matches;
 
+// Decode a Google encoded polyline string into [lat, lng] pairs
+const decodePolyline = (encoded) => {
+    const latLngs = [];
+    let index = 0;
+    let lat = 0;
+    let lng = 0;
+
+    const nextValue = () => {
+        let result = 0;
+        let shift = 0;
+        let byte;
+        do {
+            byte = encoded.charCodeAt(index++) - 63;
+            result |= (byte & 0x1f) << shift;
+            shift += 5;
+        } while (byte >= 0x20);
+        return result & 1 ? ~(result >> 1) : result >> 1;
+    };
+
+    while (index < encoded.length) {
+        lat += nextValue();
+        lng += nextValue();
+        latLngs.push([lat / 1e5, lng / 1e5]);
+    }
+    return latLngs;
+};
+
 const displayRoutes = (data, map, selectedAthletes, highlightedRoutesGroup, isZoomingRef, cancelDrawingRef, routesGroup) => {
 
    if (!data || data.length === 0) {
@@ -155,8 +210,8 @@ const displayRoutes = (data, map, selectedAthletes, highlightedRoutesGroup, isZo
             const athleteColor =
                 selectedAthletes.find(a => a.athlete_id.toString() === activity.athlete_id.toString())?.color || 'red';
 
-            if (activity.summary_polyline && activity.summary_polyline.coordinates.length > 1) {
-                const latLngs = activity.summary_polyline.coordinates.map(([lng, lat]) => [lat, lng]); // Flip coordinates
+            const latLngs = activity.encoded_polyline ? decodePolyline(activity.encoded_polyline) : [];
+            if (latLngs.length > 1) {
 
                 const routePolyline = L.polyline(latLngs, {
                     color: athleteColor,
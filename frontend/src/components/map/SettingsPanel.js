@@ -1,9 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import styled from 'styled-components';
 import websitePalette from '../../styles/palette';
 import CustomCheckbox from './CustomCheckbox';
 import ExpandableComponent from './ExpandableComponent';
-import { apiRequest } from '../../api';
 
 
 const StyledSettingsPanel = styled.div`
@@ -74,30 +73,11 @@ const StyledButton = styled.button`
 export default function SettingsPanel({ onSettingsChange, availableAthletes, availableYears, $isOpen }) {
     const [selectedAthletes, setSelectedAthletes] = useState([]);
     const [selectedYears, setSelectedYears] = useState({});
-    const [maxLimit, setMaxLimit] = useState(7);
-
-    useEffect(() => {
-      apiRequest('/map/limit')
-          .then((data) => setMaxLimit(data.limit))
-          .catch((error) => {
-              console.error('Error fetching limit:', error);
-          });
-    }, []);
-
-    const totalSelectionCount =
-        Object.keys(selectedYears).filter(year => selectedYears[year]).length +
-        selectedAthletes.length;
-
     const handleYearChange = (year) => {
-        setSelectedYears(prevYears => {
-            if (!prevYears[year] && totalSelectionCount >= maxLimit) {
-                return prevYears;
-            }
-            return {
-                ...prevYears,
-                [year]: !prevYears[year],
-            };
-        });
+        setSelectedYears(prevYears => ({
+            ...prevYears,
+            [year]: !prevYears[year],
+        }));
     };
 
     const handleAthleteChange = (athlete) => {
@@ -105,10 +85,6 @@ export default function SettingsPanel({ onSettingsChange, availableAthletes, ava
             const athleteId = athlete.athlete_id.toString();
             const isAlreadySelected = prevSelection.some(a => a.id === athleteId);
 
-            if (!isAlreadySelected && totalSelectionCount >= maxLimit) {
-                return prevSelection;
-            }
-
             return isAlreadySelected
                 ? prevSelection.filter(a => a.id !== athleteId)
                 : [...prevSelection, { id: athleteId, color: athlete.color }];
@@ -136,9 +112,6 @@ export default function SettingsPanel({ onSettingsChange, availableAthletes, ava
                                     onChange={() => handleYearChange(year)}
                                     label={year.toString()}
                                     color="#5b5ea6"
-                                    disabled={
-                                        !selectedYears[year] && totalSelectionCount >= maxLimit
-                                    }
                                 />
                             ))
                         ) : (
@@ -160,9 +133,6 @@ export default function SettingsPanel({ onSettingsChange, availableAthletes, ava
                                         onChange={() => handleAthleteChange(athlete)}
                                         label={athlete.first_name}
                                         color={athlete.color}
-                                        disabled={
-                                            !isChecked && totalSelectionCount >= maxLimit
-                                        }
                                     />
                                 );
                             })
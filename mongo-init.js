@@ -5,15 +5,30 @@ db = db.getSiblingDB('StravaChallangeV2Db');
 db.createCollection('athletes');
 db.createCollection('activities');
 db.createCollection('yearlyStats');
+db.createCollection('leaderboardTotals');
+db.createCollection('seasons');
+db.createCollection('counters');
+db.createCollection('heatmapCells');
+db.createCollection('mapChanges');
+db.createCollection('migrations');
 
 // Create unique indexes
 db.athletes.createIndex({ "athlete_id": 1 }, { unique: true });
 db.activities.createIndex({ "activity_id": 1 }, { unique: true });
+db.leaderboardTotals.createIndex({ "season": 1, "athlete_id": 1, "category": 1 }, { unique: true });
+db.seasons.createIndex({ "season_id": 1 }, { unique: true });
+db.heatmapCells.createIndex({ "athlete_id": 1, "year": 1, "x": 1, "y": 1 }, { unique: true });
 
 // Create indexes
 db.yearlyStats.createIndex({ "athlete_id": 1, "year": 1 });
 db.activities.createIndex({ "athlete_id": 1, "type": 1, "year": 1 });
 db.activities.createIndex({ "athlete_id": 1, "year": 1 });
+db.activities.createIndex({ "athlete_id": -1, "activity_id": -1 });
 db.activities.createIndex({ "summary_polyline": "2dsphere" });
+db.activities.createIndex({ "bbox": "2dsphere" });
+db.mapChanges.createIndex({ "version": 1 });
+db.mapChanges.createIndex({ "op": 1, "version": 1 });
+// the change log is kept for 30 days, older clients refetch the whole map
+db.mapChanges.createIndex({ "created_at": 1 }, { expireAfterSeconds: 30 * 24 * 60 * 60 });
 
 // Note: The _id index is created automatically by MongoDB for each collection